@@ -0,0 +1,59 @@
+# Compares bytes read and wall time of MdaRecordingSegment.get_traces for
+# all channels vs. a small block of neighboring channels (as used for
+# per-unit waveform extraction), in memmap and pread modes.
+#
+# Bytes read are the bytes requested from pread, or the bytes of the file
+# pages touched in memmap mode. mda entries are interleaved by frame, so
+# unless a frame of all channels is larger than a page, a channel subset
+# reads (nearly) as many bytes as all channels; what it saves is the copy
+# and the memory of the returned traces.
+#
+# usage: python benchmark_channel_subset_reads.py [--num-channels 384] [--subset-size 16]
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from spikeforest.load_extractors.MdaRecordingExtractorV2.MdaRecordingExtractorV2 import MdaRecordingExtractorV2, writemda16i
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark channel-subset reads from an mda recording')
+    parser.add_argument('--num-channels', type=int, default=384)
+    parser.add_argument('--num-frames', type=int, default=30000 * 60)
+    parser.add_argument('--subset-size', type=int, default=16)
+    parser.add_argument('--chunk-frames', type=int, default=90)
+    parser.add_argument('--num-reads', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        raw_path = os.path.join(tmpdir, 'raw.mda')
+        X = np.random.randint(-500, 500, size=(args.num_channels, args.num_frames), dtype=np.int16)
+        writemda16i(X, raw_path)
+        del X
+        geom = np.zeros((args.num_channels, 2))
+        geom[:, 1] = np.arange(args.num_channels) * 20
+        rng = np.random.default_rng(0)
+        starts = rng.integers(0, args.num_frames - args.chunk_frames, size=args.num_reads)
+        first_channels = rng.integers(0, args.num_channels - args.subset_size, size=args.num_reads)
+
+        print(f'{args.num_channels} channels, {args.num_reads} reads of {args.chunk_frames} frames')
+        for use_memmap in [True, False]:
+            for subset in [False, True]:
+                recording = MdaRecordingExtractorV2(raw_path=raw_path, params={'samplerate': 30000}, geom=geom, use_memmap=use_memmap)
+                segment = recording._recording_segments[0]
+                diskreadmda = recording._diskreadmda
+                timer = time.time()
+                for start, c0 in zip(starts, first_channels):
+                    channel_indices = np.arange(c0, c0 + args.subset_size) if subset else None
+                    traces = segment.get_traces(int(start), int(start) + args.chunk_frames, channel_indices)
+                    # touch the data so that lazily mapped views are actually read
+                    np.sum(traces)
+                elapsed = time.time() - timer
+                label = f'{"memmap" if use_memmap else "pread":6s} {"subset" if subset else "all":6s}'
+                print(f'{label}: {diskreadmda.bytes_read / args.num_reads:12.0f} bytes read/call  {elapsed * 1e6 / args.num_reads:8.1f} us/call')
+
+
+if __name__ == '__main__':
+    main()
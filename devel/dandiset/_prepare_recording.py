@@ -10,6 +10,7 @@ from dateutil.tz import tzlocal
 
 from pynwb import NWBHDF5IO, NWBFile
 from pynwb.ecephys import ElectricalSeries
+from hdmf.data_utils import GenericDataChunkIterator
 
 from StudyInfo import StudyInfo
 from RecordingInfo import RecordingInfo
@@ -81,7 +82,8 @@ def _prepare_recording(R: SFRecording, *, nwb_fname: str, study_info: StudyInfo,
         region=list(range(len(recording.get_channel_ids()))),
         description='all electrodes'
     )
-    raw_data = recording.get_traces()
+    # write the traces in chunks rather than materializing the whole recording in memory
+    raw_data = _RecordingDataChunkIterator(recording, buffer_gb=0.5)
     raw_electrical_series = ElectricalSeries(
         name='ElectricalSeries',
         description='Raw acquisition traces',
@@ -102,4 +104,20 @@ def _prepare_recording(R: SFRecording, *, nwb_fname: str, study_info: StudyInfo,
 
     # Write the nwb file
     with NWBHDF5IO(nwb_fname, 'w') as io:
-        io.write(nwbfile, cache_spec=True)
\ No newline at end of file
+        io.write(nwbfile, cache_spec=True)
+
+
+class _RecordingDataChunkIterator(GenericDataChunkIterator):
+    def __init__(self, recording, **kwargs):
+        self._recording = recording
+        super().__init__(**kwargs)
+
+    def _get_data(self, selection):
+        traces = self._recording.get_traces(start_frame=selection[0].start, end_frame=selection[0].stop)
+        return traces[:, selection[1]]
+
+    def _get_maxshape(self):
+        return (self._recording.get_num_frames(), self._recording.get_num_channels())
+
+    def _get_dtype(self):
+        return self._recording.get_dtype()
@@ -6,6 +6,8 @@ import os
 import time
 from typing import Any, Dict, List, TypedDict, cast
 from spikeforest._common.calling_framework import add_standard_args, call_cleanup, extract_hither_config, parse_shared_configuration, print_per_verbose
+from spikeforest.sorting_utilities.sorting_metrics import compute_quality_metrics, compare_with_ground_truth
+from spikeforest.sorting_utilities.prepare_workspace import parse_sortings_text
 import spikeextractors as se
 import hither2 as hi
 import kachery_cloud as kc
@@ -13,8 +15,6 @@ import sortingview as sv
 
 thisdir = os.path.dirname(os.path.realpath(__file__))
 spiketoolkit_image = hi.DockerImageFromScript(name='magland/spiketoolkit', dockerfile=f'{thisdir}/docker/Dockerfile')
-expected_spiketoolkit_version = '0.7.4'
-expected_spikecomparison_version = '0.3.2'
 
 class ArgsDict(TypedDict):
     sortingsfile: str
@@ -23,29 +23,13 @@ class ArgsDict(TypedDict):
 RECORDING_URI_KEY = 'recordingUri'
 GROUND_TRUTH_URI_KEY = 'sortingTrueUri'
 SORTING_FIRINGS_URI_KEY = 'firings'
-QUALITY_METRICS = [
-    "num_spikes",
-    "firing_rate",
-    "presence_ratio",
-    "isi_violation",
-    "amplitude_cutoff",
-    "snr",
-    "max_drift",
-    "cumulative_drift",
-    "silhouette_score",
-    "isolation_distance",
-    "l_ratio",
-    "nn_hit_rate",
-    "nn_miss_rate",
-    "d_prime"
-]
 
 def init_args():
     parser = argparse.ArgumentParser(description="Compute ground-truth comparisons and quality metrics for SpikeForest records.")
     parser.add_argument('--sortingsfile', '-s', action='store',
         default='sha1://31ea996f4aa43e1cb8719848753ebfed3a184503/example.json',
         help="The path or kachery URI for the JSON file which contains the sortings. The sortings file content " +
-            "should be equivalent to the output of an API call to SpikeForest.")
+            "should be equivalent to the output of an API call to SpikeForest, or the JSON Lines output of run_sortings.")
     parser.add_argument('--recordingset', '-r', action='store', default='',
         help='If set, will limit processing to the set of recordings named in the variable (e.g. "paired_kampff").')
     parser = add_standard_args(parser)
@@ -72,27 +56,15 @@ def init_configuration():
     return (args, std_args)
 
 def load_sortings(sortingsfile: str) -> List[Dict[str, Any]]:
-    hydrated_sortings = kc.load_json(sortingsfile)
-    assert hydrated_sortings is not None
-    return cast(List[Dict[str, Any]], hydrated_sortings)
-
-def compute_quality_metrics(recording: se.RecordingExtractor, sorting: se.SortingExtractor) -> str:
-    # import within function in case we don't have spiketoolkit installed outside the container
-    import spiketoolkit as st
-    assert st.__version__ == expected_spiketoolkit_version, f'Unexpected spiketoolkit version: {st.__version__} <> {expected_spiketoolkit_version}'
-    return st.validation.compute_quality_metrics(
-        sorting, recording,
-        metric_names=QUALITY_METRICS, as_dataframe=True).to_dict()
-
-def compare_with_ground_truth(sorting: se.SortingExtractor, gt_sorting: se.SortingExtractor):
-    # import within function in case we don't have spikecomparison installed outside the container
-    import spikecomparison as sc
-    assert sc.__version__ == expected_spikecomparison_version, f'Unexpected spiketoolkit version: {sc.__version__} <> {expected_spikecomparison_version}'
-    ground_truth_comparison = sc.GroundTruthComparison(gt_sorting, sorting)
-
-    return {"best_match_21": ground_truth_comparison.best_match_21.to_list(),
-            "best_match_12": ground_truth_comparison.best_match_12.to_list(),
-            "agreement_scores": ground_truth_comparison.agreement_scores.to_dict()}
+    # a JSON list or JSON Lines (e.g. the output of a run_sortings run that may still be going)
+    if os.path.exists(sortingsfile):
+        with open(sortingsfile) as fp:
+            text = fp.read()
+    else:
+        text = kc.load_text(sortingsfile)
+    if text is None:
+        raise Exception(f"Unable to load sortings file {sortingsfile}.")
+    return cast(List[Dict[str, Any]], parse_sortings_text(text))
 
 @hi.function(
     'compute_quality_metrics_hi', '0.1.1',
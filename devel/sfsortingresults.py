@@ -1,7 +1,6 @@
-import pandas as pd
 import sortingview as sv
-import numpy as np
-import kachery_cloud as kcl
+from spikeforest._common.catalog_json_cache import load_catalog_json
+from spikeforest.load_spikeforest_sorting_outputs.SFSortingOutputCatalog import SFSortingOutputCatalog
 
 _sorting_results_uri = 'sha1://52f24579bb2af1557ce360ed5ccc68e480928285/file.txt?manifest=5bfb2b44045ac3e9bd2a8fe54ef67aa932844f58'
 
@@ -21,24 +20,16 @@ class SFSortingResults:
             self._sorting_results_uri = _sorting_results_uri
         else:
             self._sorting_results_uri = sorting_results_uri
-        x = kcl.load_json(self._sorting_results_uri)
-        self._df = pd.DataFrame(x)
-        print(f"Found {len(self._df)} sorting outputs")
+        x = load_catalog_json(self._sorting_results_uri)
+        self._catalog = SFSortingOutputCatalog(x)
+        print(f"Found {len(self._catalog)} sorting outputs")
 
     def get_sorting_output(self, study_name, recording_name, sorter_name):
-        # get study
-        dataset = self._df.query(f"studyName == '{study_name}'")
-        assert len(dataset) > 0, f"Study '{study_name}' not found"
+        self._check_recording(study_name, recording_name)
+        X = self._catalog.find_sorting_output(study_name=study_name, recording_name=recording_name, sorter_name=sorter_name)
+        assert X is not None, f"Sorting output '{sorter_name}' not found"
 
-        # get recording
-        dataset = dataset.query(f"recordingName == '{recording_name}'")
-        assert len(dataset) > 0, f"Recording '{recording_name}' not found"
-
-        # get sorting uri
-        dataset = dataset.query(f"sorterName == '{sorter_name}'")
-        assert len(dataset) == 1, f"Sorting output '{sorter_name}' not found"
-
-        firings_uri = dataset["firings"].values[0]
+        firings_uri = X.sorting_output_record["firings"]
 
         # get samplint rate
         recording = self.get_gt_recording(study_name, recording_name, download=False)
@@ -54,53 +45,39 @@ class SFSortingResults:
         return sorting
 
     def get_gt_sorting_output(self, study_name, recording_name):
-        # get study
-        dataset = self._df.query(f"studyName == '{study_name}'")
-        assert len(dataset) > 0, f"Study '{study_name}' not found"
+        X = self._check_recording(study_name, recording_name)[0]
 
-        # get recording
-        dataset = dataset.query(f"recordingName == '{recording_name}'")
-        assert len(dataset) > 0, f"Recording '{recording_name}' not found"
-
-        firings_uri = dataset.iloc[0]["sortingTrueUri"]
+        firings_uri = X.sorting_output_record["sortingTrueUri"]
         sorting = sv.LabboxEphysSortingExtractor(firings_uri)
 
         return sorting
 
     def get_gt_recording(self, study_name, recording_name, download=False):
-        # get study
-        dataset = self._df.query(f"studyName == '{study_name}'")
-        assert len(dataset) > 0, f"Study '{study_name}' not found"
-
-        # get recording
-        dataset = dataset.query(f"recordingName == '{recording_name}'")
-        assert len(dataset) > 0, f"Recording '{recording_name}' not found"
+        X = self._check_recording(study_name, recording_name)[0]
 
-        recording_uri = dataset.iloc[0]["recordingUri"]
+        recording_uri = X.sorting_output_record["recordingUri"]
         recording = sv.LabboxEphysRecordingExtractor(recording_uri, download=download)
 
         return recording
 
     def get_study_names(self):
-        study_names = list(np.unique(self._df["studyName"]))
+        study_names = sorted(self._catalog.study_names)
         return study_names
 
     def get_recording_names(self, study_name):
-        # get study
-        dataset = self._df.query(f"studyName == '{study_name}'")
-        assert len(dataset) > 0, f"Study '{study_name}' not found"
-
-        recording_names = list(np.unique(dataset["recordingName"]))
+        recording_names = sorted(self._catalog.get_recording_names(study_name))
+        assert len(recording_names) > 0, f"Study '{study_name}' not found"
         return recording_names
 
     def get_sorting_output_names(self, study_name, recording_name):
-        # get study
-        dataset = self._df.query(f"studyName == '{study_name}'")
-        assert len(dataset) > 0, f"Study '{study_name}' not found"
-
-        # get recording
-        dataset = dataset.query(f"recordingName == '{recording_name}'")
-        assert len(dataset) > 0, f"Recording '{recording_name}' not found"
+        self._check_recording(study_name, recording_name)
 
-        sorting_output_names = list(np.unique(dataset["sorterName"]))
+        sorting_output_names = sorted(self._catalog.get_sorter_names(study_name, recording_name))
         return sorting_output_names
+
+    def _check_recording(self, study_name, recording_name):
+        outputs = self._catalog.get_recording_sorting_outputs(study_name, recording_name)
+        if len(outputs) == 0:
+            assert study_name in self._catalog.study_names, f"Study '{study_name}' not found"
+            assert False, f"Recording '{recording_name}' not found"
+        return outputs
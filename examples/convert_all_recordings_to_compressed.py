@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import spikeforest as sf
+from spikeforest.convert_recordings import convert_recordings_to_compressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="convert the spikeforest recordings to the compressed (block random-access) recording format, in parallel")
+    parser.add_argument('--output_dir', help='The output directory (e.g., recordings_compressed)')
+    parser.add_argument('--block_sec', type=float, default=1, help='Block duration in seconds')
+    parser.add_argument('--no_compression', action='store_true', help='Store the blocks uncompressed')
+    parser.add_argument('--num_workers', type=int, default=4, help='Number of recordings converted concurrently')
+    parser.add_argument('--num_threads', type=int, default=4, help='Number of threads compressing the blocks of each recording')
+    args = parser.parse_args()
+
+    all_recordings = sf.load_spikeforest_recordings()
+    recording_objects = convert_recordings_to_compressed(
+        all_recordings,
+        args.output_dir,
+        block_duration_sec=args.block_sec,
+        compress=not args.no_compression,
+        num_workers=args.num_workers,
+        num_threads=args.num_threads
+    )
+    # each can be loaded with spikeforest.load_extractors.load_recording_extractor
+    for recording_object in recording_objects:
+        print(json.dumps(recording_object))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,14 @@
 
 # pip install --upgrade kachery
 
+import gc
 import json
 import argparse
 import numpy as np
 import kachery_cloud as ka
 import os
 import spikeforest as sf
-from spikeforest.load_extractors.MdaRecordingExtractorV2.MdaRecordingExtractorV2 import readmda
+from spikeforest.kachery_cache import get_kachery_cache
 
 def main():
     """
@@ -47,14 +48,14 @@ def main():
             os.mkdir(studydir_local)
         recname = R.recording_name
         recfile = os.path.join(studydir_local, recname + '.json')
-        obj = _json_serialize(R.recording_object)
+        obj = _json_serialize(sf.thaw(R.recording_object))
         obj['self_reference'] = ka.store_json(obj,
                                               label='{}/{}/{}.json'.format(studyset_name, study_name,
                                                                            recname))
         with open(recfile, 'w') as f:
             json.dump(obj, f, indent=4)
         firings_true_file = os.path.join(studydir_local, recname + '.firings_true.json')
-        obj2 = R.sorting_true_object
+        obj2 = sf.thaw(R.sorting_true_object)
         obj2['self_reference'] = ka.store_json(obj2, label='{}/{}/{}.firings_true.json'.format(studyset_name,
                                                                                                study_name,
                                                                                                recname))
@@ -70,9 +71,19 @@ def main():
             json.dump(studyset, f, indent=4)
         print('getting raw data for {}/{}'.format(studyset_name, study_name))
         rec = R.get_recording_extractor()
-        mda = readmda(rec._kwargs['raw_path'])
-        np.save(os.path.join(studydir_local, recname), mda)
+        # stream the traces into the .npy file rather than loading the whole recording into memory
+        # (same layout as saving the num_channels x num_frames mda array)
+        npy = np.lib.format.open_memmap(os.path.join(studydir_local, recname + '.npy'), mode='w+',
+                                        dtype=rec.get_dtype(), shape=(rec.get_num_channels(), rec.get_num_frames()),
+                                        fortran_order=True)
+        chunk_frames = int(rec.get_sampling_frequency() * 30)
+        for start_frame, traces in rec.iter_traces(chunk_frames):
+            npy[:, start_frame:start_frame + traces.shape[0]] = traces.T
+        npy.flush()
+        del npy
         raw_data_paths.append(rec._kwargs['raw_path'])
+        # release the pin on the kachery copy
+        del rec
         studySets.append(studyset)
     studysets_obj = dict(
         StudySets=studySets
@@ -80,8 +91,12 @@ def main():
     studysets_path = ka.store_json(studysets_obj, label='studysets.json')
     with open(os.path.join(basedir, 'studysets'), 'w') as f:
         f.write(studysets_path)
+    # the data now lives in the directory tree, so drop the kachery copies
+    # (collecting first so that the pins of the deleted extractors are released)
+    gc.collect()
+    cache = get_kachery_cache()
     for p in raw_data_paths:
-        os.remove(p)
+        cache.remove(p)
 
 # def patch_recording_geom(recording, geom_fname):
 #     print(f'PATCHING geom for recording: {recording["name"]}')
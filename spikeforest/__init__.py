@@ -1,9 +1,13 @@
 from .load_extractors.load_recording_extractor import load_recording_extractor
 from .load_extractors.load_sorting_extractor import load_sorting_extractor
+from .load_extractors.load_recording_info import load_recording_info
 from .load_spikeforest_recordings.load_spikeforest_recordings import load_spikeforest_recordings
 from .load_spikeforest_recordings.load_spikeforest_recording import load_spikeforest_recording
+from .load_spikeforest_recordings.load_spikeforest_recording_catalog import load_spikeforest_recording_catalog
 from .load_spikeforest_sorting_outputs.load_spikeforest_sorting_outputs import load_spikeforest_sorting_outputs
 from .load_spikeforest_sorting_outputs.load_spikeforest_sorting_output import load_spikeforest_sorting_output
+from .load_spikeforest_sorting_outputs.load_spikeforest_sorting_output_catalog import load_spikeforest_sorting_output_catalog
 from .load_extractors import load_recording_extractor, load_sorting_extractor
+from ._common.frozen import thaw
 
 from .version import __version__
\ No newline at end of file
@@ -18,6 +18,7 @@ class StandardArgs(TypedDict):
     use_slurm: bool
     slurm_max_jobs_per_alloc: int
     slurm_max_simultaneous_allocs: int
+    slurm_gpus_per_node: int
     slurm_command: str
 
 class HitherConfiguration(TypedDict):
@@ -122,6 +123,7 @@ def parse_shared_configuration(parsed: Namespace) -> StandardArgs:
         use_slurm                     = parsed.use_slurm,
         slurm_max_jobs_per_alloc      = parsed.slurm_jobs_per_allocation,
         slurm_max_simultaneous_allocs = parsed.slurm_max_simultaneous_allocations,
+        slurm_gpus_per_node           = parsed.slurm_gpus_per_node,
         slurm_command                 = slurm_command
     )
 
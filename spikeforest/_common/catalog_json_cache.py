@@ -0,0 +1,46 @@
+import json
+import threading
+from typing import Any, Dict
+import kachery_cloud as kcl
+
+try:
+    # optional; several times faster than json on the large catalogs
+    import orjson
+except ImportError:
+    orjson = None
+
+# Parsed catalog JSON objects, keyed by URI. Only parsed objects are cached
+# (in memory, once per process): the kachery directory is shared between users,
+# so nothing that deserializes to code (e.g. a pickle) is ever loaded from it.
+_lock = threading.Lock()
+_parsed: Dict[str, Any] = {}
+
+
+def load_catalog_json(uri: str) -> Any:
+    """Loads a catalog JSON object once per process
+
+    The returned object is shared by every caller and must not be modified.
+    """
+    with _lock:
+        x = _parsed.get(uri, None)
+        if x is not None:
+            return x
+        x = _parse_json_file(uri)
+        _parsed[uri] = x
+        return x
+
+
+def clear_catalog_json_cache():
+    with _lock:
+        _parsed.clear()
+
+
+def _parse_json_file(uri: str) -> Any:
+    path = kcl.load_file(uri)
+    if path is None:
+        raise Exception(f'Unable to load catalog: {uri}')
+    with open(path, 'rb') as f:
+        data = f.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
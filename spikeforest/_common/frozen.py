@@ -0,0 +1,83 @@
+from typing import Any
+
+
+class FrozenDict(dict):
+    """A read-only dict
+
+    A dict subclass, so it can be passed wherever a JSON object is expected
+    (json.dump, isinstance checks, ** unpacking). Copies are mutable:
+    copy.deepcopy() (like thaw()) returns plain dicts and lists throughout, and
+    copy.copy() a plain dict of the (still frozen) values.
+    """
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('FrozenDict is read-only (use thaw() for a mutable copy)')
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+class FrozenList(list):
+    """A read-only list (see FrozenDict)"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('FrozenList is read-only (use thaw() for a mutable copy)')
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __iadd__ = _readonly
+    __imul__ = _readonly
+    append = _readonly
+    clear = _readonly
+    extend = _readonly
+    insert = _readonly
+    pop = _readonly
+    remove = _readonly
+    reverse = _readonly
+    sort = _readonly
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(x: Any) -> Any:
+    """A read-only version of a JSON-like object (nested dicts and lists are frozen too)"""
+    if isinstance(x, FrozenDict) or isinstance(x, FrozenList):
+        return x
+    if isinstance(x, dict):
+        return FrozenDict((k, freeze(v)) for k, v in x.items())
+    if isinstance(x, list):
+        return FrozenList(freeze(v) for v in x)
+    return x
+
+
+def thaw(x: Any) -> Any:
+    """A mutable deep copy of a (possibly frozen) JSON-like object"""
+    if isinstance(x, dict):
+        return {k: thaw(v) for k, v in x.items()}
+    if isinstance(x, list):
+        return [thaw(v) for v in x]
+    return x
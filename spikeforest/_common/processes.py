@@ -0,0 +1,17 @@
+import os
+from typing import Union
+
+
+def pid_alive(pid: Union[int, None]) -> bool:
+    """Whether a process with this pid is running on this host (None: no process)"""
+    if pid is None:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1 @@
+from .convert_recordings_to_compressed import convert_recordings_to_compressed
@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+from ..load_extractors import load_recording_extractor
+from ..load_extractors.CompressedRecordingExtractor.CompressedRecordingExtractor import write_compressed_recording
+from ..load_spikeforest_recordings.SFRecording import SFRecording
+
+# Each recording is written to <output_dir>/<study set>/<study>/<recording>.sfcr in the
+# compressed recording format (see CompressedRecordingExtractor), one block (of time) at a
+# time. A file only appears under its final name once it is complete; until then the blocks
+# written so far are recorded next to it (see write_compressed_recording), so a rerun skips
+# the recordings already converted and continues the others after their last written block.
+COMPRESSED_RECORDING_EXTENSION = '.sfcr'
+
+
+def convert_recordings_to_compressed(
+    recordings: List[SFRecording],
+    output_dir: str,
+    *,
+    block_duration_sec: float = 1,
+    compress: bool = True,
+    compression_level: int = 6,
+    num_workers: int = 4,
+    num_threads: int = 4
+) -> List[dict]:
+    """Converts recordings (e.g. from load_spikeforest_recordings()) to the compressed recording format
+
+    Recordings are converted in num_workers parallel processes, and the blocks
+    of each recording are read and compressed by num_threads threads. With
+    compress False the blocks are stored uncompressed. Returns
+    a recording object (recording_format 'compressed') for each recording, to
+    be passed to load_recording_extractor.
+    """
+    tasks = [
+        dict(
+            recording_object=R.recording_object,
+            path=os.path.join(output_dir, R.study_set_name, R.study_name, R.recording_name + COMPRESSED_RECORDING_EXTENSION),
+            label=f'{R.study_set_name}/{R.study_name}/{R.recording_name}',
+            block_frames=int(block_duration_sec * R.sampling_frequency),
+            compress=compress,
+            compression_level=compression_level,
+            num_threads=num_threads
+        )
+        for R in recordings
+    ]
+    if num_workers <= 1:
+        return [_convert_recording_to_compressed(**t) for t in tasks]
+    results = {}
+    errors = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(_convert_recording_to_compressed, **t): t for t in tasks}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]['path']] = future.result()
+            except Exception as e:
+                print(f'Problem converting {futures[future]["label"]}: {e}')
+                errors.append(futures[future]['label'])
+    if len(errors) > 0:
+        raise Exception(f'Problem converting {len(errors)} recording(s): {", ".join(errors)}')
+    return [results[t['path']] for t in tasks]
+
+
+def _convert_recording_to_compressed(*, recording_object: dict, path: str, label: str, block_frames: int, compress: bool, compression_level: int, num_threads: int) -> dict:
+    if os.path.exists(path):
+        print(f'Already converted: {label}')
+    else:
+        recording = load_recording_extractor(recording_object)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_compressed_recording(recording, path, block_frames=block_frames, compress=compress, compression_level=compression_level,
+                                   num_threads=num_threads, resume=True)
+        print(f'Converted {label}')
+    return {
+        'recording_format': 'compressed',
+        'data': {
+            'raw': os.path.abspath(path)
+        }
+    }
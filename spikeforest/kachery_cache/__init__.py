@@ -0,0 +1 @@
+from .kachery_cache import KacheryCache, get_kachery_cache, load_file
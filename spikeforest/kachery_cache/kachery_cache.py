@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Union
+import kachery_cloud as kcl
+from .._common.processes import pid_alive
+
+# The index lives next to the kachery store and is shared by every process on
+# the node. Each locally materialized sha1 object has one row (path, size and
+# last access time); pins are rows owned by a process and are ignored once
+# that process is gone, so a crashed job never keeps objects alive forever.
+_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS objects (
+        sha1 TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS pins (
+        token TEXT PRIMARY KEY,
+        sha1 TEXT NOT NULL,
+        pid INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS objects_last_access ON objects (last_access)',
+    'CREATE INDEX IF NOT EXISTS pins_sha1 ON pins (sha1)'
+]
+
+
+class KacheryCache:
+    """Tracks sha1 objects materialized in the local kachery store and keeps them within a disk budget
+
+    load_file() works like kcl.load_file() but records each sha1 object with
+    its size and last access time, and then evicts the least recently used
+    objects (that are not pinned) while the store is over max_bytes. pin()
+    protects an object for as long as some Python object (e.g. an extractor
+    reading the file) is alive. With max_bytes None nothing is evicted.
+    """
+    def __init__(self, *, index_path: Union[str, None] = None, max_bytes: Union[int, None] = None):
+        self._store_dir = f'{kcl.get_kachery_cloud_dir()}/sha1'
+        self._index_path = index_path if index_path is not None else f'{kcl.get_kachery_cloud_dir()}/spikeforest-cache-index.db'
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self._index_path)), exist_ok=True)
+        with self._connect() as con:
+            for stmt in _SCHEMA:
+                con.execute(stmt)
+
+    def load_file(self, uri: str) -> Union[str, None]:
+        sha1 = _sha1_from_uri(uri)
+        if sha1 is None:
+            return kcl.load_file(uri)
+        path = kcl.load_file(uri)
+        if path is None:
+            return None
+        self._record(sha1, path)
+        self.enforce_budget(keep=sha1)
+        return path
+
+    def load_pinned_file(self, uri: str, owner: Any) -> Union[str, None]:
+        """Like load_file, but pins the object to owner before loading it, so that no
+        process can evict it between the download and the caller's own pin()"""
+        self.pin(uri, owner)
+        return self.load_file(uri)
+
+    def pin(self, uri: str, owner: Any):
+        """Protects the object for uri from eviction while owner is alive"""
+        sha1 = _sha1_from_uri(uri)
+        if sha1 is None:
+            return
+        token = uuid.uuid4().hex
+        with self._connect() as con:
+            con.execute('INSERT INTO pins (token, sha1, pid) VALUES (?, ?, ?)', (token, sha1, os.getpid()))
+        weakref.finalize(owner, _unpin, self._index_path, token)
+
+    def remove(self, uri_or_path: str) -> bool:
+        """Deletes an object from the local store now, unless it is pinned; returns whether it was deleted"""
+        sha1 = _sha1_from_uri(uri_or_path)
+        if sha1 is None:
+            sha1 = os.path.basename(uri_or_path)
+        with self._connect() as con:
+            con.execute('BEGIN IMMEDIATE')
+            self._drop_dead_pins(con)
+            if con.execute('SELECT 1 FROM pins WHERE sha1 = ?', (sha1,)).fetchone() is not None:
+                return False
+            row = con.execute('SELECT path FROM objects WHERE sha1 = ?', (sha1,)).fetchone()
+            path = row[0] if row is not None else None
+            if path is None and os.path.abspath(uri_or_path).startswith(self._store_dir + '/'):
+                path = uri_or_path
+            if path is None:
+                return False
+            self._delete(con, sha1, path)
+            return True
+
+    def enforce_budget(self, *, keep: Union[str, None] = None):
+        """Evicts least recently used unpinned objects until the store fits in max_bytes"""
+        if self.max_bytes is None:
+            return
+        with self._connect() as con:
+            con.execute('BEGIN IMMEDIATE')
+            total = con.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            self._drop_dead_pins(con)
+            candidates = con.execute(
+                'SELECT sha1, path, size FROM objects WHERE sha1 NOT IN (SELECT sha1 FROM pins) ORDER BY last_access'
+            ).fetchall()
+            for sha1, path, size in candidates:
+                if total <= self.max_bytes:
+                    break
+                if sha1 == keep:
+                    continue
+                self._delete(con, sha1, path)
+                total -= size
+
+    def scan(self):
+        """Indexes objects already in the local store (e.g. downloaded before the cache was used)"""
+        if not os.path.isdir(self._store_dir):
+            return
+        for dirpath, _, filenames in os.walk(self._store_dir):
+            for fname in filenames:
+                if len(fname) == 40 and '.' not in fname:
+                    self._record(fname, os.path.join(dirpath, fname), touch=False)
+
+    def report(self) -> dict:
+        with self._connect() as con:
+            self._drop_dead_pins(con)
+            num_objects, total = con.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects').fetchone()
+            num_pinned, pinned_bytes = con.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects WHERE sha1 IN (SELECT sha1 FROM pins)'
+            ).fetchone()
+            oldest = con.execute('SELECT MIN(last_access) FROM objects').fetchone()[0]
+        return {
+            'num_objects': num_objects,
+            'num_bytes': total,
+            'max_bytes': self.max_bytes,
+            'num_pinned': num_pinned,
+            'pinned_bytes': pinned_bytes,
+            'oldest_access': oldest
+        }
+
+    def _record(self, sha1: str, path: str, *, touch: bool = True):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._connect() as con:
+            if touch:
+                con.execute(
+                    'INSERT INTO objects (sha1, path, size, last_access) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(sha1) DO UPDATE SET path = excluded.path, size = excluded.size, last_access = excluded.last_access',
+                    (sha1, path, size, time.time())
+                )
+            else:
+                con.execute(
+                    'INSERT OR IGNORE INTO objects (sha1, path, size, last_access) VALUES (?, ?, ?, ?)',
+                    (sha1, path, size, os.path.getmtime(path))
+                )
+
+    def _delete(self, con: sqlite3.Connection, sha1: str, path: str):
+        # only ever delete files inside the kachery store
+        if os.path.abspath(path).startswith(self._store_dir + '/'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        con.execute('DELETE FROM objects WHERE sha1 = ?', (sha1,))
+
+    def _drop_dead_pins(self, con: sqlite3.Connection):
+        for (pid,) in con.execute('SELECT DISTINCT pid FROM pins').fetchall():
+            if not pid_alive(pid):
+                con.execute('DELETE FROM pins WHERE pid = ?', (pid,))
+
+    def _connect(self) -> sqlite3.Connection:
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = _connect(self._index_path)
+            self._local.con = con
+        return _Transaction(con)
+
+
+class _Transaction:
+    # commits (or rolls back) an explicit BEGIN on exit; autocommit otherwise
+    def __init__(self, con: sqlite3.Connection):
+        self._con = con
+
+    def __enter__(self):
+        return self._con
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._con.in_transaction:
+            if exc_type is None:
+                self._con.execute('COMMIT')
+            else:
+                self._con.execute('ROLLBACK')
+
+
+def _connect(index_path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(index_path, timeout=60, isolation_level=None, check_same_thread=False)
+    con.execute('PRAGMA journal_mode=WAL')
+    return con
+
+
+def _unpin(index_path: str, token: str):
+    try:
+        con = _connect(index_path)
+        try:
+            con.execute('DELETE FROM pins WHERE token = ?', (token,))
+        finally:
+            con.close()
+    except Exception:
+        # at interpreter shutdown; the pin is dropped once this process is gone
+        pass
+
+
+def _sha1_from_uri(uri: str) -> Union[str, None]:
+    if not uri.startswith('sha1://'):
+        return None
+    return uri.split('?')[0].split('/')[2]
+
+
+def load_file(uri: str) -> Union[str, None]:
+    """kcl.load_file, through the process-wide cache for sha1:// uris (other uris and local paths are not indexed)"""
+    if _sha1_from_uri(uri) is None:
+        return kcl.load_file(uri)
+    return get_kachery_cache().load_file(uri)
+
+
+_global_lock = threading.Lock()
+_global_cache: Union[KacheryCache, None] = None
+
+
+def get_kachery_cache() -> KacheryCache:
+    """The process-wide cache; the budget is set with SPIKEFOREST_KACHERY_CACHE_GB (unlimited if unset)"""
+    global _global_cache
+    with _global_lock:
+        if _global_cache is None:
+            max_gb = os.getenv('SPIKEFOREST_KACHERY_CACHE_GB', None)
+            _global_cache = KacheryCache(max_bytes=int(float(max_gb) * 1024 ** 3) if max_gb else None)
+        return _global_cache
@@ -0,0 +1,407 @@
+from spikeinterface.core import BaseRecording, BaseRecordingSegment
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Union
+import json
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+
+from ..MdaRecordingExtractorV2._file_handle_pool import file_handle_pool
+
+
+######### File format ###########
+# All integers are little-endian.
+#   magic                    4 bytes  b'SFCR'
+#   version                  int32
+#   metadata size            int64
+#   metadata                 utf-8 json (dtype, num_channels, num_frames, block_frames, codec, ...)
+#   num blocks               int64
+#   block offsets            int64 x (num_blocks + 1), absolute file offsets; the last one is the end of the data
+#   blocks                   each block holds block_frames frames (fewer for the last one)
+#
+# Block codecs:
+#   delta-shuffle-zlib (integer dtypes): per-channel first differences along time (wrapping in
+#       the dtype, so decoding is exact), stored channel-major, byte-shuffled, zlib-compressed
+#   shuffle-zlib (other dtypes): channel-major, byte-shuffled, zlib-compressed
+#   raw (uncompressed): frame-major, as in memory
+COMPRESSED_RECORDING_MAGIC = b'SFCR'
+COMPRESSED_RECORDING_VERSION = 1
+
+# Blocks are decoded on one thread pool shared by all readers (so opening extractors
+# doesn't start threads); a reader uses at most num_threads of its threads at once.
+_decode_executor = None
+_decode_executor_lock = threading.Lock()
+
+
+def _get_decode_executor() -> ThreadPoolExecutor:
+    global _decode_executor
+    with _decode_executor_lock:
+        if _decode_executor is None:
+            _decode_executor = ThreadPoolExecutor(max_workers=max(os.cpu_count() or 1, 4), thread_name_prefix='compressed-recording')
+        return _decode_executor
+
+
+class CompressedRecordingExtractor(BaseRecording):
+    extractor_name = 'CompressedRecording'
+    has_default_locations = True
+    has_unscaled = False
+    installed = True  # check at class level if installed or not
+    is_writable = True
+    mode = 'file'
+    installation_mesg = ""  # error message when not installed
+
+    def __init__(self, file_path: str, geom=None, cache_bytes: int = 256 * 1024 * 1024, num_threads: int = 4):
+        self._file_path = str(file_path)
+        self._reader = CompressedRecordingReader(self._file_path, cache_bytes=cache_bytes, num_threads=num_threads)
+        meta = self._reader.metadata
+        BaseRecording.__init__(self, sampling_frequency=float(meta['sampling_frequency']),
+                               channel_ids=np.arange(meta['num_channels']), dtype=meta['dtype'])
+        self.add_recording_segment(CompressedRecordingSegment(self._reader, float(meta['sampling_frequency'])))
+        if geom is None:
+            geom = meta.get('channel_locations', None)
+        if geom is not None:
+            if np.array(geom).ndim == 1:
+                # handle monotrode case
+                geom = [geom,]
+            self.set_dummy_probe_from_locations(np.array(geom))
+        self._kwargs = {'file_path': str(Path(file_path).absolute()),
+                        'geom': geom,
+                        'cache_bytes': cache_bytes,
+                        'num_threads': num_threads}
+
+
+class CompressedRecordingSegment(BaseRecordingSegment):
+    def __init__(self, reader, sampling_frequency):
+        self._reader = reader
+        BaseRecordingSegment.__init__(self, sampling_frequency=sampling_frequency)
+
+    def get_num_samples(self):
+        """Returns the number of samples in this signal block
+
+        Returns:
+            SampleIndex: Number of samples in the signal block
+        """
+        return self._reader.metadata['num_frames']
+
+    def get_traces(self,
+                   start_frame: Union[int, None] = None,
+                   end_frame: Union[int, None] = None,
+                   channel_indices: Union[List, None] = None,
+                   ) -> np.ndarray:
+        if start_frame is None:
+            start_frame = 0
+        if end_frame is None:
+            end_frame = self.get_num_samples()
+        return self._reader.read(start_frame, end_frame, channel_indices)
+
+
+class CompressedRecordingReader:
+    """Random access to a compressed recording file
+
+    Only the blocks overlapping a request are decoded (in parallel threads;
+    zlib releases the GIL), and decoded blocks are kept in an LRU cache.
+    """
+    def __init__(self, path: str, *, cache_bytes: int, num_threads: int):
+        self._path = path
+        self._cache_bytes = cache_bytes
+        self._num_threads = num_threads
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+        self._cache_num_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.metadata, self._offsets = _read_compressed_recording_header(path)
+        self._dtype = np.dtype(self.metadata['dtype'])
+
+    def read(self, start_frame: int, end_frame: int, channel_indices=None) -> np.ndarray:
+        meta = self.metadata
+        block_frames = meta['block_frames']
+        num_channels = meta['num_channels']
+        if channel_indices is None:
+            channel_indices = slice(None)
+        num_selected = len(np.arange(num_channels)[channel_indices])
+        out = np.empty((max(end_frame - start_frame, 0), num_selected), dtype=self._dtype)
+        if end_frame <= start_frame:
+            return out
+        b0 = start_frame // block_frames
+        b1 = (end_frame - 1) // block_frames
+        blocks = self._get_blocks(list(range(b0, b1 + 1)))
+        for b, X in zip(range(b0, b1 + 1), blocks):
+            block_start = b * block_frames
+            a = max(start_frame, block_start)
+            z = min(end_frame, block_start + X.shape[0])
+            out[a - start_frame:z - start_frame] = X[a - block_start:z - block_start][:, channel_indices]
+        return out
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            return {
+                'num_blocks': len(self._cache),
+                'num_bytes': self._cache_num_bytes,
+                'max_bytes': self._cache_bytes,
+                'hits': self.cache_hits,
+                'misses': self.cache_misses
+            }
+
+    def _get_blocks(self, block_indices: List[int]) -> List[np.ndarray]:
+        ret = {}
+        missing = []
+        with self._lock:
+            for b in block_indices:
+                X = self._cache.get(b, None)
+                if X is not None:
+                    self._cache.move_to_end(b)
+                    self.cache_hits += 1
+                    ret[b] = X
+                else:
+                    self.cache_misses += 1
+                    missing.append(b)
+        if len(missing) == 1 or self._num_threads <= 1:
+            decoded = [self._decode_block(b) for b in missing]
+        elif len(missing) > 1:
+            # one task per thread, each decoding every num_threads-th missing block
+            num_tasks = min(self._num_threads, len(missing))
+            futures = [_get_decode_executor().submit(self._decode_blocks, missing[k::num_tasks]) for k in range(num_tasks)]
+            decoded = [None] * len(missing)
+            for k, future in enumerate(futures):
+                decoded[k::num_tasks] = future.result()
+        else:
+            decoded = []
+        with self._lock:
+            for b, X in zip(missing, decoded):
+                ret[b] = X
+                if b not in self._cache:
+                    self._cache[b] = X
+                    self._cache_num_bytes += X.nbytes
+            while self._cache_num_bytes > self._cache_bytes and len(self._cache) > 0:
+                _, X = self._cache.popitem(last=False)
+                self._cache_num_bytes -= X.nbytes
+        return [ret[b] for b in block_indices]
+
+    def _decode_blocks(self, block_indices: List[int]) -> List[np.ndarray]:
+        return [self._decode_block(b) for b in block_indices]
+
+    def _decode_block(self, b: int) -> np.ndarray:
+        meta = self.metadata
+        num_frames = min(meta['block_frames'], meta['num_frames'] - b * meta['block_frames'])
+        data = file_handle_pool.pread(self._path, int(self._offsets[b]), int(self._offsets[b + 1] - self._offsets[b]))
+        X = decode_block(data, codec=meta['codec'], dtype=self._dtype, num_frames=num_frames, num_channels=meta['num_channels'])
+        X.flags.writeable = False
+        return X
+
+
+def encode_block(X: np.ndarray, *, codec: str, compression_level: int = 6) -> bytes:
+    # X is num_frames x num_channels
+    if codec == 'delta-shuffle-zlib':
+        D = np.empty_like(X.T, order='C')
+        D[:, 0] = X[0, :]
+        np.subtract(X[1:, :].T, X[:-1, :].T, out=D[:, 1:])
+    elif codec == 'shuffle-zlib':
+        D = np.ascontiguousarray(X.T)
+    elif codec == 'raw':
+        return np.ascontiguousarray(X).tobytes()
+    else:
+        raise Exception(f'Unexpected codec: {codec}')
+    shuffled = np.ascontiguousarray(D.view(np.uint8).reshape(-1, D.itemsize).T)
+    return zlib.compress(shuffled.data, compression_level)
+
+
+def decode_block(data: bytes, *, codec: str, dtype: np.dtype, num_frames: int, num_channels: int) -> np.ndarray:
+    if codec == 'raw':
+        return np.frombuffer(data, dtype=dtype).reshape(num_frames, num_channels).copy()
+    shuffled = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(dtype.itemsize, -1)
+    D = np.ascontiguousarray(shuffled.T).view(dtype).reshape(num_channels, num_frames)
+    if codec == 'delta-shuffle-zlib':
+        # cumsum in the integer dtype wraps exactly like the differences did
+        return np.cumsum(D, axis=1, dtype=dtype).T
+    elif codec == 'shuffle-zlib':
+        return D.T
+    else:
+        raise Exception(f'Unexpected codec: {codec}')
+
+
+def write_compressed_recording(recording: BaseRecording, path: str, *, block_frames: Union[int, None] = None, compression_level: int = 6, compress: bool = True,
+                               segment_index: int = 0, num_threads: int = 1, resume: bool = False):
+    """Writes one segment of a recording to the compressed recording format
+
+    Blocks are read and encoded by num_threads threads and written in order;
+    at most 2 x num_threads blocks are held in memory at once. With compress
+    False the blocks are stored uncompressed (codec 'raw').
+
+    With resume, the file is written as <path>.partial and renamed to path once
+    complete, and after each block the offsets of the blocks written so far are
+    recorded in <path>.partial.json. A later call with the same arguments
+    continues after the last recorded block, so an interrupted conversion only
+    redoes the blocks that were in flight.
+    """
+    dtype = np.dtype(recording.get_dtype())
+    if block_frames is None:
+        block_frames = int(recording.get_sampling_frequency())
+    num_frames = recording.get_num_frames(segment_index=segment_index)
+    num_blocks = (num_frames + block_frames - 1) // block_frames
+    if not compress:
+        codec = 'raw'
+    else:
+        codec = 'delta-shuffle-zlib' if np.issubdtype(dtype, np.integer) else 'shuffle-zlib'
+    metadata = {
+        'dtype': str(dtype),
+        'num_channels': recording.get_num_channels(),
+        'num_frames': num_frames,
+        'block_frames': block_frames,
+        'codec': codec,
+        'sampling_frequency': recording.get_sampling_frequency(),
+        'channel_locations': recording.get_channel_locations().tolist()
+    }
+    # as read back from the index of a partial file
+    metadata = json.loads(json.dumps(metadata))
+
+    def read_and_encode_block(b: int) -> bytes:
+        start_frame = b * block_frames
+        end_frame = min(start_frame + block_frames, num_frames)
+        X = recording.get_traces(segment_index=segment_index, start_frame=start_frame, end_frame=end_frame)
+        return encode_block(np.asarray(X, dtype=dtype), codec=codec, compression_level=compression_level)
+
+    if not resume:
+        file_handle_pool.invalidate(path)
+        try:
+            with open(path, 'wb') as f:
+                offsets = _write_compressed_recording_header(f, metadata, num_blocks)
+                _write_blocks(f, offsets, 0, read_and_encode_block, num_threads=num_threads)
+                _write_offsets(f, offsets)
+        except BaseException:
+            # don't leave an incomplete file under the final name
+            if os.path.exists(path):
+                os.unlink(path)
+            raise
+        return
+
+    partial_path = path + '.partial'
+    index_path = partial_path + '.json'
+    num_written = _resumable_num_blocks(partial_path, index_path, metadata)
+    complete = False
+    try:
+        with open(partial_path, 'r+b' if num_written > 0 else 'w+b') as f:
+            if num_written > 0:
+                offsets = np.zeros(num_blocks + 1, dtype='<i8')
+                offsets[:num_written + 1] = _read_json(index_path)['offsets']
+                f.truncate(int(offsets[num_written]))
+                f.seek(int(offsets[num_written]))
+            else:
+                offsets = _write_compressed_recording_header(f, metadata, num_blocks)
+
+            def on_block_written(b: int):
+                nonlocal num_written
+                # the index never gets ahead of the data
+                f.flush()
+                os.fsync(f.fileno())
+                _write_json_atomic(index_path, {'metadata': metadata, 'offsets': offsets[:b + 2].tolist()})
+                num_written = b + 1
+
+            _write_blocks(f, offsets, num_written, read_and_encode_block, num_threads=num_threads, on_block_written=on_block_written)
+            _write_offsets(f, offsets)
+        complete = True
+    finally:
+        if not complete and num_written == 0 and os.path.exists(partial_path):
+            # nothing to resume from
+            os.unlink(partial_path)
+    file_handle_pool.invalidate(path)
+    os.replace(partial_path, path)
+    if os.path.exists(index_path):
+        os.unlink(index_path)
+
+
+def _write_compressed_recording_header(f, metadata: dict, num_blocks: int) -> np.ndarray:
+    # returns the block offsets, with that of the first block filled in
+    metadata_bytes = json.dumps(metadata).encode('utf-8')
+    offsets = np.zeros(num_blocks + 1, dtype='<i8')
+    f.write(COMPRESSED_RECORDING_MAGIC)
+    f.write(struct.pack('<i', COMPRESSED_RECORDING_VERSION))
+    f.write(struct.pack('<q', len(metadata_bytes)))
+    f.write(metadata_bytes)
+    f.write(struct.pack('<q', num_blocks))
+    # reserve the offset table and fill it in once the block sizes are known
+    f.write(offsets.tobytes())
+    offsets[0] = f.tell()
+    return offsets
+
+
+def _write_blocks(f, offsets: np.ndarray, first_block: int, read_and_encode_block, *, num_threads: int, on_block_written=None):
+    num_blocks = len(offsets) - 1
+
+    def write_block(b: int, data: bytes):
+        f.write(data)
+        offsets[b + 1] = f.tell()
+        if on_block_written is not None:
+            on_block_written(b)
+
+    if num_threads <= 1:
+        for b in range(first_block, num_blocks):
+            write_block(b, read_and_encode_block(b))
+        return
+    with ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix='compressed-recording-writer') as executor:
+        pending = deque()
+        b_written = first_block
+        for b in range(first_block, num_blocks):
+            pending.append(executor.submit(read_and_encode_block, b))
+            while len(pending) >= 2 * num_threads or (b == num_blocks - 1 and len(pending) > 0):
+                write_block(b_written, pending.popleft().result())
+                b_written += 1
+
+
+def _write_offsets(f, offsets: np.ndarray):
+    # the offset table directly precedes the first block
+    f.seek(int(offsets[0]) - offsets.nbytes)
+    f.write(offsets.tobytes())
+
+
+def _resumable_num_blocks(partial_path: str, index_path: str, metadata: dict) -> int:
+    # the number of blocks of a partial file that can be kept (0 unless it was written with the same metadata)
+    if not os.path.exists(partial_path) or not os.path.exists(index_path):
+        return 0
+    try:
+        index = _read_json(index_path)
+    except ValueError:
+        return 0
+    if index.get('metadata', None) != metadata:
+        return 0
+    num_written = len(index['offsets']) - 1
+    if os.path.getsize(partial_path) < index['offsets'][-1]:
+        return 0
+    return num_written
+
+
+def _read_json(path: str):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path: str, x):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(x, f)
+    os.replace(tmp_path, path)
+
+
+def _read_compressed_recording_header(path: str):
+    metadata, metadata_size = _read_compressed_recording_metadata(lambda offset, size: file_handle_pool.pread(path, offset, size), path)
+    num_blocks, = struct.unpack('<q', file_handle_pool.pread(path, 16 + metadata_size, 8))
+    offsets = np.frombuffer(file_handle_pool.pread(path, 16 + metadata_size + 8, 8 * (num_blocks + 1)), dtype='<i8')
+    return metadata, offsets
+
+
+def _read_compressed_recording_metadata(read, label: str):
+    # read(offset, size) -> bytes; returns the metadata and its size in bytes
+    prefix = read(0, 16)
+    if len(prefix) < 16 or prefix[:4] != COMPRESSED_RECORDING_MAGIC:
+        raise Exception(f'Not a compressed recording file: {label}')
+    version, = struct.unpack_from('<i', prefix, 4)
+    if version != COMPRESSED_RECORDING_VERSION:
+        raise Exception(f'Unsupported compressed recording version {version}: {label}')
+    metadata_size, = struct.unpack_from('<q', prefix, 8)
+    metadata = json.loads(read(16, metadata_size).decode('utf-8'))
+    return metadata, metadata_size
@@ -1,14 +1,23 @@
 from spikeinterface.core import BaseRecording, BaseRecordingSegment, BaseSorting, BaseSortingSegment
 from spikeinterface.core import write_binary_recording
 
-from typing import Union, List
+from typing import Union, List, NamedTuple, Tuple
+import bisect
+import io
 import json
+import mmap
 import numpy as np
 from pathlib import Path
 import struct
 import os
-import tempfile
 import traceback
+from ._file_handle_pool import file_handle_pool
+from ._http_range_reader import get_http_range_reader
+from ._chunk_iterator import iter_chunks
+from ._header_cache import header_cache, _cache_key
+from ._sequential_prefetcher import SequentialPrefetcher
+from ._trace_block_cache import CachedRecordingSegment, DEFAULT_BLOCK_FRAMES
+from ._trace_conversion import conversion_dtype, convert_traces, prepare_conversion_output, CONVERSION_BLOCK_BYTES
 
 
 class MdaRecordingExtractorV2(BaseRecording):
@@ -20,31 +29,160 @@ class MdaRecordingExtractorV2(BaseRecording):
     mode = 'folder'
     installation_mesg = ""  # error message when not installed
 
-    def __init__(self, raw_path: str, params: dict, geom):
+    def __init__(self, raw_path: Union[str, List[str]], params: dict, geom, use_memmap: bool = False, prefetch_buffers: int = 0,
+                 block_cache: bool = False, block_cache_frames: int = DEFAULT_BLOCK_FRAMES, concatenate: bool = False,
+                 gain_to_uV=None, offset_to_uV=None):
+        # raw_path may be a list of files with the same channels and dtype (e.g. hourly parts of a
+        # long recording), read either as one segment per file or as a single concatenated segment.
+        # With use_memmap, get_traces returns read-only views into the mapped files; otherwise it
+        # returns arrays owned by the caller (which may be modified in place).
         self._dataset_params = params
         self._timeseries_path = raw_path
-        self._diskreadmda = DiskReadMda(str(self._timeseries_path))
+        raw_paths = [str(p) for p in raw_path] if isinstance(raw_path, (list, tuple)) else [str(raw_path)]
+        if len(raw_paths) == 0:
+            raise Exception('No raw paths given for MdaRecordingExtractorV2')
+        self._diskreadmdas = [DiskReadMda(p, use_memmap=use_memmap) for p in raw_paths]
+        self._diskreadmda = self._diskreadmdas[0]
         dtype = self._diskreadmda.dt()
         num_channels = self._diskreadmda.N1()
+        for p, d in zip(raw_paths, self._diskreadmdas):
+            if len(d.dims()) != 2 or d.N1() != num_channels or d.dt() != dtype:
+                raise Exception(f'Incompatible raw file (expected {num_channels} channels of {dtype}, got dims {d.dims()} of {d.dt()}): {p}')
         sampling_frequency=float(self._dataset_params['samplerate'])
         BaseRecording.__init__(self, sampling_frequency=sampling_frequency,
                                channel_ids=np.arange(num_channels), dtype=dtype)
-        rec_segment = MdaRecordingSegment(self._diskreadmda, sampling_frequency)
-        self.add_recording_segment(rec_segment)
+        rec_segments = [
+            MdaRecordingSegment(d, sampling_frequency, prefetch_buffers=prefetch_buffers, return_views=use_memmap)
+            for d in self._diskreadmdas
+        ]
+        cache_keys = [_cache_key('traces', p) for p in raw_paths] if block_cache else None
+        if concatenate and len(rec_segments) > 1:
+            rec_segments = [ConcatenatedMdaRecordingSegment(rec_segments, sampling_frequency)]
+            cache_keys = [tuple(cache_keys)] if block_cache else None
+        for i, rec_segment in enumerate(rec_segments):
+            if block_cache:
+                # blocks are shared by all extractors reading the same version of this file
+                rec_segment = CachedRecordingSegment(rec_segment, cache_key=cache_keys[i], block_frames=block_cache_frames)
+            self.add_recording_segment(rec_segment)
         if np.array(geom).ndim == 1:
             # handle monotrode case
             geom = [geom,]
         self.set_dummy_probe_from_locations(np.array(geom))
-        self._kwargs = {'raw_path': str(Path(raw_path).absolute()),
+        if gain_to_uV is not None or offset_to_uV is not None:
+            # enables return_scaled=True (which then converts in a single pass, see get_traces)
+            self.set_channel_gains(1.0 if gain_to_uV is None else gain_to_uV)
+            self.set_channel_offsets(0.0 if offset_to_uV is None else offset_to_uV)
+        self._kwargs = {'raw_path': [str(Path(p).absolute()) for p in raw_paths] if isinstance(raw_path, (list, tuple)) else str(Path(raw_path).absolute()),
                         'params': params,
-                        'geom': geom}
+                        'geom': geom,
+                        'use_memmap': use_memmap,
+                        'prefetch_buffers': prefetch_buffers,
+                        'block_cache': block_cache,
+                        'block_cache_frames': block_cache_frames,
+                        'concatenate': concatenate,
+                        'gain_to_uV': gain_to_uV,
+                        'offset_to_uV': offset_to_uV}
+
+    def prefetch_stats(self, segment_index: Union[int, None] = None):
+        """Read-ahead statistics of a segment (None if prefetch_buffers is 0)"""
+        segment_index = self._check_segment_index(segment_index)
+        rs = self._recording_segments[segment_index]
+        if isinstance(rs, CachedRecordingSegment):
+            rs = rs.parent_segment
+        return rs.prefetch_stats()
+
+    def block_cache_stats(self, segment_index: Union[int, None] = None):
+        """Hit rate of this extractor's reads through the trace block cache (None if block_cache is off)"""
+        segment_index = self._check_segment_index(segment_index)
+        rs = self._recording_segments[segment_index]
+        if not isinstance(rs, CachedRecordingSegment):
+            return None
+        return rs.cache_stats()
+
+    def get_traces(self,
+                   segment_index: Union[int, None] = None,
+                   start_frame: Union[int, None] = None,
+                   end_frame: Union[int, None] = None,
+                   channel_ids: Union[List, None] = None,
+                   order: Union[str, None] = None,
+                   return_scaled=False,
+                   *,
+                   dtype=None,
+                   gain=None,
+                   offset=None,
+                   out: Union[np.ndarray, None] = None
+                   ):
+        """BaseRecording.get_traces, plus an optional fused conversion
+
+        With dtype, gain, offset or out, returns traces * gain + offset cast to
+        dtype (default float32 when scaling, or the dtype of out) in a single
+        blockwise pass, without an intermediate array of the file dtype. gain and
+        offset are scalars or per-channel arrays. return_scaled uses the same path
+        with the gain_to_uV and offset_to_uV channel properties.
+        """
+        if return_scaled:
+            if gain is not None or offset is not None:
+                raise Exception('Cannot use gain or offset together with return_scaled')
+            if not self.has_scaled_traces():
+                raise ValueError('This recording do not support return_scaled=True (need gain_to_uV and offset_'
+                                 'to_uV properties)')
+            channel_indices = self.ids_to_indices(channel_ids, prefer_slice=True)
+            gain = self.get_property('gain_to_uV')[channel_indices]
+            offset = self.get_property('offset_to_uV')[channel_indices]
+        if conversion_dtype(dtype, gain, offset, out) is None:
+            return BaseRecording.get_traces(self, segment_index=segment_index, start_frame=start_frame, end_frame=end_frame,
+                                            channel_ids=channel_ids, order=order)
+        segment_index = self._check_segment_index(segment_index)
+        channel_indices = self.ids_to_indices(channel_ids, prefer_slice=True)
+        rs = self._recording_segments[segment_index]
+        kwargs = dict(dtype=dtype, gain=gain, offset=offset, out=out)
+        if isinstance(rs, MdaRecordingSegment):
+            traces = rs.get_traces(start_frame=start_frame, end_frame=end_frame, channel_indices=channel_indices, **kwargs)
+        else:
+            X = rs.get_traces(start_frame=start_frame, end_frame=end_frame, channel_indices=channel_indices)
+            traces = convert_traces(X, prepare_conversion_output(X.shape[0], X.shape[1], conversion_dtype(**kwargs), out), gain=gain, offset=offset)
+        if order is not None and out is None:
+            assert order in ["C", "F"]
+            traces = np.asanyarray(traces, order=order)
+        return traces
+
+    def iter_traces(self,
+                    chunk_frames: int,
+                    *,
+                    margin_frames: int = 0,
+                    channel_ids: Union[List, None] = None,
+                    segment_index: Union[int, None] = None,
+                    prefetch: int = 2):
+        """Yields (start_frame, traces) chunks of shape (num_frames, num_channels) without loading the whole recording
+
+        See MdaRecordingSegment.iter_traces
+        """
+        segment_index = self._check_segment_index(segment_index)
+        channel_indices = self.ids_to_indices(channel_ids, prefer_slice=True)
+        rs = self._recording_segments[segment_index]
+        if isinstance(rs, CachedRecordingSegment):
+            # a one-pass scan would only flush the cache
+            rs = rs.parent_segment
+        return rs.iter_traces(chunk_frames, margin_frames=margin_frames, channel_indices=channel_indices, prefetch=prefetch)
 
 
 class MdaRecordingSegment(BaseRecordingSegment):
-    def __init__(self, diskreadmda, sampling_frequency):
+    def __init__(self, diskreadmda, sampling_frequency, prefetch_buffers: int = 0, return_views: bool = False):
         self._diskreadmda = diskreadmda
+        # npy files are always mapped, so without return_views their read-only views are copied
+        self._return_views = return_views
         BaseRecordingSegment.__init__(self, sampling_frequency=sampling_frequency)
         self._num_samples = self._diskreadmda.N2()
+        # opt-in read-ahead for sequential scans (e.g. chunked filtering), see SequentialPrefetcher
+        self._prefetcher = None
+        if prefetch_buffers > 0:
+            self._prefetcher = SequentialPrefetcher(
+                self._diskreadmda.readFramesInto,
+                num_rows=self._diskreadmda.N1(),
+                num_frames=self._num_samples,
+                dtype=self._diskreadmda.dt(),
+                num_buffers=prefetch_buffers
+            )
 
     def get_num_samples(self):
         """Returns the number of samples in this signal block
@@ -54,6 +192,109 @@ class MdaRecordingSegment(BaseRecordingSegment):
         """
         return self._num_samples
 
+    def get_traces(self,
+                   start_frame: Union[int, None] = None,
+                   end_frame: Union[int, None] = None,
+                   channel_indices: Union[List, None] = None,
+                   *,
+                   dtype=None,
+                   gain=None,
+                   offset=None,
+                   out: Union[np.ndarray, None] = None
+                   ) -> np.ndarray:
+        """With dtype, gain, offset or out, returns traces * gain + offset cast to dtype
+
+        The cast and scaling are done blockwise straight from the mapped (or
+        prefetched) data into the output, which may be preallocated with out. In
+        pread mode the file is read block by block as well, so no full-size array
+        of the file dtype is allocated.
+        """
+        if start_frame is None:
+            start_frame = 0
+        if end_frame is None:
+            end_frame = self.get_num_samples()
+        if _is_all_channels(channel_indices):
+            channel_indices = None
+        target_dtype = conversion_dtype(dtype, gain, offset, out)
+        if target_dtype is not None:
+            return self._get_converted_traces(start_frame, end_frame, channel_indices, target_dtype, gain, offset, out)
+        recordings = self._read_traces(start_frame, end_frame, channel_indices)
+        if not self._return_views and not recordings.flags.writeable:
+            recordings = np.array(recordings, order='F')
+        return recordings.T
+
+    def _read_traces(self, start_frame, end_frame, channel_indices):
+        # channels x frames; in memmap mode this is a view into the file (the transpose in
+        # get_traces is a view as well), copied only when a channel subset requires gathering rows
+        if self._prefetcher is not None:
+            recordings = self._prefetcher.read(start_frame, end_frame)
+            if channel_indices is not None:
+                recordings = recordings[channel_indices]
+            return recordings
+        return self._diskreadmda.readChunk(i1=0, i2=start_frame, N1=self._diskreadmda.N1(),
+                                           N2=end_frame - start_frame, channels=channel_indices)
+
+    def iter_traces(self,
+                    chunk_frames: int,
+                    *,
+                    margin_frames: int = 0,
+                    channel_indices: Union[List, None] = None,
+                    prefetch: int = 2):
+        """Yields (start_frame, traces) for consecutive chunks of chunk_frames frames
+
+        With margin_frames > 0 each chunk is extended by up to margin_frames on both
+        sides (clipped at the ends of the recording), e.g. for filtering; start_frame is
+        always the frame of the first row of the yielded traces. With prefetch > 0 the
+        next chunks are read on a background thread.
+        """
+        if _is_all_channels(channel_indices):
+            channel_indices = None
+        for start_frame, X in self._diskreadmda.iterChunks(chunk_frames, margin=margin_frames, channels=channel_indices, prefetch=prefetch):
+            yield (start_frame, X.T)
+
+    def prefetch_stats(self):
+        if self._prefetcher is None:
+            return None
+        return self._prefetcher.stats()
+
+    def _get_converted_traces(self, start_frame, end_frame, channel_indices, dtype, gain, offset, out):
+        d = self._diskreadmda
+        num_channels = d.N1() if channel_indices is None else len(np.arange(d.N1())[channel_indices])
+        ret = prepare_conversion_output(end_frame - start_frame, num_channels, dtype, out)
+        if self._prefetcher is not None or d._memmap is not None or d._npy_array is not None:
+            # the source is a view (or an already loaded buffer), so convert it directly
+            X = self._read_traces(start_frame, end_frame, channel_indices).T
+            return convert_traces(X, ret, gain=gain, offset=offset)
+        block_frames = max(CONVERSION_BLOCK_BYTES * 4 // max(d.N1() * d.numBytesPerEntry(), 1), 1)
+        for a in range(start_frame, end_frame, block_frames):
+            b = min(a + block_frames, end_frame)
+            X = self.get_traces(start_frame=a, end_frame=b, channel_indices=channel_indices)
+            convert_traces(X, ret[a - start_frame:b - start_frame], gain=gain, offset=offset)
+        return ret
+
+
+class ConcatenatedMdaRecordingSegment(BaseRecordingSegment):
+    """A single segment made of consecutive MdaRecordingSegments (one per file)
+
+    get_traces locates the parts with a binary search over the cumulative
+    frame counts. A range within one part is served by that part (a view in
+    memmap mode); only ranges spanning a boundary are stitched into a new array.
+    """
+    def __init__(self, parts: List[MdaRecordingSegment], sampling_frequency):
+        BaseRecordingSegment.__init__(self, sampling_frequency=sampling_frequency)
+        self._parts = parts
+        # _offsets[k] is the first frame of part k; the last entry is the total
+        self._offsets = [0]
+        for part in parts:
+            self._offsets.append(self._offsets[-1] + part.get_num_samples())
+
+    @property
+    def parts(self):
+        return self._parts
+
+    def get_num_samples(self):
+        return self._offsets[-1]
+
     def get_traces(self,
                    start_frame: Union[int, None] = None,
                    end_frame: Union[int, None] = None,
@@ -63,16 +304,59 @@ class MdaRecordingSegment(BaseRecordingSegment):
             start_frame = 0
         if end_frame is None:
             end_frame = self.get_num_samples()
-        recordings = self._diskreadmda.readChunk(i1=0, i2=start_frame, N1=self._diskreadmda.N1(),
-                                                 N2=end_frame - start_frame)
-        recordings = recordings[channel_indices, :].T
-        return recordings
+        end_frame = max(end_frame, start_frame)
+        k0 = max(bisect.bisect_right(self._offsets, start_frame) - 1, 0)
+        k1 = max(bisect.bisect_left(self._offsets, end_frame) - 1, k0)
+        k0 = min(k0, len(self._parts) - 1)
+        k1 = min(k1, len(self._parts) - 1)
+        if k0 == k1:
+            o = self._offsets[k0]
+            return self._parts[k0].get_traces(start_frame=start_frame - o, end_frame=end_frame - o, channel_indices=channel_indices)
+        ret = None
+        for k in range(k0, k1 + 1):
+            o = self._offsets[k]
+            a = max(start_frame, o)
+            z = min(end_frame, self._offsets[k + 1])
+            X = self._parts[k].get_traces(start_frame=a - o, end_frame=z - o, channel_indices=channel_indices)
+            if ret is None:
+                ret = np.empty((end_frame - start_frame, X.shape[1]), dtype=X.dtype)
+            ret[a - start_frame:z - start_frame] = X
+        return ret
+
+    def iter_traces(self,
+                    chunk_frames: int,
+                    *,
+                    margin_frames: int = 0,
+                    channel_indices: Union[List, None] = None,
+                    prefetch: int = 2):
+        """See MdaRecordingSegment.iter_traces"""
+        def read_chunk(a, b):
+            X = self.get_traces(start_frame=a, end_frame=b, channel_indices=channel_indices)
+            if prefetch > 0:
+                # materialize mapped views on the read-ahead thread so that the I/O happens there
+                X = np.array(X)
+            return X
+        return iter_chunks(read_chunk, self.get_num_samples(), chunk_frames=chunk_frames, margin_frames=margin_frames, prefetch=prefetch)
+
+    def prefetch_stats(self):
+        # totals over the parts
+        stats = [part.prefetch_stats() for part in self._parts]
+        if stats[0] is None:
+            return None
+        return {key: sum(x[key] for x in stats) for key in stats[0]}
+
+
+def _is_all_channels(channel_indices):
+    return channel_indices is None or (isinstance(channel_indices, slice) and channel_indices == slice(None))
 
 
 ######### MDAIO ###########
+# dims above this are written as 64-bit (by MdaHeader and by MdaAppender as a file grows)
+MDA_MAX_32BIT_DIM = 2000000000
+
 class MdaHeader:
     def __init__(self, dt0, dims0):
-        uses64bitdims = (max(dims0) > 2e9)
+        uses64bitdims = (max(dims0) > MDA_MAX_32BIT_DIM)
         self.uses64bitdims = uses64bitdims
         self.dt_code = _dt_code_from_dt(dt0)
         self.dt = dt0
@@ -108,6 +392,7 @@ def npy_dtype_to_string(dt):
         "i1": 'int8',
         "i2": 'int16',
         "i4": 'int32',
+        "u1": 'uint8',
         "u2": 'uint16',
         "u4": 'uint32'
     }
@@ -115,24 +400,57 @@ def npy_dtype_to_string(dt):
 
 
 class DiskReadMda:
-    def __init__(self, path, header=None):
+    def __init__(self, path, header=None, *, use_memmap=False):
         self._npy_mode = False
         self._path = path
+        self._memmap = None
+        # C-ordered npy arrays (which can't be addressed as flat column-major entries)
+        self._npy_array = None
+        # bytes read from the file: the bytes requested from pread, or in memmap mode the
+        # bytes of the file pages that the returned data lies in (see _mapped_page_bytes)
+        self.bytes_read = 0
         if file_extension(path) == '.npy':
-            raise Exception('DiskReadMda implementation has not been tested for npy files')
             self._npy_mode = True
             if header:
                 raise Exception('header not allowed in npy mode for DiskReadMda')
+            self._open_npy()
+            return
         if header:
             self._header = header
             self._header.header_size = 0
         else:
             self._header = _read_header(self._path)
+        if use_memmap and not is_url(self._path):
+            self._memmap = self._open_memmap()
+
+    def _open_memmap(self):
+        # A single flat memmap over the payload. Since mda is column-major, any contiguous
+        # range of entries reshaped with order='F' is a view, so readChunk never copies.
+        H = self._header
+        if H is None or H.dimprod == 0:
+            return None
+        mm = np.memmap(self._path, dtype=H.dt, mode='r', offset=H.header_size, shape=(int(H.dimprod),))
+        # plain ndarray views (which keep the mapping alive) avoid np.memmap subclass overhead on every slice
+        return mm.view(np.ndarray)
+
+    def _open_npy(self):
+        # npy files are always memory mapped, once per instance
+        A = np.load(self._path, mmap_mode='r')
+        if A.ndim < 1 or A.ndim > 6:
+            raise Exception(f'Unsupported number of dimensions in npy file: {A.ndim}')
+        H = MdaHeader(npy_dtype_to_string(A.dtype), list(A.shape))
+        H.num_bytes_per_entry = A.itemsize
+        H.header_size = A.offset
+        self._header = H
+        if A.size == 0:
+            return
+        if A.flags.f_contiguous:
+            # same payload layout as mda, so all the mda code paths (memmap and pread) apply
+            self._memmap = np.reshape(A, (-1,), order='F').view(np.ndarray)
+        else:
+            self._npy_array = A.view(np.ndarray)
 
     def dims(self):
-        if self._npy_mode:
-            A = np.load(self._path, mmap_mode='r')
-            return A.shape
         return self._header.dims
 
     def N1(self):
@@ -145,36 +463,36 @@ class DiskReadMda:
         return self.dims()[2]
 
     def dt(self):
-        if self._npy_mode:
-            A = np.load(self._path, mmap_mode='r')
-            return npy_dtype_to_string(A.dtype)
         return self._header.dt
 
     def numBytesPerEntry(self):
-        if self._npy_mode:
-            A = np.load(self._path, mmap_mode='r')
-            return A.itemsize
         return self._header.num_bytes_per_entry
 
-    def readChunk(self, i1=-1, i2=-1, i3=-1, N1=1, N2=1, N3=1):
+    def readChunk(self, i1=-1, i2=-1, i3=-1, N1=1, N2=1, N3=1, *, channels=None):
         # print("Reading chunk {} {} {} {} {} {}".format(i1,i2,i3,N1,N2,N3))
+        if channels is not None:
+            # channels (a slice or a list of row indices) is only supported for 2D reads
+            if i2 < 0 or i3 >= 0:
+                print("Channel subsets are only supported for 2D chunks")
+                return None
+            if N1 != self.N1():
+                print("Unable to support N1 {} != {}".format(N1, self.N1()))
+                return None
+            return self._read_chunk_channels(channels, i2, N2)
         if i2 < 0:
-            if self._npy_mode:
-                A = np.load(self._path, mmap_mode='r')
-                return A[:, :, i1:i1 + N1]
             return self._read_chunk_1d(i1, N1)
         elif i3 < 0:
             if N1 != self.N1():
                 print("Unable to support N1 {} != {}".format(N1, self.N1()))
                 return None
+            if self._npy_array is not None:
+                self.bytes_read += self._npy_rows_page_bytes(np.arange(N1), i2, N2)
+                return self._npy_array[:, i2:i2 + N2]
             X = self._read_chunk_1d(i1 + N1 * i2, N1 * N2)
 
             if X is None:
                 print('Problem reading chunk from file: ' + self._path)
                 return None
-            if self._npy_mode:
-                A = np.load(self._path, mmap_mode='r')
-                return A[:, i2:i2 + N2]
             return np.reshape(X, (N1, N2), order='F')
         else:
             if N1 != self.N1():
@@ -183,107 +501,227 @@ class DiskReadMda:
             if N2 != self.N2():
                 print("Unable to support N2 {} != {}".format(N2, self.N2()))
                 return None
-            if self._npy_mode:
-                A = np.load(self._path, mmap_mode='r')
-                return A[:, :, i3:i3 + N3]
+            if self._npy_array is not None:
+                return self._counted(self._npy_array[:, :, i3:i3 + N3])
             X = self._read_chunk_1d(i1 + N1 * i2 + N1 * N2 * i3, N1 * N2 * N3)
             return np.reshape(X, (N1, N2, N3), order='F')
 
-    def _read_chunk_1d(self, i, N):
-        offset = self._header.header_size + self._header.num_bytes_per_entry * i
-        if is_url(self._path):
-            tmp_fname = _download_bytes_to_tmpfile(self._path, offset, offset + self._header.num_bytes_per_entry * N)
-            try:
-                ret = self._read_chunk_1d_helper(tmp_fname, N, offset=0)
-            except:
-                ret = None
+    def iterChunks(self, chunk_size, *, margin=0, channels=None, prefetch=2):
+        # yields (i2, X) where X is an N1 x n chunk (or len(channels) x n) of a 2D array
+        N1 = self.N1()
+
+        def read_chunk(a, b):
+            X = self.readChunk(i1=0, i2=a, N1=N1, N2=b - a, channels=channels)
+            if X is None:
+                raise Exception('Problem reading chunk from file: ' + self._path)
+            mapped = self._memmap if self._memmap is not None else self._npy_array
+            if prefetch > 0 and mapped is not None and np.may_share_memory(X, mapped):
+                # materialize mapped views on the read-ahead thread so that the I/O happens there
+                X = np.array(X, order='F')
+            return X
+        return iter_chunks(read_chunk, self.N2(), chunk_frames=chunk_size, margin_frames=margin, prefetch=prefetch)
+
+    def readFramesInto(self, i2, out):
+        # fills out (a column-major N1 x n array) with the chunk starting at i2 of a 2D array
+        N2 = out.shape[1]
+        if self._memmap is not None or self._npy_array is not None:
+            # copying from the mapping is what pages the data in
+            np.copyto(out, self.readChunk(i1=0, i2=i2, N1=self.N1(), N2=N2))
+            return
+        num_read = self._read_into(self.N1() * i2, np.reshape(out, (-1,), order='F'))
+        if num_read is None or num_read < out.size:
+            raise Exception('Problem reading chunk from file: ' + self._path)
+
+    def _read_chunk_channels(self, channels, i2, N2):
+        N1 = self.N1()
+        if isinstance(channels, slice):
+            start, stop, step = channels.indices(N1)
+            if step > 0:
+                c0 = start
+                c1 = max(stop, start)
+                rows = slice(0, c1 - c0, step)
+            else:
+                channels = np.arange(start, stop, step)
+        if not isinstance(channels, slice):
+            channels = np.asarray(channels, dtype=np.int64)
+            if channels.size == 0:
+                return np.zeros((0, N2), dtype=self._header.dt)
+            channels = np.where(channels < 0, channels + N1, channels)
+            c0 = int(channels.min())
+            c1 = int(channels.max()) + 1
+            if channels[0] == c0 and c1 - c0 == channels.size and np.all(np.diff(channels) == 1):
+                # a block of neighboring channels can be served as a view
+                rows = slice(0, c1 - c0)
+            else:
+                rows = channels - c0
+        if self._npy_array is not None:
+            # rows of a C-ordered array are contiguous, so only the requested rows are paged in
+            rows_read = np.arange(N1)[channels] if isinstance(channels, slice) else np.unique(channels)
+            self.bytes_read += self._npy_rows_page_bytes(rows_read, i2, N2)
+            return self._npy_array[channels, i2:i2 + N2]
+        # mda entries are interleaved by frame (all channels of frame 0, then of frame 1, ...),
+        # so the requested channels of consecutive frames are only (N1 - (c1 - c0)) entries apart.
+        # Unless that gap spans a whole page, every page of the range is read either way, and a
+        # channel subset saves copying and memory, but no I/O.
+        b = self.numBytesPerEntry()
+        if self._memmap is not None:
+            A = np.reshape(self._read_chunk_1d(N1 * i2, N1 * N2, count=False), (N1, N2), order='F')
+            self.bytes_read += _mapped_page_bytes(self._header.header_size + b * (N1 * i2 + c0), (c1 - c0) * b, N1 * b, N2)
+            if isinstance(rows, slice):
+                return A[c0:c1][rows]
+            # gather only the requested rows out of the mapping
+            return A[channels]
+        # with a single positional read, the best we can do is the range from channel c0 of the
+        # first frame to channel c1-1 of the last
+        num_entries = (N2 - 1) * N1 + (c1 - c0) if N2 > 0 else 0
+        buf = np.empty(N1 * N2, dtype=self._header.dt)
+        num_read = self._read_into(c0 + N1 * i2, buf[:num_entries])
+        if num_read is None or num_read < num_entries:
+            print('Problem reading chunk from file: ' + self._path)
+            return None
+        A = np.reshape(buf, (N1, N2), order='F')
+        return A[rows]
+
+    def _read_chunk_1d(self, i, N, count=True):
+        if self._npy_array is not None:
+            # entries are addressed in column-major order, which is a gather for a C-ordered array
+            idx = np.unravel_index(np.arange(i, min(i + N, self._npy_array.size)), self._npy_array.shape, order='F')
+            ret = self._npy_array[idx]
+            if count:
+                self.bytes_read += ret.nbytes
             return ret
-        return self._read_chunk_1d_helper(self._path, N, offset=offset)
+        if self._memmap is not None:
+            ret = self._memmap[i:i + N]
+            if count:
+                b = self.numBytesPerEntry()
+                self.bytes_read += _mapped_page_bytes(self._header.header_size + b * i, ret.size * b, 0, 1)
+            return ret
+        ret = np.empty(N, dtype=self._header.dt)
+        num_read = self._read_into(i, ret)
+        if num_read is None:
+            return None
+        return ret[:num_read]
 
-    def _read_chunk_1d_helper(self, path0, N, *, offset):
-        f = open(path0, "rb")
+    def _counted(self, X):
+        self.bytes_read += X.nbytes
+        return X
+
+    def _npy_rows_page_bytes(self, rows, i2, N2):
+        # pages of frames i2 to i2+N2 of the given (ascending) rows of a C-ordered 2D npy array
+        b = self.numBytesPerEntry()
+        starts = self._header.header_size + b * (np.asarray(rows, dtype=np.int64) * self.N2() + i2)
+        return _mapped_page_bytes(starts, N2 * b)
+
+    def _read_into(self, i, out):
+        # fills the 1D array out with entries starting at entry i; returns the number of entries read
+        offset = self._header.header_size + self._header.num_bytes_per_entry * i
         try:
-            f.seek(offset)
-            ret = np.fromfile(f, dtype=self._header.dt, count=N)
-            f.close()
-            return ret
+            if is_url(self._path):
+                num_bytes = get_http_range_reader(self._path).readinto(offset, out)
+            else:
+                num_bytes = file_handle_pool.readinto(self._path, offset, out)
         except Exception as e:  # catch *all* exceptions
             print(e)
-            f.close()
             return None
+        self.bytes_read += num_bytes
+        return num_bytes // out.itemsize
+
+
+def _mapped_page_bytes(first_byte, run_bytes, stride=None, num_runs=None):
+    """Bytes of the file pages covering runs of run_bytes bytes
+
+    The runs start either at the ascending byte offsets first_byte (an array),
+    or at first_byte + k * stride for k < num_runs. A page shared by several
+    runs is counted once.
+    """
+    P = mmap.PAGESIZE
+    if run_bytes <= 0:
+        return 0
+    if stride is not None:
+        if num_runs <= 0:
+            return 0
+        if stride - run_bytes < P:
+            # no page fits in a gap between runs, so every page of the span is touched
+            last_byte = first_byte + stride * (num_runs - 1) + run_bytes - 1
+            return (last_byte // P - first_byte // P + 1) * P
+        first_byte = first_byte + stride * np.arange(num_runs, dtype=np.int64)
+    starts = np.asarray(first_byte, dtype=np.int64)
+    if starts.size == 0:
+        return 0
+    first = starts // P
+    last = (starts + run_bytes - 1) // P
+    # skip the pages already counted for earlier runs
+    covered = np.maximum.accumulate(last)
+    first[1:] = np.maximum(first[1:], covered[:-1] + 1)
+    return int(np.maximum(last - first + 1, 0).sum()) * P
 
 
 def is_url(path):
     return path.startswith('http://') or path.startswith('https://')
 
 
-def _download_bytes_to_tmpfile(url, start, end):
-    try:
-        import requests
-    except:
-        raise Exception('Unable to import module: requests')
-    headers = {"Range": "bytes={}-{}".format(start, end - 1)}
-    r = requests.get(url, headers=headers, stream=True)
-    fd, tmp_fname = tempfile.mkstemp()
-    with open(tmp_fname, 'wb') as f:
-        for chunk in r.iter_content(chunk_size=1024):
-            if chunk:
-                f.write(chunk)
-    return tmp_fname
+# 3 int32 fields followed by up to 6 int64 dims
+_MAX_MDA_HEADER_SIZE = 3 * 4 + 6 * 8
 
 
 def _read_header(path):
+    # parsed once per file version; callers get their own copy since they may modify it
+    H = header_cache.get('mda', path, _load_header)
+    if H is None:
+        return None
+    return _copy_header(H)
+
+
+def _load_header(path):
     if is_url(path):
-        tmp_fname = _download_bytes_to_tmpfile(path, 0, 200)
-        if not tmp_fname:
+        data = get_http_range_reader(path).read(0, _MAX_MDA_HEADER_SIZE)
+        if len(data) == 0:
             raise Exception('Problem downloading bytes from ' + path)
-        try:
-            ret = _read_header(tmp_fname)
-        except:
-            ret = None
-        Path(tmp_fname).unlink()
-        return ret
+        return _header_from_bytes(data)
 
-    f = open(path, "rb")
-    try:
-        dt_code = _read_int32(f)
-        num_bytes_per_entry = _read_int32(f)
-        num_dims = _read_int32(f)
-        uses64bitdims = False
-        if num_dims < 0:
-            uses64bitdims = True
-            num_dims = -num_dims
-        if num_dims < 1 or num_dims > 6:  # allow single dimension as of 12/6/17
-            print("Invalid number of dimensions: {}".format(num_dims))
-            f.close()
-            return None
-        dims = []
-        dimprod = 1
-        if uses64bitdims:
-            for j in range(0, num_dims):
-                tmp0 = _read_int64(f)
-                dimprod = dimprod * tmp0
-                dims.append(tmp0)
-        else:
-            for j in range(0, num_dims):
-                tmp0 = _read_int32(f)
-                dimprod = dimprod * tmp0
-                dims.append(tmp0)
-        dt = _dt_from_dt_code(dt_code)
-        if dt is None:
-            print("Invalid data type code: {}".format(dt_code))
-            f.close()
-            return None
-        H = MdaHeader(dt, dims)
-        if uses64bitdims:
-            H.uses64bitdims = True
-            H.header_size = 3 * 4 + H.num_dims * 8
-        f.close()
-        return H
-    except Exception as e:  # catch *all* exceptions
-        print(e)
-        f.close()
-        return None
+    data = file_handle_pool.pread(path, 0, _MAX_MDA_HEADER_SIZE)
+    return _header_from_bytes(data)
+
+
+def _copy_header(H):
+    ret = MdaHeader.__new__(MdaHeader)
+    ret.__dict__.update(H.__dict__)
+    ret.dims = list(H.dims)
+    return ret
+
+
+class NpyHeader(NamedTuple):
+    shape: Tuple[int, ...]
+    fortran_order: bool
+    dtype: np.dtype
+    header_size: int
+
+
+def _read_npy_header(path) -> NpyHeader:
+    return header_cache.get('npy', path, _load_npy_header)
+
+
+def _load_npy_header(path) -> NpyHeader:
+    return _npy_header_from_reader(lambda offset, size: file_handle_pool.pread(path, offset, size))
+
+
+def _npy_header_from_reader(read) -> NpyHeader:
+    # read(offset, size) -> bytes; the magic string and version are followed by
+    # the header length (2 bytes in version 1.0, 4 bytes after that)
+    prefix = read(0, 12)
+    if len(prefix) < 10:
+        raise Exception('Problem reading npy header')
+    if prefix[6] == 1:
+        header_size = 10 + struct.unpack_from('<H', prefix, 8)[0]
+    else:
+        header_size = 12 + struct.unpack_from('<I', prefix, 8)[0]
+    f = io.BytesIO(read(0, header_size))
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return NpyHeader(shape=shape, fortran_order=fortran_order, dtype=dtype, header_size=f.tell())
 
 
 def _dt_from_dt_code(dt_code):
@@ -352,6 +790,7 @@ def _write_header(path, H, rewrite=False):
     if rewrite:
         f = open(path, "r+b")
     else:
+        file_handle_pool.invalidate(path)
         f = open(path, "wb")
     try:
         _write_int32(f, H.dt_code)
@@ -379,17 +818,15 @@ def readmda(path):
     if H is None:
         print("Problem reading header of: {}".format(path))
         return None
-    f = open(path, "rb")
     try:
-        f.seek(H.header_size)
         # This is how I do the column-major order
-        ret = np.fromfile(f, dtype=H.dt, count=H.dimprod)
+        ret = np.empty(H.dimprod, dtype=H.dt)
+        num_bytes = file_handle_pool.readinto(path, H.header_size, ret)
+        ret = ret[:num_bytes // ret.itemsize]
         ret = np.reshape(ret, H.dims, order='F')
-        f.close()
         return ret
     except Exception as e:  # catch *all* exceptions
         print(e)
-        f.close()
         return None
 
 
@@ -440,28 +877,21 @@ def writemda(X, fname, *, dtype):
 
 
 def _writemda(X, fname, dt):
-    num_bytes_per_entry = get_num_bytes_per_entry_from_dt(dt)
     dt_code = _dt_code_from_dt(dt)
     if dt_code is None:
         print("Unexpected data type: {}".format(dt))
         return False
 
     if type(fname) == str:
+        file_handle_pool.invalidate(fname)
         f = open(fname, 'wb')
     else:
         f = fname
     try:
-        _write_int32(f, dt_code)
-        _write_int32(f, num_bytes_per_entry)
-        _write_int32(f, X.ndim)
-        for j in range(0, X.ndim):
-            _write_int32(f, X.shape[j])
+        H = MdaHeader(dt, list(X.shape))
+        H.write(f)
         # This is how I do column-major order
-        # A=np.reshape(X,X.size,order='F').astype(dt)
-        # A.tofile(f)
-
-        bytes0 = X.astype(dt).tobytes(order='F')
-        f.write(bytes0)
+        _write_array_blocks(f, X, dt)
 
         if type(fname) == str:
             f.close()
@@ -474,6 +904,29 @@ def _writemda(X, fname, dt):
         return False
 
 
+def _write_array_blocks(f, X, dt, *, buffer=None, block_bytes=16 * 1024 * 1024):
+    # Writes X in column-major order, casting one block of the last dimension at a time into a
+    # reusable buffer rather than making full-size cast and byte copies. Returns the buffer used.
+    X = np.asarray(X)
+    if X.dtype == np.dtype(dt) and X.flags.f_contiguous:
+        f.write(X.ravel(order='F'))
+        return buffer
+    if X.ndim == 0 or X.size == 0:
+        f.write(X.astype(dt).tobytes(order='F'))
+        return buffer
+    entries_per_column = int(np.prod(X.shape[:-1]))
+    columns_per_block = max(1, block_bytes // (max(entries_per_column, 1) * np.dtype(dt).itemsize))
+    columns_per_block = min(columns_per_block, X.shape[-1])
+    if buffer is None or buffer.dtype != np.dtype(dt) or buffer.size < entries_per_column * columns_per_block:
+        buffer = np.empty(entries_per_column * columns_per_block, dtype=dt)
+    for a in range(0, X.shape[-1], columns_per_block):
+        src = X[..., a:a + columns_per_block]
+        dst = np.reshape(buffer[:src.size], src.shape, order='F')
+        np.copyto(dst, src, casting='unsafe')
+        f.write(buffer[:src.size])
+    return buffer
+
+
 def readnpy(path):
     return np.load(path)
 
@@ -518,32 +971,16 @@ def _writenpy(X, path, *, dtype):
 
 
 def appendmda(X, path):
+    """Appends X along the last dimension of an existing mda file (see MdaAppender to append many blocks)"""
+    from .MdaWriter import MdaAppender
     if file_extension(path) == '.npy':
         raise Exception('appendmda not yet implemented for .npy files')
-    H = _read_header(path)
-    if H is None:
-        print("Problem reading header of: {}".format(path))
-        return None
-    if len(H.dims) != len(X.shape):
-        print("Incompatible number of dimensions in appendmda", H.dims, X.shape)
-        return None
-    num_entries_old = np.product(H.dims)
-    num_dims = len(H.dims)
-    for j in range(num_dims - 1):
-        if X.shape[j] != X.shape[j]:
-            print("Incompatible dimensions in appendmda", H.dims, X.shape)
-            return None
-    H.dims[num_dims - 1] = H.dims[num_dims - 1] + X.shape[num_dims - 1]
     try:
-        _write_header(path, H, rewrite=True)
-        f = open(path, "r+b")
-        f.seek(H.header_size + H.num_bytes_per_entry * num_entries_old)
-        A = np.reshape(X, X.size, order='F').astype(H.dt)
-        A.tofile(f)
-        f.close()
+        with MdaAppender(path) as appender:
+            appender.append(X)
+        return True
     except Exception as e:  # catch *all* exceptions
         print(e)
-        f.close()
         return False
 
 
@@ -572,10 +1009,12 @@ def _write_int64(f, val):
 
 
 def _header_from_file(f):
+    return _header_from_bytes(f.read(_MAX_MDA_HEADER_SIZE))
+
+
+def _header_from_bytes(data):
     try:
-        dt_code = _read_int32(f)
-        num_bytes_per_entry = _read_int32(f)
-        num_dims = _read_int32(f)
+        dt_code, num_bytes_per_entry, num_dims = struct.unpack_from('<iii', data, 0)
         uses64bitdims = False
         if num_dims < 0:
             uses64bitdims = True
@@ -583,18 +1022,7 @@ def _header_from_file(f):
         if num_dims < 1 or num_dims > 6:  # allow single dimension as of 12/6/17
             print("Invalid number of dimensions: {}".format(num_dims))
             return None
-        dims = []
-        dimprod = 1
-        if uses64bitdims:
-            for j in range(0, num_dims):
-                tmp0 = _read_int64(f)
-                dimprod = dimprod * tmp0
-                dims.append(tmp0)
-        else:
-            for j in range(0, num_dims):
-                tmp0 = _read_int32(f)
-                dimprod = dimprod * tmp0
-                dims.append(tmp0)
+        dims = list(struct.unpack_from('<{}{}'.format(num_dims, 'q' if uses64bitdims else 'i'), data, 3 * 4))
         dt = _dt_from_dt_code(dt_code)
         if dt is None:
             print("Invalid data type code: {}".format(dt_code))
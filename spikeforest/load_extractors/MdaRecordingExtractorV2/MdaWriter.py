@@ -0,0 +1,209 @@
+from typing import List, Union
+import numpy as np
+from spikeinterface.core import BaseRecording
+
+from .MdaRecordingExtractorV2 import MDA_MAX_32BIT_DIM, MdaHeader, _dt_code_from_dt, _read_header, _write_array_blocks, _write_int32, _write_int64
+from ._file_handle_pool import file_handle_pool
+
+
+class MdaWriter:
+    """Incrementally writes an mda file with bounded memory
+
+    The header is written up front and blocks are appended along the last
+    dimension (e.g. N1 x n chunks of frames for a recording), each cast into
+    a reusable buffer. If the size of the last dimension is not given, the
+    header uses 64-bit dims and the final size is filled in on close.
+
+    Example:
+        with MdaWriter('raw.mda', dtype='int16', dims=[num_channels, None]) as w:
+            for start_frame, traces in recording.iter_traces(chunk_frames):
+                w.write(traces.T)
+    """
+    def __init__(self, path: str, *, dtype: str, dims: List[Union[int, None]]):
+        if _dt_code_from_dt(dtype) is None:
+            raise Exception(f'Unexpected data type: {dtype}')
+        if len(dims) < 1 or any(d is None for d in dims[:-1]):
+            raise Exception(f'Invalid dims for MdaWriter: {dims}')
+        self._path = path
+        self._dtype = dtype
+        self._expected_last_dim = dims[-1]
+        self._leading_dims = [int(d) for d in dims[:-1]]
+        header_dims = self._leading_dims + [0 if dims[-1] is None else int(dims[-1])]
+        self._header = MdaHeader(dtype, header_dims)
+        if dims[-1] is None and not self._header.uses64bitdims:
+            # the final size is unknown, so reserve room for 64-bit dims
+            self._header.uses64bitdims = True
+            self._header.header_size = 3 * 4 + self._header.num_dims * 8
+        self._num_written = 0
+        self._buffer = None
+        file_handle_pool.invalidate(path)
+        self._f = open(path, 'wb')
+        self._header.write(self._f)
+
+    @property
+    def num_written(self):
+        """Size of the last dimension written so far"""
+        return self._num_written
+
+    def write(self, X: np.ndarray):
+        if self._f is None:
+            raise Exception('MdaWriter is closed')
+        X = np.asarray(X)
+        if len(self._leading_dims) == 0:
+            X = np.reshape(X, (-1,))
+        if X.ndim != len(self._leading_dims) + 1 or list(X.shape[:-1]) != self._leading_dims:
+            raise Exception(f'Incompatible block shape for MdaWriter: {X.shape} (dims {self._leading_dims + [None]})')
+        self._buffer = _write_array_blocks(self._f, X, self._dtype, buffer=self._buffer)
+        self._num_written += X.shape[-1]
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            if self._expected_last_dim is None:
+                self._header.dims = self._leading_dims + [self._num_written]
+                self._header.dimprod = int(np.prod(self._header.dims))
+                # rewrite the dims field in place
+                self._f.seek(3 * 4)
+                for d in self._header.dims:
+                    if self._header.uses64bitdims:
+                        _write_int64(self._f, d)
+                    else:
+                        _write_int32(self._f, d)
+            elif self._num_written != self._expected_last_dim:
+                raise Exception(f'MdaWriter: expected {self._expected_last_dim} entries in the last dimension, but {self._num_written} were written')
+        finally:
+            self._f.close()
+            self._f = None
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def write_recording_to_mda(recording: BaseRecording, path: str, *, chunk_frames: int = 30000 * 10, dtype: Union[str, None] = None, segment_index: int = 0):
+    """Writes one segment of a recording to a num_channels x num_frames mda file, chunk by chunk"""
+    if dtype is None:
+        dtype = str(recording.get_dtype())
+    num_frames = recording.get_num_frames(segment_index=segment_index)
+    with MdaWriter(path, dtype=dtype, dims=[recording.get_num_channels(), num_frames]) as w:
+        for start_frame in range(0, num_frames, chunk_frames):
+            end_frame = min(start_frame + chunk_frames, num_frames)
+            traces = recording.get_traces(segment_index=segment_index, start_frame=start_frame, end_frame=end_frame)
+            # traces are num_frames x num_channels; the transpose of a C-ordered chunk is already column-major
+            w.write(traces.T)
+
+
+class MdaAppender:
+    """Appends blocks along the last dimension of an existing mda file
+
+    The file stays open across appends, small blocks are batched in a write
+    buffer, and the dims field is updated in place on each flush (after the
+    data, so the header never covers unwritten entries). When the last
+    dimension crosses 2^31 the header is transparently switched to 64-bit dims.
+
+    Example:
+        with MdaAppender('raw.mda') as a:
+            for X in blocks:
+                a.append(X)
+    """
+    def __init__(self, path: str, *, buffer_bytes: int = 4 * 1024 * 1024):
+        H = _read_header(path)
+        if H is None:
+            raise Exception(f'Problem reading header of: {path}')
+        self._path = path
+        self._header = H
+        self._buffer_bytes = buffer_bytes
+        self._num_entries = int(np.prod(H.dims))
+        self._pending: List[np.ndarray] = []
+        self._pending_bytes = 0
+        self._pending_columns = 0
+        self._f = open(path, 'r+b')
+
+    @property
+    def dims(self):
+        """Current dims, including appended blocks that have not been flushed yet"""
+        return list(self._header.dims[:-1]) + [self._header.dims[-1] + self._pending_columns]
+
+    def append(self, X: np.ndarray):
+        if self._f is None:
+            raise Exception('MdaAppender is closed')
+        H = self._header
+        X = np.asarray(X)
+        if H.num_dims == 1:
+            X = np.reshape(X, (-1,))
+        if X.ndim != H.num_dims:
+            raise Exception(f'Incompatible number of dimensions in append: {H.dims} {X.shape}')
+        for j in range(H.num_dims - 1):
+            if X.shape[j] != H.dims[j]:
+                raise Exception(f'Incompatible dimensions in append: {H.dims} {X.shape}')
+        # a single cast into column-major order
+        A = np.empty(X.size, dtype=H.dt)
+        np.copyto(np.reshape(A, X.shape, order='F'), X, casting='unsafe')
+        self._pending.append(A)
+        self._pending_bytes += A.nbytes
+        self._pending_columns += X.shape[-1]
+        if self._pending_bytes >= self._buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        if self._f is None or len(self._pending) == 0:
+            return
+        H = self._header
+        new_last_dim = H.dims[-1] + self._pending_columns
+        if not H.uses64bitdims and new_last_dim > MDA_MAX_32BIT_DIM:
+            self._switch_to_64bit_dims()
+        self._f.seek(H.header_size + H.num_bytes_per_entry * self._num_entries)
+        for A in self._pending:
+            self._f.write(A)
+            self._num_entries += A.size
+        H.dims[-1] = new_last_dim
+        H.dimprod = self._num_entries
+        self._f.seek(3 * 4 + (H.num_dims - 1) * (8 if H.uses64bitdims else 4))
+        if H.uses64bitdims:
+            _write_int64(self._f, new_last_dim)
+        else:
+            _write_int32(self._f, new_last_dim)
+        self._f.flush()
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_columns = 0
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _switch_to_64bit_dims(self):
+        # shift the payload to make room for the larger header, copying backwards from the end
+        H = self._header
+        old_header_size = H.header_size
+        new_header_size = 3 * 4 + H.num_dims * 8
+        delta = new_header_size - old_header_size
+        payload_size = H.num_bytes_per_entry * self._num_entries
+        chunk_size = 16 * 1024 * 1024
+        end = payload_size
+        while end > 0:
+            start = max(0, end - chunk_size)
+            self._f.seek(old_header_size + start)
+            data = self._f.read(end - start)
+            self._f.seek(new_header_size + start)
+            self._f.write(data)
+            end = start
+        H.uses64bitdims = True
+        H.header_size = new_header_size
+        self._f.seek(0)
+        H.write(self._f)
@@ -0,0 +1,71 @@
+import queue
+import threading
+from typing import Any, Callable, Generator, Tuple, Union
+
+
+def iter_chunks(
+    read_chunk: Callable[[int, int], Any],
+    num_frames: int,
+    *,
+    chunk_frames: int,
+    margin_frames: int = 0,
+    prefetch: int = 2,
+    start_frame: int = 0,
+    end_frame: Union[int, None] = None
+) -> Generator[Tuple[int, Any], None, None]:
+    """Yields (start_frame, block) for consecutive chunks of [start_frame, end_frame).
+
+    read_chunk(a, b) must return the block for frames [a, b). With margin_frames > 0
+    each block is extended by up to margin_frames on both sides (clipped to the
+    recording), and the yielded start_frame is the frame of the first row of the
+    extended block. With prefetch > 0 the next chunks are read on a background
+    thread while the consumer processes the current one.
+    """
+    if chunk_frames <= 0:
+        raise Exception(f'Invalid chunk_frames: {chunk_frames}')
+    if end_frame is None:
+        end_frame = num_frames
+    ranges = []
+    for a in range(start_frame, end_frame, chunk_frames):
+        b = min(a + chunk_frames, end_frame)
+        ranges.append((max(a - margin_frames, 0), min(b + margin_frames, num_frames)))
+    if prefetch <= 0:
+        for a, b in ranges:
+            yield (a, read_chunk(a, b))
+        return
+
+    q: queue.Queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        try:
+            for a, b in ranges:
+                if not _put(('chunk', a, read_chunk(a, b))):
+                    return
+            _put(('done', None, None))
+        except BaseException as e:  # hand the error to the consumer
+            _put(('error', None, e))
+
+    thread = threading.Thread(target=_produce, name='chunk-readahead', daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, a, x = q.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise x
+            yield (a, x)
+    finally:
+        # also reached when the consumer stops iterating early
+        stop.set()
+        thread.join()
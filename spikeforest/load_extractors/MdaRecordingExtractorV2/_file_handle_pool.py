@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class _PooledFile:
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.refcount = 0
+        self.evicted = False
+        # only used on platforms without positional reads
+        self.lock = threading.Lock()
+
+
+class FileHandlePool:
+    """Process-wide, size-bounded LRU pool of read-only file descriptors keyed by path.
+
+    Reads are positional (pread), so a single descriptor can be shared by any
+    number of threads without coordinating the file offset.
+    """
+    def __init__(self, max_open: int = 64):
+        self._max_open = max_open
+        self._lock = threading.Lock()
+        self._files: 'OrderedDict[str, _PooledFile]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_open(self):
+        return self._max_open
+
+    def set_max_open(self, max_open: int):
+        with self._lock:
+            self._max_open = max(max_open, 1)
+            self._evict_excess()
+
+    def readinto(self, path: str, offset: int, buffer) -> int:
+        """Fill buffer with bytes starting at offset; returns the number of bytes read (short at EOF)"""
+        key = os.path.abspath(path)
+        pf = self._acquire(key)
+        try:
+            return _readinto_at(pf, buffer, offset)
+        finally:
+            self._release(pf)
+
+    def pread(self, path: str, offset: int, size: int) -> bytes:
+        buf = bytearray(size)
+        n = self.readinto(path, offset, buf)
+        return bytes(buf[:n])
+
+    def invalidate(self, path: str):
+        """Drop the pooled descriptor for path (e.g. after the file was replaced)"""
+        key = os.path.abspath(path)
+        with self._lock:
+            pf = self._files.pop(key, None)
+            if pf is not None:
+                self._retire(pf)
+
+    def close_all(self):
+        with self._lock:
+            while self._files:
+                _, pf = self._files.popitem(last=False)
+                self._retire(pf)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'open': len(self._files),
+                'max_open': self._max_open,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _acquire(self, key: str) -> _PooledFile:
+        with self._lock:
+            pf = self._files.get(key, None)
+            if pf is not None:
+                self.hits += 1
+                self._files.move_to_end(key)
+            else:
+                self.misses += 1
+                pf = _PooledFile(os.open(key, os.O_RDONLY | getattr(os, 'O_BINARY', 0)))
+                self._files[key] = pf
+                self._evict_excess()
+            pf.refcount += 1
+            return pf
+
+    def _release(self, pf: _PooledFile):
+        with self._lock:
+            pf.refcount -= 1
+            if pf.evicted and pf.refcount == 0:
+                os.close(pf.fd)
+
+    def _evict_excess(self):
+        # caller holds the lock
+        while len(self._files) > self._max_open:
+            _, pf = self._files.popitem(last=False)
+            self.evictions += 1
+            self._retire(pf)
+
+    def _retire(self, pf: _PooledFile):
+        # caller holds the lock; descriptors still in use are closed by the last reader
+        pf.evicted = True
+        if pf.refcount == 0:
+            os.close(pf.fd)
+
+
+def _readinto_at(pf: _PooledFile, buffer, offset: int) -> int:
+    view = memoryview(buffer).cast('B')
+    total = 0
+    while total < len(view):
+        if hasattr(os, 'preadv'):
+            n = os.preadv(pf.fd, [view[total:]], offset + total)
+        elif hasattr(os, 'pread'):
+            data = os.pread(pf.fd, len(view) - total, offset + total)
+            n = len(data)
+            view[total:total + n] = data
+        else:
+            with pf.lock:
+                os.lseek(pf.fd, offset + total, os.SEEK_SET)
+                data = os.read(pf.fd, len(view) - total)
+            n = len(data)
+            view[total:total + n] = data
+        if n == 0:
+            break
+        total += n
+    return total
+
+
+file_handle_pool = FileHandlePool(max_open=int(os.getenv('SPIKEFOREST_MDA_MAX_OPEN_FILES', '64')))
@@ -0,0 +1,59 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Tuple
+
+
+class HeaderCache:
+    """Process-wide LRU memo of parsed file headers
+
+    Local files are keyed by (path, mtime, size), so a file that is rewritten
+    or appended to is parsed again on the next lookup. URLs and kachery URIs
+    (sha1://, zenodo://, ...) are keyed by the uri alone (remote recordings are
+    immutable). Cached values should be immutable or copied by the caller.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, path: str, load: Callable[[str], Any]) -> Any:
+        key = _cache_key(kind, path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = load(path)
+        if value is not None:
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'num_entries': len(self._entries),
+                'max_entries': self._max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def _cache_key(kind: str, path: str) -> Tuple:
+    if '://' in path:
+        return (kind, path)
+    st = os.stat(path)
+    return (kind, os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+header_cache = HeaderCache()
@@ -0,0 +1,295 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple, Union
+
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_READAHEAD_BLOCKS = 4
+# (connect, read) timeouts of each range request, so a stalled server fails the read instead of hanging it
+HTTP_TIMEOUT_SEC = (10, 60)
+
+
+class _BlockCache:
+    """Process-wide LRU cache of fetched blocks keyed by (url, block_index), with optional on-disk spill"""
+    def __init__(self, max_bytes: int, spill_dir: Union[str, None] = None):
+        self._lock = threading.Lock()
+        self._blocks: 'OrderedDict[Tuple[str, int], bytes]' = OrderedDict()
+        self._num_bytes = 0
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[str, int]) -> Union[bytes, None]:
+        with self._lock:
+            data = self._blocks.get(key, None)
+            if data is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return data
+        spill_path = self._spill_path(key)
+        if spill_path is not None and os.path.exists(spill_path):
+            with open(spill_path, 'rb') as f:
+                data = f.read()
+            with self._lock:
+                self.spill_hits += 1
+            self.put(key, data)
+            return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: Tuple[str, int], data: bytes):
+        spilled = []
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = data
+            self._num_bytes += len(data)
+            while self._num_bytes > self.max_bytes and len(self._blocks) > 1:
+                k, d = self._blocks.popitem(last=False)
+                self._num_bytes -= len(d)
+                self.evictions += 1
+                spilled.append((k, d))
+        for k, d in spilled:
+            self._spill(k, d)
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self._num_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'num_blocks': len(self._blocks),
+                'num_bytes': self._num_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'spill_hits': self.spill_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _spill_path(self, key: Tuple[str, int]) -> Union[str, None]:
+        if self.spill_dir is None:
+            return None
+        url, block_index = key
+        url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return f'{self.spill_dir}/{url_hash}.{block_index}.block'
+
+    def _spill(self, key: Tuple[str, int], data: bytes):
+        spill_path = self._spill_path(key)
+        if spill_path is None or os.path.exists(spill_path):
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # write then rename so concurrent readers never see a partial block
+        tmp_path = f'{spill_path}.tmp.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, spill_path)
+
+
+block_cache = _BlockCache(
+    max_bytes=int(os.getenv('SPIKEFOREST_HTTP_CACHE_MB', '256')) * 1024 * 1024,
+    spill_dir=os.getenv('SPIKEFOREST_HTTP_CACHE_SPILL_DIR', None)
+)
+
+_max_workers = int(os.getenv('SPIKEFOREST_HTTP_MAX_WORKERS', '8'))
+_global_lock = threading.Lock()
+_session = None
+_executor = None
+_readers: Dict[str, 'HttpRangeReader'] = {}
+
+
+def _get_session():
+    global _session
+    with _global_lock:
+        if _session is None:
+            try:
+                import requests
+                from requests.adapters import HTTPAdapter
+            except:
+                raise Exception('Unable to import module: requests')
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_max_workers, pool_maxsize=_max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _global_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix='http-range-reader')
+        return _executor
+
+
+def fetch_range(url: str, offset: int, size: int) -> bytes:
+    """Fetches just the bytes [offset, offset + size) of url with one request (e.g. a file header), bypassing the block cache"""
+    headers = {"Range": "bytes={}-{}".format(offset, offset + size - 1)}
+    with _get_session().get(url, headers=headers, timeout=HTTP_TIMEOUT_SEC, stream=True) as r:
+        if r.status_code == 416:
+            return b''
+        if r.status_code == 206:
+            return r.content
+        if r.status_code == 200:
+            # server ignored the range request: read up to the end of the range and drop the rest
+            data = bytearray()
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                data.extend(chunk)
+                if len(data) >= offset + size:
+                    break
+            return bytes(data[offset:offset + size])
+        raise Exception(f'Problem fetching bytes {offset}-{offset + size - 1} from {url}: status {r.status_code}')
+
+
+def get_http_range_reader(url: str) -> 'HttpRangeReader':
+    """Returns the process-wide reader for url, so all DiskReadMda instances for a url share its state"""
+    with _global_lock:
+        reader = _readers.get(url, None)
+        if reader is None:
+            reader = HttpRangeReader(url)
+            _readers[url] = reader
+        return reader
+
+
+class HttpRangeReader:
+    """Reads byte ranges of a remote file as fixed-size aligned blocks.
+
+    Blocks are fetched concurrently with HTTP range requests over a pooled session,
+    kept in the shared block cache, and read ahead when access is sequential.
+    """
+    def __init__(self, url: str, *, block_size: int = DEFAULT_BLOCK_SIZE, readahead_blocks: int = DEFAULT_READAHEAD_BLOCKS):
+        self._url = url
+        self._block_size = block_size
+        self._readahead_blocks = readahead_blocks
+        self._size: Union[int, None] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[int, Future] = {}
+        self._last_block: Union[int, None] = None
+        # the whole file, if the server ignores range requests (downloaded once, then sliced)
+        self._whole_file: Union[bytes, None] = None
+        self._whole_file_lock = threading.Lock()
+        self.num_requests = 0
+        self.bytes_fetched = 0
+
+    @property
+    def url(self):
+        return self._url
+
+    def size(self) -> Union[int, None]:
+        """Total size of the remote file, once known from a Content-Range header"""
+        return self._size
+
+    def read(self, offset: int, size: int) -> bytes:
+        buf = bytearray(size)
+        n = self.readinto(offset, buf)
+        return bytes(buf[:n])
+
+    def readinto(self, offset: int, buffer) -> int:
+        """Fill buffer with bytes starting at offset; returns the number of bytes read (short at EOF)"""
+        view = memoryview(buffer).cast('B')
+        n = len(view)
+        if n == 0:
+            return 0
+        bs = self._block_size
+        b0 = offset // bs
+        b1 = (offset + n - 1) // bs
+        if self._size is not None:
+            b1 = min(b1, max(self._size - 1, 0) // bs)
+        pending = [self._get_block_async(idx) for idx in range(b0, b1 + 1)]
+        with self._lock:
+            sequential = self._last_block is not None and self._last_block <= b0 <= self._last_block + 1
+            self._last_block = b1
+        if sequential:
+            for idx in range(b1 + 1, b1 + 1 + self._readahead_blocks):
+                if self._size is not None and idx * bs >= self._size:
+                    break
+                self._get_block_async(idx)
+        total = 0
+        for idx, x in zip(range(b0, b1 + 1), pending):
+            data = x.result() if isinstance(x, Future) else x
+            start = offset + total - idx * bs
+            chunk = data[start:start + n - total]
+            view[total:total + len(chunk)] = chunk
+            total += len(chunk)
+            if len(data) < bs:
+                # end of file
+                break
+        return total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'num_requests': self.num_requests,
+                'bytes_fetched': self.bytes_fetched,
+                'num_inflight': len(self._inflight)
+            }
+
+    def _get_block_async(self, idx: int) -> Union[bytes, Future]:
+        if self._whole_file is not None:
+            return self._whole_file[idx * self._block_size:(idx + 1) * self._block_size]
+        with self._lock:
+            fut = self._inflight.get(idx, None)
+        if fut is not None:
+            return fut
+        data = block_cache.get((self._url, idx))
+        if data is not None:
+            return data
+        with self._lock:
+            fut = self._inflight.get(idx, None)
+            if fut is None:
+                fut = _get_executor().submit(self._fetch_block, idx)
+                self._inflight[idx] = fut
+            return fut
+
+    def _fetch_block(self, idx: int) -> bytes:
+        try:
+            start = idx * self._block_size
+            end = start + self._block_size
+            if self._whole_file is not None:
+                return self._whole_file[start:end]
+            headers = {"Range": "bytes={}-{}".format(start, end - 1)}
+            with _get_session().get(self._url, headers=headers, timeout=HTTP_TIMEOUT_SEC, stream=True) as r:
+                if r.status_code == 416:
+                    # requested range is beyond the end of the file
+                    data = b''
+                    num_fetched = 0
+                elif r.status_code == 206:
+                    data = r.content
+                    num_fetched = len(data)
+                    content_range = r.headers.get('Content-Range', '')
+                    if '/' in content_range and not content_range.endswith('/*'):
+                        self._size = int(content_range.split('/')[-1])
+                elif r.status_code == 200:
+                    # server ignored the range request: keep the whole file, downloaded by the first
+                    # request to get here (the others close their response without reading it)
+                    with self._whole_file_lock:
+                        num_fetched = 0
+                        if self._whole_file is None:
+                            whole_file = r.content
+                            num_fetched = len(whole_file)
+                            self._size = len(whole_file)
+                            self._whole_file = whole_file
+                    return self._count_fetched(self._whole_file[start:end], num_fetched)
+                else:
+                    raise Exception(f'Problem fetching bytes {start}-{end - 1} from {self._url}: status {r.status_code}')
+            block_cache.put((self._url, idx), data)
+            return self._count_fetched(data, num_fetched)
+        finally:
+            with self._lock:
+                self._inflight.pop(idx, None)
+
+    def _count_fetched(self, data: bytes, num_fetched: int) -> bytes:
+        with self._lock:
+            self.num_requests += 1
+            self.bytes_fetched += num_fetched
+        return data
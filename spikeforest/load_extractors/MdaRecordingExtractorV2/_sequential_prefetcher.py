@@ -0,0 +1,142 @@
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, List, Tuple
+import numpy as np
+
+
+class SequentialPrefetcher:
+    """Reads ahead of sequential frame-range requests on a background thread
+
+    read_frames_into(start_frame, out) must fill out (a column-major
+    num_rows x n array) with frames [start_frame, start_frame + n).
+
+    A request that moves forward from the previous one (adjacent, or
+    overlapping as with filter margins) is treated as part of a sequential
+    scan, and the next num_buffers ranges with the same stride are read into
+    a small ring of buffers. A request contained in a prefetched range is
+    served from its buffer, which is handed to the caller (and replaced in
+    the ring). Prefetched ranges that turn out not to be needed are recycled.
+    """
+    def __init__(self, read_frames_into: Callable[[int, np.ndarray], None], *, num_rows: int, num_frames: int, dtype, num_buffers: int = 2):
+        if num_buffers < 1:
+            raise Exception(f'Invalid num_buffers: {num_buffers}')
+        self._read_frames_into = read_frames_into
+        self._num_rows = num_rows
+        self._num_frames = num_frames
+        self._dtype = np.dtype(dtype)
+        self._num_buffers = num_buffers
+        self._lock = threading.Lock()
+        # (start_frame, end_frame, buffer, future) in the order they were scheduled
+        self._pending: Deque[Tuple[int, int, np.ndarray, Future]] = deque()
+        self._free: List[np.ndarray] = []
+        self._last_range = None
+        self._executor = None
+        self.num_requests = 0
+        self.num_sequential = 0
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_discarded = 0
+        self.bytes_prefetched = 0
+        self.wait_sec = 0.0
+
+    def read(self, start_frame: int, end_frame: int) -> np.ndarray:
+        """Returns frames [start_frame, end_frame) as a num_rows x n array owned by the caller"""
+        with self._lock:
+            self.num_requests += 1
+            ret = self._take_prefetched(start_frame, end_frame)
+            if ret is None:
+                self.num_misses += 1
+                ret = np.empty((self._num_rows, end_frame - start_frame), dtype=self._dtype, order='F')
+                self._read_frames_into(start_frame, ret)
+            else:
+                self.num_hits += 1
+            last_range = self._last_range
+            self._last_range = (start_frame, end_frame)
+            if last_range is not None and last_range[0] < start_frame <= last_range[1] and end_frame > last_range[1]:
+                self.num_sequential += 1
+                self._schedule(start_frame, end_frame, end_frame - last_range[1])
+            return ret
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'num_requests': self.num_requests,
+                'num_sequential': self.num_sequential,
+                'num_hits': self.num_hits,
+                'num_misses': self.num_misses,
+                'num_discarded': self.num_discarded,
+                'bytes_prefetched': self.bytes_prefetched,
+                'wait_sec': self.wait_sec
+            }
+
+    def _take_prefetched(self, start_frame: int, end_frame: int):
+        # caller holds the lock
+        while self._pending:
+            a, b, buf, fut = self._pending[0]
+            if a <= start_frame and end_frame <= b:
+                self._pending.popleft()
+                timer = time.time()
+                try:
+                    fut.result()
+                except Exception:
+                    # let the synchronous read report the problem
+                    self._recycle(buf)
+                    return None
+                finally:
+                    self.wait_sec += time.time() - timer
+                return buf[:, start_frame - a:end_frame - a]
+            if a > start_frame:
+                break
+            # scanned past this range without using it
+            self._pending.popleft()
+            self.num_discarded += 1
+            _wait_quietly(fut)
+            self._recycle(buf)
+        # not a continuation of the scheduled scan; drop what's left
+        while self._pending:
+            _, _, buf, fut = self._pending.popleft()
+            self.num_discarded += 1
+            _wait_quietly(fut)
+            self._recycle(buf)
+        return None
+
+    def _schedule(self, start_frame: int, end_frame: int, stride: int):
+        # caller holds the lock
+        a, b = (self._pending[-1][0], self._pending[-1][1]) if self._pending else (start_frame, end_frame)
+        n = end_frame - start_frame
+        while len(self._pending) < self._num_buffers:
+            a = a + stride
+            b = min(a + n, self._num_frames)
+            if a >= self._num_frames:
+                break
+            buf = self._get_buffer(n)[:, :b - a]
+            fut = self._get_executor().submit(self._read_frames_into, a, buf)
+            self.bytes_prefetched += buf.nbytes
+            self._pending.append((a, b, buf, fut))
+
+    def _get_buffer(self, n: int) -> np.ndarray:
+        for i, buf in enumerate(self._free):
+            if buf.shape[1] >= n:
+                return self._free.pop(i)
+        return np.empty((self._num_rows, n), dtype=self._dtype, order='F')
+
+    def _recycle(self, buf: np.ndarray):
+        base = buf if buf.base is None else buf.base
+        if isinstance(base, np.ndarray) and base.ndim == 2 and base.flags.f_contiguous and len(self._free) < self._num_buffers:
+            self._free.append(base)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mda-prefetch')
+            weakref.finalize(self, self._executor.shutdown, wait=False)
+        return self._executor
+
+
+def _wait_quietly(fut: Future):
+    try:
+        fut.result()
+    except Exception:
+        pass
@@ -0,0 +1,159 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Tuple, Union
+import numpy as np
+from spikeinterface.core import BaseRecordingSegment
+
+
+DEFAULT_BLOCK_FRAMES = 30000
+
+
+class TraceBlockCache:
+    """Process-wide LRU cache of trace blocks with a byte budget
+
+    Blocks are keyed by (segment key, block index), so every
+    CachedRecordingSegment wrapping the same file shares them.
+    """
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._blocks: 'OrderedDict[Tuple[Hashable, int], np.ndarray]' = OrderedDict()
+        self._num_bytes = 0
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[Hashable, int]) -> Union[np.ndarray, None]:
+        with self._lock:
+            X = self._blocks.get(key, None)
+            if X is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return X
+
+    def put(self, key: Tuple[Hashable, int], X: np.ndarray):
+        if X.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = X
+            self._num_bytes += X.nbytes
+            while self._num_bytes > self.max_bytes:
+                _, Y = self._blocks.popitem(last=False)
+                self._num_bytes -= Y.nbytes
+                self.evictions += 1
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._num_bytes > self.max_bytes and len(self._blocks) > 0:
+                _, Y = self._blocks.popitem(last=False)
+                self._num_bytes -= Y.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self._num_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            num_lookups = self.hits + self.misses
+            return {
+                'num_blocks': len(self._blocks),
+                'num_bytes': self._num_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / num_lookups if num_lookups > 0 else None
+            }
+
+
+trace_block_cache = TraceBlockCache(max_bytes=int(os.getenv('SPIKEFOREST_TRACE_CACHE_MB', '512')) * 1024 * 1024)
+
+
+class CachedRecordingSegment(BaseRecordingSegment):
+    """Serves get_traces of a parent segment from cached, block-aligned trace blocks
+
+    Blocks of block_frames frames (all channels) are read from the parent on
+    a miss. cache_key must identify the data of the parent segment (e.g. the
+    file and its version), since the blocks are shared with every other
+    segment using that key.
+    Returned traces may be read-only views of cached blocks.
+    """
+    def __init__(self, parent_segment: BaseRecordingSegment, *, cache_key: Hashable, block_frames: int = DEFAULT_BLOCK_FRAMES, cache: Union[TraceBlockCache, None] = None):
+        if block_frames <= 0:
+            raise Exception(f'Invalid block_frames: {block_frames}')
+        BaseRecordingSegment.__init__(self, sampling_frequency=parent_segment.sampling_frequency, t_start=parent_segment.t_start)
+        self._parent_segment = parent_segment
+        self._cache_key = (cache_key, block_frames)
+        self._block_frames = block_frames
+        self._cache = cache if cache is not None else trace_block_cache
+        self._num_samples = parent_segment.get_num_samples()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def parent_segment(self):
+        return self._parent_segment
+
+    def get_num_samples(self):
+        return self._num_samples
+
+    def get_traces(self,
+                   start_frame: Union[int, None] = None,
+                   end_frame: Union[int, None] = None,
+                   channel_indices: Union[List, None] = None,
+                   ) -> np.ndarray:
+        if start_frame is None:
+            start_frame = 0
+        if end_frame is None:
+            end_frame = self.get_num_samples()
+        if channel_indices is None:
+            channel_indices = slice(None)
+        bf = self._block_frames
+        if end_frame <= start_frame:
+            return self._parent_segment.get_traces(start_frame=start_frame, end_frame=start_frame, channel_indices=channel_indices)
+        b0 = start_frame // bf
+        b1 = (end_frame - 1) // bf
+        blocks = self._get_blocks(b0, b1)
+        if b0 == b1:
+            return blocks[0][start_frame - b0 * bf:end_frame - b0 * bf][:, channel_indices]
+        first = blocks[0][start_frame - b0 * bf:, channel_indices]
+        ret = np.empty((end_frame - start_frame, first.shape[1]), dtype=first.dtype)
+        for b, X in zip(range(b0, b1 + 1), blocks):
+            a = max(start_frame, b * bf)
+            z = min(end_frame, (b + 1) * bf)
+            ret[a - start_frame:z - start_frame] = X[a - b * bf:z - b * bf, channel_indices]
+        return ret
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            num_lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / num_lookups if num_lookups > 0 else None
+            }
+
+    def _get_blocks(self, b0: int, b1: int) -> List[np.ndarray]:
+        blocks = [self._cache.get((self._cache_key, b)) for b in range(b0, b1 + 1)]
+        num_missing = sum(X is None for X in blocks)
+        with self._lock:
+            self.hits += len(blocks) - num_missing
+            self.misses += num_missing
+        bf = self._block_frames
+        for k, b in enumerate(range(b0, b1 + 1)):
+            if blocks[k] is None:
+                # always a copy, so that cached blocks never pin a larger parent buffer
+                X = np.array(self._parent_segment.get_traces(start_frame=b * bf, end_frame=min((b + 1) * bf, self._num_samples), channel_indices=None))
+                X.flags.writeable = False
+                self._cache.put((self._cache_key, b), X)
+                blocks[k] = X
+        return blocks
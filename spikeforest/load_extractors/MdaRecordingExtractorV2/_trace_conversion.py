@@ -0,0 +1,55 @@
+from typing import Union
+import numpy as np
+
+
+# output bytes per block: small enough that the scale and offset passes over a block run from cache
+CONVERSION_BLOCK_BYTES = 256 * 1024
+
+
+def conversion_dtype(dtype, gain, offset, out: Union[np.ndarray, None]):
+    """The output dtype of a conversion: dtype if given, else that of out, else float32 when scaling"""
+    if dtype is not None:
+        return np.dtype(dtype)
+    if out is not None:
+        return out.dtype
+    if gain is not None or offset is not None:
+        return np.dtype('float32')
+    return None
+
+
+def prepare_conversion_output(num_frames: int, num_channels: int, dtype, out: Union[np.ndarray, None]) -> np.ndarray:
+    if out is None:
+        return np.empty((num_frames, num_channels), dtype=dtype)
+    if out.shape != (num_frames, num_channels):
+        raise Exception(f'Unexpected shape of out: {out.shape} (expected {(num_frames, num_channels)})')
+    if out.dtype != dtype:
+        raise Exception(f'Unexpected dtype of out: {out.dtype} (expected {dtype})')
+    return out
+
+
+def convert_traces(X: np.ndarray, out: np.ndarray, *, gain=None, offset=None):
+    """Writes X * gain + offset into out (num_frames x num_channels) in one blockwise pass
+
+    gain and offset are scalars or per-channel arrays. The arithmetic is done
+    in the dtype of out (integer outputs are truncated).
+    """
+    if gain is not None:
+        gain = np.asarray(gain, dtype=out.dtype if np.issubdtype(out.dtype, np.floating) else np.float64)
+    if offset is not None:
+        offset = np.asarray(offset, dtype=out.dtype if np.issubdtype(out.dtype, np.floating) else np.float64)
+    num_channels = max(X.shape[1], 1)
+    block_frames = max(CONVERSION_BLOCK_BYTES // (num_channels * out.itemsize), 1)
+    for a in range(0, X.shape[0], block_frames):
+        b = min(a + block_frames, X.shape[0])
+        src = X[a:b]
+        dst = out[a:b]
+        if gain is None and offset is None:
+            np.copyto(dst, src, casting='unsafe')
+            continue
+        if gain is not None:
+            np.multiply(src, gain, out=dst, casting='unsafe')
+        else:
+            np.copyto(dst, src, casting='unsafe')
+        if offset is not None:
+            np.add(dst, offset, out=dst, casting='unsafe')
+    return out
@@ -1,2 +1,3 @@
 from .load_recording_extractor import load_recording_extractor
-from .load_sorting_extractor import load_sorting_extractor
\ No newline at end of file
+from .load_sorting_extractor import load_sorting_extractor
+from .load_recording_info import load_recording_info, RecordingInfo
@@ -1,5 +1,7 @@
 import kachery_cloud as kcl
+from ..kachery_cache import get_kachery_cache
 from .MdaRecordingExtractorV2.MdaRecordingExtractorV2 import MdaRecordingExtractorV2
+from .CompressedRecordingExtractor.CompressedRecordingExtractor import CompressedRecordingExtractor
 
 
 def load_recording_extractor(recording_object: dict):
@@ -9,17 +11,71 @@ def load_recording_extractor(recording_object: dict):
             data=dict(
                 raw=recording_object['raw'],
                 geom=recording_object['geom'],
-                params=recording_object['params']
+                params=recording_object['params'],
+                concatenate=recording_object.get('concatenate', False)
             )
         ))
     recording_format = recording_object['recording_format']
     data = recording_object['data']
+    # holds pins on the raw files from before they are loaded until the extractor pins them
+    loading = _LoadingPins()
     if recording_format == 'mda':
         raw_uri = data['raw']
-        raw_path = kcl.load_file(raw_uri)
         geom = data.get('geom', None)
         params = data.get('params', None)
+        if isinstance(raw_uri, list):
+            # a recording split over several files: one segment per file, or a single
+            # segment when concatenate is set
+            raw_paths = [_resolve_raw_path(u, loading) for u in raw_uri]
+            for u, p in zip(raw_uri, raw_paths):
+                assert p is not None, f'Unable to load raw file: {u}'
+            recording = MdaRecordingExtractorV2(raw_path=raw_paths, params=params, geom=geom, concatenate=data.get('concatenate', False))
+            return _pin_raw_files(recording, raw_uri)
+        raw_path = _resolve_raw_path(raw_uri, loading)
         assert raw_path is not None, f'Unable to load raw file: {raw_uri}'
-        return MdaRecordingExtractorV2(raw_path=raw_path, params=params, geom=geom)
+        return _pin_raw_files(MdaRecordingExtractorV2(raw_path=raw_path, params=params, geom=geom), [raw_uri])
+    elif recording_format == 'npy':
+        # a num_channels x num_frames array (either memory order)
+        raw_uri = data['raw']
+        raw_path = _resolve_raw_path(raw_uri, loading, allow_url=False)
+        geom = data.get('geom', None)
+        params = data.get('params', None)
+        assert raw_path is not None, f'Unable to load raw file: {raw_uri}'
+        return _pin_raw_files(MdaRecordingExtractorV2(raw_path=raw_path, params=params, geom=geom), [raw_uri])
+    elif recording_format == 'compressed':
+        raw_uri = data['raw']
+        raw_path = _resolve_raw_path(raw_uri, loading, allow_url=False)
+        geom = data.get('geom', None)
+        assert raw_path is not None, f'Unable to load raw file: {raw_uri}'
+        return _pin_raw_files(CompressedRecordingExtractor(file_path=raw_path, geom=geom), [raw_uri])
     else:
-        raise Exception(f'Unexpected recording format: {recording_format}')
\ No newline at end of file
+        raise Exception(f'Unexpected recording format: {recording_format}')
+
+
+class _LoadingPins:
+    pass
+
+
+def _resolve_raw_path(raw_uri: str, loading: _LoadingPins, *, allow_url: bool = True):
+    # local files (and, for mda, http urls which are read by byte range) are used in
+    # place, so only kachery uris need to be loaded into the local store first
+    if raw_uri.startswith('/'):
+        return raw_uri
+    if allow_url and (raw_uri.startswith('http://') or raw_uri.startswith('https://')):
+        return raw_uri
+    if raw_uri.startswith('sha1://'):
+        # pinned before loading, so another process enforcing the cache budget cannot
+        # evict the file before the extractor holds its own pin
+        return get_kachery_cache().load_pinned_file(raw_uri, loading)
+    return kcl.load_file(raw_uri)
+
+
+def _pin_raw_files(recording, raw_uris):
+    # the extractor reads its files lazily, so keep them in the local store while it is alive
+    sha1_uris = [u for u in raw_uris if u.startswith('sha1://')]
+    if len(sha1_uris) == 0:
+        return recording
+    cache = get_kachery_cache()
+    for raw_uri in sha1_uris:
+        cache.pin(raw_uri, recording)
+    return recording
@@ -0,0 +1,125 @@
+import os
+from typing import NamedTuple, Tuple, Union
+import kachery_cloud as kcl
+from .MdaRecordingExtractorV2.MdaRecordingExtractorV2 import _MAX_MDA_HEADER_SIZE, _header_from_bytes, _npy_header_from_reader, is_url, npy_dtype_to_string
+from .MdaRecordingExtractorV2._file_handle_pool import file_handle_pool
+from .MdaRecordingExtractorV2._header_cache import header_cache
+from .MdaRecordingExtractorV2._http_range_reader import fetch_range
+from .CompressedRecordingExtractor.CompressedRecordingExtractor import _read_compressed_recording_metadata
+
+
+class RecordingInfo(NamedTuple):
+    num_channels: int
+    num_frames: int # total over all segments
+    dtype: str
+    sampling_frequency: float
+    segment_num_frames: Tuple[int, ...] # one entry per segment of the loaded extractor
+
+    @property
+    def duration_sec(self):
+        return self.num_frames / self.sampling_frequency
+
+    @property
+    def num_segments(self):
+        return len(self.segment_num_frames)
+
+
+def load_recording_info(recording_object: dict) -> RecordingInfo:
+    """Channel count, dtype and duration of a recording, from the file header only
+
+    Unlike load_recording_extractor this never reads the data payload or sets up a
+    probe: only the header bytes are read, from the local file or kachery store if
+    the file is there, and otherwise with an http range request.
+    """
+    if 'raw' in recording_object:
+        return load_recording_info(dict(
+            recording_format='mda',
+            data=dict(
+                raw=recording_object['raw'],
+                geom=recording_object['geom'],
+                params=recording_object['params'],
+                concatenate=recording_object.get('concatenate', False)
+            )
+        ))
+    recording_format = recording_object['recording_format']
+    data = recording_object['data']
+    if recording_format == 'mda':
+        # a recording split over several files has one segment per file, unless concatenate is set
+        raw_uris = data['raw'] if isinstance(data['raw'], list) else [data['raw']]
+        headers = [header_cache.get('mda', raw_uri, _load_mda_header) for raw_uri in raw_uris]
+        file_num_frames = tuple(H.dims[1] for H in headers)
+        return RecordingInfo(
+            num_channels=headers[0].dims[0],
+            num_frames=sum(file_num_frames),
+            dtype=headers[0].dt,
+            sampling_frequency=float(data['params']['samplerate']),
+            segment_num_frames=(sum(file_num_frames),) if data.get('concatenate', False) else file_num_frames
+        )
+    elif recording_format == 'npy':
+        raw_uri = data['raw']
+        H = header_cache.get('npy', raw_uri, lambda u: _npy_header_from_reader(_byte_reader(u)))
+        return RecordingInfo(
+            num_channels=H.shape[0],
+            num_frames=H.shape[1],
+            dtype=npy_dtype_to_string(H.dtype),
+            sampling_frequency=float(data['params']['samplerate']),
+            segment_num_frames=(H.shape[1],)
+        )
+    elif recording_format == 'compressed':
+        raw_uri = data['raw']
+        meta, _ = header_cache.get('compressed', raw_uri, lambda u: _read_compressed_recording_metadata(_byte_reader(u), u))
+        return RecordingInfo(
+            num_channels=meta['num_channels'],
+            num_frames=meta['num_frames'],
+            dtype=meta['dtype'],
+            sampling_frequency=float(meta['sampling_frequency']),
+            segment_num_frames=(meta['num_frames'],)
+        )
+    else:
+        raise Exception(f'Unexpected recording format: {recording_format}')
+
+
+def _load_mda_header(raw_uri: str):
+    H = _header_from_bytes(_byte_reader(raw_uri)(0, _MAX_MDA_HEADER_SIZE))
+    if H is None:
+        raise Exception(f'Problem reading header of: {raw_uri}')
+    return H
+
+
+def _byte_reader(raw_uri: str):
+    # read(offset, size) -> bytes for the file of raw_uri, without downloading the whole file
+    if '://' not in raw_uri:
+        return lambda offset, size: file_handle_pool.pread(raw_uri, offset, size)
+    if is_url(raw_uri):
+        return lambda offset, size: fetch_range(raw_uri, offset, size)
+    if raw_uri.startswith('sha1://'):
+        local_path = kcl.load_file(raw_uri, local_only=True)
+        if local_path is not None:
+            return lambda offset, size: file_handle_pool.pread(local_path, offset, size)
+        url = _find_sha1_url(raw_uri)
+        if url is not None:
+            return lambda offset, size: fetch_range(url, offset, size)
+    # other kachery uris (e.g. zenodo://) can only be loaded as a whole
+    local_path = kcl.load_file(raw_uri)
+    if local_path is None:
+        raise Exception(f'Unable to load raw file: {raw_uri}')
+    return lambda offset, size: file_handle_pool.pread(local_path, offset, size)
+
+
+def _find_sha1_url(raw_uri: str) -> Union[str, None]:
+    # The download url of a sha1 object in kachery cloud (what kcl.load_file would download from).
+    # kachery_cloud has no public api for it, so None (load the whole file) if its internals change.
+    try:
+        from kachery_cloud._kachery_gateway_request import _kachery_gateway_request
+    except ImportError:
+        return None
+    sha1 = raw_uri.split('?')[0].split('/')[2]
+    response = _kachery_gateway_request({
+        'type': 'findFile',
+        'hashAlg': 'sha1',
+        'hash': sha1,
+        'zone': os.environ.get('KACHERY_ZONE', 'default')
+    })
+    if not response.get('found', False):
+        raise Exception(f'Unable to find file: {raw_uri}')
+    return response.get('url', None)
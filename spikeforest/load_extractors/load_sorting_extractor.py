@@ -1,4 +1,4 @@
-import kachery_cloud as kcl
+from ..kachery_cache import load_file
 import spikeinterface.extractors as sie
 
 
@@ -15,7 +15,7 @@ def load_sorting_extractor(sorting_object: dict):
     data = sorting_object['data']
     if sorting_format == 'mda':
         firings_uri = data['firings']
-        firings_path = kcl.load_file(firings_uri)
+        firings_path = load_file(firings_uri)
         samplerate = data.get('samplerate', None)
         if samplerate is None:
             raise Exception('samplerate is None')
@@ -23,7 +23,7 @@ def load_sorting_extractor(sorting_object: dict):
         return sie.MdaSortingExtractor(firings_path, samplerate)
     elif sorting_format == 'npz':
         firings_uri = data['firings']
-        firings_path = kcl.load_file(firings_uri)
+        firings_path = load_file(firings_uri)
         assert firings_path is not None, f'Unable to load firings file: {firings_uri}'
         return sie.NpzSortingExtractor(firings_path)
     else:
@@ -1,13 +1,15 @@
-from copy import deepcopy
-from ..load_extractors import load_recording_extractor, load_sorting_extractor
+from .._common.frozen import freeze
+from ..load_extractors import load_recording_extractor, load_sorting_extractor, load_recording_info
 
 
 class SFRecording:
+    """A read-only view of a recording record (the record and its objects are FrozenDicts; use thaw() to modify a copy)"""
+    __slots__ = ('_recording_record',)
     def __init__(self, recording_record: dict) -> None:
-        self._recording_record = recording_record
+        self._recording_record = freeze(recording_record)
     @property
     def recording_record(self):
-        return deepcopy(self._recording_record)
+        return self._recording_record
     @property
     def recording_name(self):
         return self._recording_record['name']
@@ -31,11 +33,13 @@ class SFRecording:
         return self._recording_record['numTrueUnits']
     @property
     def sorting_true_object(self):
-        return deepcopy(self._recording_record['sortingTrueObject'])
+        return self._recording_record['sortingTrueObject']
     @property
     def recording_object(self):
-        return deepcopy(self._recording_record['recordingObject'])
+        return self._recording_record['recordingObject']
     def get_sorting_true_extractor(self):
         return load_sorting_extractor(self.sorting_true_object)
+    def get_recording_info(self):
+        return load_recording_info(self.recording_object)
     def get_recording_extractor(self):
         return load_recording_extractor(self.recording_object)
\ No newline at end of file
@@ -0,0 +1,66 @@
+from typing import Dict, Iterator, List, Tuple, Union
+from .SFRecording import SFRecording
+
+
+class SFRecordingCatalog:
+    """Recording records indexed by (study set, study, recording)
+
+    Lookups are dictionary lookups, and the SFRecording for a record is
+    created on first access and then reused.
+    """
+    def __init__(self, recording_records: List[dict]) -> None:
+        self._records = recording_records
+        self._views: List[Union[SFRecording, None]] = [None] * len(recording_records)
+        self._by_key: Dict[Tuple[str, str, str], int] = {}
+        self._by_study_and_name: Dict[Tuple[str, str], int] = {}
+        self._by_study: Dict[str, List[int]] = {}
+        self._by_study_set: Dict[str, List[int]] = {}
+        for i, rec in enumerate(recording_records):
+            study_set_name, study_name, recording_name = rec['studySetName'], rec['studyName'], rec['name']
+            self._by_key.setdefault((study_set_name, study_name, recording_name), i)
+            self._by_study_and_name.setdefault((study_name, recording_name), i)
+            self._by_study.setdefault(study_name, []).append(i)
+            self._by_study_set.setdefault(study_set_name, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[SFRecording]:
+        for i in range(len(self._records)):
+            yield self._view(i)
+
+    @property
+    def study_set_names(self) -> List[str]:
+        return list(self._by_study_set.keys())
+
+    @property
+    def study_names(self) -> List[str]:
+        return list(self._by_study.keys())
+
+    def recordings(self) -> List[SFRecording]:
+        return list(self)
+
+    def find_recording(self, *, study_name: str, recording_name: str, study_set_name: Union[str, None] = None) -> Union[SFRecording, None]:
+        if study_set_name is None:
+            i = self._by_study_and_name.get((study_name, recording_name), None)
+        else:
+            i = self._by_key.get((study_set_name, study_name, recording_name), None)
+        return self._view(i) if i is not None else None
+
+    def get_recording(self, *, study_name: str, recording_name: str, study_set_name: Union[str, None] = None) -> SFRecording:
+        R = self.find_recording(study_name=study_name, recording_name=recording_name, study_set_name=study_set_name)
+        if R is None: raise Exception(f'Recording not found: {study_name}/{recording_name}')
+        return R
+
+    def get_study_recordings(self, study_name: str) -> List[SFRecording]:
+        return [self._view(i) for i in self._by_study.get(study_name, [])]
+
+    def get_study_set_recordings(self, study_set_name: str) -> List[SFRecording]:
+        return [self._view(i) for i in self._by_study_set.get(study_set_name, [])]
+
+    def _view(self, i: int) -> SFRecording:
+        R = self._views[i]
+        if R is None:
+            R = SFRecording(self._records[i])
+            self._views[i] = R
+        return R
@@ -0,0 +1,25 @@
+import threading
+from typing import Dict, Union
+from .._common.catalog_json_cache import load_catalog_json
+from .SFRecordingCatalog import SFRecordingCatalog
+
+# prepared using: https://github.com/scratchrealm/prepare-spikeforest-ipfs
+# default_uri = 'ipfs://bafkreiharnfwm5ntcui4rsex4zkvxfjbytodkserudpvfsnsx5us7tciuq?spikeforest-recordings.json'
+
+# prepared using: devel/migrate_script1
+default_uri = 'sha1://1d343ed7e876ffd73bd8e0daf3b8a2c4265b783c?spikeforest-recordings.json'
+
+_lock = threading.Lock()
+_catalogs: Dict[str, SFRecordingCatalog] = {}
+
+
+def load_spikeforest_recording_catalog(uri: Union[str, None] = None) -> SFRecordingCatalog:
+    if uri is None:
+        uri = default_uri
+    with _lock:
+        catalog = _catalogs.get(uri, None)
+        if catalog is None:
+            x = load_catalog_json(uri)
+            catalog = SFRecordingCatalog(x['recordings'])
+            _catalogs[uri] = catalog
+        return catalog
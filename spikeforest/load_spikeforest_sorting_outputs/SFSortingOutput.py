@@ -1,14 +1,16 @@
-from copy import deepcopy
 import kachery_cloud as kcl
+from .._common.frozen import freeze
 from ..load_extractors import load_sorting_extractor
 
 
 class SFSortingOutput:
+    """A read-only view of a sorting output record (a FrozenDict; use thaw() to modify a copy)"""
+    __slots__ = ('_sorting_output_record',)
     def __init__(self, sorting_output_record: dict) -> None:
-        self._sorting_output_record = sorting_output_record
+        self._sorting_output_record = freeze(sorting_output_record)
     @property
     def sorting_output_record(self):
-        return deepcopy(self._sorting_output_record)
+        return self._sorting_output_record
     @property
     def recording_name(self):
         return self._sorting_output_record['recordingName']
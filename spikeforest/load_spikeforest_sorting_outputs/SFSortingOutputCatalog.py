@@ -0,0 +1,154 @@
+from typing import Dict, Iterator, List, Tuple, Union
+import numpy as np
+from .SFSortingOutput import SFSortingOutput
+
+
+# numeric fields of a sorting output record that are available as columns (missing values are nan)
+_NUMERIC_COLUMNS = ['cpuTimeSec', 'returnCode', 'startTime', 'endTime']
+
+
+class SFSortingOutputCatalog:
+    """Sorting output records indexed by study, recording and sorter, with a columnar view for vectorized filtering
+
+    Point lookups are dictionary lookups. columns() holds one numpy array per
+    field (the name fields as integer codes into study_names, recording_names
+    and sorter_names) so that filters over the whole catalog are array
+    operations; select() turns a boolean mask or index array back into
+    SFSortingOutput views, which are created on first access and reused.
+    """
+    def __init__(self, sorting_output_records: List[dict]) -> None:
+        self._records = sorting_output_records
+        self._views: List[Union[SFSortingOutput, None]] = [None] * len(sorting_output_records)
+        self._by_key: Dict[Tuple[str, str, str], int] = {}
+        self._by_recording: Dict[Tuple[str, str], List[int]] = {}
+        self._by_study: Dict[str, List[int]] = {}
+        self._by_sorter: Dict[str, List[int]] = {}
+        for i, rec in enumerate(sorting_output_records):
+            study_name, recording_name, sorter_name = rec['studyName'], rec['recordingName'], rec['sorterName']
+            self._by_key.setdefault((study_name, recording_name, sorter_name), i)
+            self._by_recording.setdefault((study_name, recording_name), []).append(i)
+            self._by_study.setdefault(study_name, []).append(i)
+            self._by_sorter.setdefault(sorter_name, []).append(i)
+        self._columns: Union[Dict[str, np.ndarray], None] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[SFSortingOutput]:
+        for i in range(len(self._records)):
+            yield self._view(i)
+
+    @property
+    def study_names(self) -> List[str]:
+        return list(self._by_study.keys())
+
+    @property
+    def sorter_names(self) -> List[str]:
+        return list(self._by_sorter.keys())
+
+    def get_recording_names(self, study_name: str) -> List[str]:
+        return list(dict.fromkeys(self._records[i]['recordingName'] for i in self._by_study.get(study_name, [])))
+
+    def get_sorter_names(self, study_name: str, recording_name: str) -> List[str]:
+        return list(dict.fromkeys(self._records[i]['sorterName'] for i in self._by_recording.get((study_name, recording_name), [])))
+
+    def sorting_outputs(self) -> List[SFSortingOutput]:
+        return list(self)
+
+    def find_sorting_output(self, *, study_name: str, recording_name: str, sorter_name: str) -> Union[SFSortingOutput, None]:
+        i = self._by_key.get((study_name, recording_name, sorter_name), None)
+        return self._view(i) if i is not None else None
+
+    def get_sorting_output(self, *, study_name: str, recording_name: str, sorter_name: str) -> SFSortingOutput:
+        X = self.find_sorting_output(study_name=study_name, recording_name=recording_name, sorter_name=sorter_name)
+        if X is None: raise Exception(f'Sorting output not found: {study_name}/{recording_name}/{sorter_name}')
+        return X
+
+    def get_recording_sorting_outputs(self, study_name: str, recording_name: str) -> List[SFSortingOutput]:
+        return [self._view(i) for i in self._by_recording.get((study_name, recording_name), [])]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """One array per field: studyName, recordingName and sorterName (int32 codes), timedOut (bool) and the numeric fields (float64)"""
+        if self._columns is None:
+            self._columns = self._build_columns()
+        return self._columns
+
+    def select(self, mask_or_indices: np.ndarray) -> List[SFSortingOutput]:
+        indices = np.asarray(mask_or_indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        return [self._view(int(i)) for i in indices]
+
+    def query(self, *,
+        study_name: Union[str, None] = None,
+        recording_name: Union[str, None] = None,
+        sorter_name: Union[str, None] = None,
+        min_cpu_time_sec: Union[float, None] = None,
+        max_cpu_time_sec: Union[float, None] = None,
+        timed_out: Union[bool, None] = None,
+        return_code: Union[int, None] = None
+    ) -> List[SFSortingOutput]:
+        """Sorting outputs matching all of the given criteria, in catalog order"""
+        if study_name is not None and recording_name is not None:
+            candidates = self._by_recording.get((study_name, recording_name), [])
+        elif study_name is not None:
+            candidates = self._by_study.get(study_name, [])
+        elif sorter_name is not None:
+            candidates = self._by_sorter.get(sorter_name, [])
+        else:
+            candidates = None
+        C = self.columns()
+        indices = np.arange(len(self._records)) if candidates is None else np.array(candidates, dtype=np.int64)
+        mask = np.ones(len(indices), dtype=bool)
+        for key, names, name in [('studyName', self._study_names, study_name), ('recordingName', self._recording_names, recording_name), ('sorterName', self._sorter_names, sorter_name)]:
+            if name is not None:
+                code = names.get(name, -1)
+                mask &= C[key][indices] == code
+        if min_cpu_time_sec is not None:
+            mask &= C['cpuTimeSec'][indices] >= min_cpu_time_sec
+        if max_cpu_time_sec is not None:
+            mask &= C['cpuTimeSec'][indices] <= max_cpu_time_sec
+        if timed_out is not None:
+            mask &= C['timedOut'][indices] == timed_out
+        if return_code is not None:
+            mask &= C['returnCode'][indices] == return_code
+        return self.select(indices[mask])
+
+    def decode(self, key: str, codes: np.ndarray) -> List[str]:
+        """Maps codes of the studyName, recordingName or sorterName column back to names"""
+        self.columns()
+        names = list({'studyName': self._study_names, 'recordingName': self._recording_names, 'sorterName': self._sorter_names}[key].keys())
+        return [names[c] for c in np.asarray(codes)]
+
+    def _build_columns(self) -> Dict[str, np.ndarray]:
+        n = len(self._records)
+        self._study_names: Dict[str, int] = {}
+        self._recording_names: Dict[str, int] = {}
+        self._sorter_names: Dict[str, int] = {}
+        C = {
+            'studyName': np.empty(n, dtype=np.int32),
+            'recordingName': np.empty(n, dtype=np.int32),
+            'sorterName': np.empty(n, dtype=np.int32),
+            'timedOut': np.zeros(n, dtype=bool)
+        }
+        for key in _NUMERIC_COLUMNS:
+            C[key] = np.full(n, np.nan, dtype=np.float64)
+        for i, rec in enumerate(self._records):
+            C['studyName'][i] = self._study_names.setdefault(rec['studyName'], len(self._study_names))
+            C['recordingName'][i] = self._recording_names.setdefault(rec['recordingName'], len(self._recording_names))
+            C['sorterName'][i] = self._sorter_names.setdefault(rec['sorterName'], len(self._sorter_names))
+            C['timedOut'][i] = bool(rec.get('timedOut', False))
+            for key in _NUMERIC_COLUMNS:
+                v = rec.get(key, None)
+                if isinstance(v, (int, float)):
+                    C[key][i] = v
+        for X in C.values():
+            X.flags.writeable = False
+        return C
+
+    def _view(self, i: int) -> SFSortingOutput:
+        X = self._views[i]
+        if X is None:
+            X = SFSortingOutput(self._records[i])
+            self._views[i] = X
+        return X
@@ -1,12 +1,7 @@
-from .load_spikeforest_sorting_outputs import load_spikeforest_sorting_outputs
+from .load_spikeforest_sorting_output_catalog import load_spikeforest_sorting_output_catalog
+from typing import Union
 
 
-def load_spikeforest_sorting_output(*, study_name: str, recording_name: str, sorter_name: str):
-    all_sorting_outputs = load_spikeforest_sorting_outputs()
-    x = [
-        X for X in all_sorting_outputs
-        if X.study_name == study_name and X.recording_name == recording_name and X.sorter_name == sorter_name
-    ]
-    if len(x) == 0: raise Exception(f'Sorting output not found: {study_name}/{recording_name}/{sorter_name}')
-    X = x[0]
-    return X
\ No newline at end of file
+def load_spikeforest_sorting_output(*, study_name: str, recording_name: str, sorter_name: str, uri: Union[str, None]=None):
+    catalog = load_spikeforest_sorting_output_catalog(uri)
+    return catalog.get_sorting_output(study_name=study_name, recording_name=recording_name, sorter_name=sorter_name)
@@ -0,0 +1,25 @@
+import threading
+from typing import Dict, Union
+from .._common.catalog_json_cache import load_catalog_json
+from .SFSortingOutputCatalog import SFSortingOutputCatalog
+
+# prepared via: https://github.com/scratchrealm/prepare-spikeforest-ipfs
+# default_uri = 'ipfs://bafkreigfiekbk3kghib25l5j2piebrizhjdoittbgvlexgamzjzrp2el54?spikeforest-sorting-outputs.json'
+
+# prepared using: devel/migrate_script2.py
+default_uri = 'sha1://789de61ef00d1ca94f4a2d43d75c3346bdfe0d0a?label=spikeforest-sorting-outputs.json'
+
+_lock = threading.Lock()
+_catalogs: Dict[str, SFSortingOutputCatalog] = {}
+
+
+def load_spikeforest_sorting_output_catalog(uri: Union[str, None] = None) -> SFSortingOutputCatalog:
+    if uri is None:
+        uri = default_uri
+    with _lock:
+        catalog = _catalogs.get(uri, None)
+        if catalog is None:
+            x = load_catalog_json(uri)
+            catalog = SFSortingOutputCatalog(x['sortingOutputs'])
+            _catalogs[uri] = catalog
+        return catalog
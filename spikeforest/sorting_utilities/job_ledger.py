@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Union
+
+from spikeforest._common.processes import pid_alive
+
+# One row per (sorter, sorter parameters, recording). A runner claims a row
+# before queueing its job, holding a lease that a heartbeat thread renews
+# while the runner is alive; a row whose lease has run out (or whose runner
+# is a dead process on this host) can be claimed by another runner. The
+# ledger may live on shared storage, so it uses the default rollback journal
+# rather than WAL (which needs shared memory between the processes).
+_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS jobs (
+        key TEXT PRIMARY KEY,
+        sorter_name TEXT NOT NULL,
+        params_hash TEXT NOT NULL,
+        recording_uri TEXT NOT NULL,
+        study_name TEXT,
+        recording_name TEXT,
+        status TEXT NOT NULL,
+        num_errors INTEGER NOT NULL DEFAULT 0,
+        owner TEXT,
+        host TEXT,
+        pid INTEGER,
+        lease_expires REAL,
+        started REAL,
+        completed REAL,
+        cpu_time_sec REAL,
+        output_record TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)'
+]
+
+# row status values
+RUNNING = 'running'
+FINISHED = 'finished'
+ERROR = 'error'
+RELEASED = 'released' # claimed, then abandoned before completing (claimable again)
+
+
+def params_hash(params: Any) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def job_key(sorter_name: str, params: Any, recording_uri: str) -> str:
+    return hashlib.sha1(json.dumps([sorter_name, params_hash(params), recording_uri]).encode()).hexdigest()
+
+
+class JobLedger:
+    """Records the status of sorting jobs in an SQLite file so that runs can be resumed and shared
+
+    claim() returns whether this runner should run a job: not if it has
+    finished, is running elsewhere, or has already failed max_attempts times.
+    complete() records the output record of a finished or errored job.
+    """
+    def __init__(self, path: str, *, max_attempts: int = 2, lease_sec: float = 600):
+        self._path = path
+        self.max_attempts = max_attempts
+        self.lease_sec = lease_sec
+        self._host = socket.gethostname()
+        self._owner = f'{self._host}:{os.getpid()}:{uuid.uuid4().hex}'
+        self._lock = threading.Lock()
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat: Union[threading.Thread, None] = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._con = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            for stmt in _SCHEMA:
+                self._con.execute(stmt)
+
+    def is_done(self, sorter_name: str, params: Any, recording_uri: str) -> bool:
+        """Whether the job has finished, or has failed too often to be retried"""
+        with self._lock:
+            row = self._con.execute('SELECT status, num_errors FROM jobs WHERE key = ?', (job_key(sorter_name, params, recording_uri),)).fetchone()
+        if row is None:
+            return False
+        (status, num_errors) = row
+        return status == FINISHED or (status == ERROR and num_errors >= self.max_attempts)
+
+    def is_claimable(self, sorter_name: str, params: Any, recording_uri: str) -> bool:
+        """Whether claim() would currently succeed (e.g. to skip preparing jobs that another runner holds)"""
+        with self._lock:
+            row = self._con.execute('SELECT status, num_errors, lease_expires, host, pid FROM jobs WHERE key = ?', (job_key(sorter_name, params, recording_uri),)).fetchone()
+        return row is None or self._claimable(row, time.time())
+
+    def claim(self, sorter_name: str, params: Any, recording_uri: str, *, study_name: str = '', recording_name: str = '') -> bool:
+        key = job_key(sorter_name, params, recording_uri)
+        now = time.time()
+        with self._lock:
+            self._con.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._con.execute('SELECT status, num_errors, lease_expires, host, pid FROM jobs WHERE key = ?', (key,)).fetchone()
+                if row is not None and not self._claimable(row, now):
+                    self._con.execute('COMMIT')
+                    return False
+                self._con.execute(
+                    'INSERT INTO jobs (key, sorter_name, params_hash, recording_uri, study_name, recording_name, status, owner, host, pid, lease_expires, started) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET status = excluded.status, owner = excluded.owner, host = excluded.host, pid = excluded.pid, '
+                    'lease_expires = excluded.lease_expires, started = excluded.started, completed = NULL',
+                    (key, sorter_name, params_hash(params), recording_uri, study_name, recording_name, RUNNING,
+                     self._owner, self._host, os.getpid(), now + self.lease_sec, now)
+                )
+                self._con.execute('COMMIT')
+            except BaseException:
+                self._con.execute('ROLLBACK')
+                raise
+        self._ensure_heartbeat()
+        return True
+
+    def complete(self, sorter_name: str, params: Any, recording_uri: str, output_record: Dict[str, Any], *, errored: bool):
+        with self._lock:
+            self._con.execute(
+                'UPDATE jobs SET status = ?, num_errors = num_errors + ?, owner = NULL, lease_expires = NULL, completed = ?, cpu_time_sec = ?, output_record = ? '
+                'WHERE key = ? AND owner = ?',
+                (ERROR if errored else FINISHED, 1 if errored else 0, time.time(), output_record.get('cpuTimeSec', None),
+                 json.dumps(output_record), job_key(sorter_name, params, recording_uri), self._owner)
+            )
+
+    def release_all(self):
+        """Makes the jobs this runner claimed but did not complete claimable again (e.g. on interruption)"""
+        self._stop_heartbeat.set()
+        with self._lock:
+            self._con.execute('UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL WHERE owner = ? AND status = ?', (RELEASED, self._owner, RUNNING))
+
+    def output_records(self, *, status: str = FINISHED) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._con.execute('SELECT output_record FROM jobs WHERE status = ? AND output_record IS NOT NULL ORDER BY completed', (status,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._con.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for (status, count) in rows}
+
+    def close(self):
+        self.release_all()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._lock:
+            self._con.close()
+
+    def __enter__(self) -> 'JobLedger':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _claimable(self, row, now: float) -> bool:
+        (status, num_errors, lease_expires, host, pid) = row
+        if status == RELEASED:
+            return True
+        if status == ERROR:
+            return num_errors < self.max_attempts
+        if status == RUNNING:
+            if lease_expires is not None and lease_expires < now:
+                return True
+            return host == self._host and not pid_alive(pid)
+        return False
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._renew_leases, daemon=True)
+            self._heartbeat.start()
+
+    def _renew_leases(self):
+        while not self._stop_heartbeat.wait(self.lease_sec / 3):
+            try:
+                with self._lock:
+                    self._con.execute('UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status = ?', (time.time() + self.lease_sec, self._owner, RUNNING))
+            except sqlite3.Error as e:
+                # e.g. the database is busy; retried at the next beat, well before the lease runs out
+                print(f'WARNING: unable to renew job leases: {e}')
+
@@ -0,0 +1,159 @@
+import heapq
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Union
+
+import numpy as np
+from spikeforest.sorting_utilities.runtime_model import RuntimeModel, RuntimePrediction, successful_runs
+
+# Resource needs of each sorter, for one job. A job is only placed in a pool
+# whose workers provide at least this much; GPU sorters only go to GPU pools.
+# If a new sorter is added to KNOWN_SORTERS, a corresponding entry should be added here.
+class SorterResources(NamedTuple):
+    cpu_threads: int
+    memory_gb: float
+    gpu: bool
+
+SORTER_RESOURCES: Dict[str, SorterResources] = {
+    'SpykingCircus': SorterResources(cpu_threads=4, memory_gb=8, gpu=False),
+    'MountainSort4': SorterResources(cpu_threads=1, memory_gb=4, gpu=False),
+    'Tridesclous':   SorterResources(cpu_threads=2, memory_gb=4, gpu=False),
+    'Kilosort2':     SorterResources(cpu_threads=2, memory_gb=8, gpu=True),
+    'Kilosort3':     SorterResources(cpu_threads=2, memory_gb=8, gpu=True),
+}
+DEFAULT_SORTER_RESOURCES = SorterResources(cpu_threads=1, memory_gb=4, gpu=False)
+
+class WorkerPool(NamedTuple):
+    name: str
+    num_workers: int
+    threads_per_worker: Union[int, None] # None: not checked
+    memory_gb_per_worker: Union[float, None] # None: not checked
+    gpu: bool
+
+class JobRequest(NamedTuple):
+    sorter_name: str
+    study_name: str
+    recording_name: str
+    recording_uri: str
+    num_channels: Union[int, None]
+    duration_sec: Union[float, None]
+    sampling_frequency: Union[float, None] = None
+
+class ScheduledJob(NamedTuple):
+    request: JobRequest
+    pool: str
+    estimated_cost_sec: float
+    estimated_start_sec: float
+
+class Schedule(NamedTuple):
+    jobs: List[ScheduledJob] # in submission order (longest first)
+    makespan_sec: float
+    pool_busy_sec: Dict[str, float]
+
+
+def get_sorter_resources(sorter_name: str) -> SorterResources:
+    return SORTER_RESOURCES.get(sorter_name, DEFAULT_SORTER_RESOURCES)
+
+
+class JobCostModel:
+    """Estimates the run time of a sorting job from past cpuTimeSec and the size of the recording
+
+    A job already run for the same (sorter, study, recording) is estimated by
+    its past run time. Otherwise, for a recording of known size, the mean
+    predicted by runtime_model is used if there is one. Otherwise the cost is
+    the recording size (channels x seconds) times the sorter's median past
+    rate (seconds per channel-second), or times default_rate for sorters
+    without history.
+    """
+    def __init__(self, history: Iterable[Tuple[str, str, str, float, Union[float, None]]] = (), *,
+                 runtime_model: Union[RuntimeModel, None] = None, default_rate: float = 0.01, default_size: float = 32 * 600):
+        # history items: (sorter_name, study_name, recording_name, cpu_time_sec, recording size or None)
+        self._past: Dict[Tuple[str, str, str], float] = {}
+        rates: Dict[str, List[float]] = {}
+        for (sorter_name, study_name, recording_name, cpu_time_sec, size) in history:
+            if not np.isfinite(cpu_time_sec) or cpu_time_sec <= 0:
+                continue
+            self._past[(sorter_name, study_name, recording_name)] = cpu_time_sec
+            if size is not None and size > 0:
+                rates.setdefault(sorter_name, []).append(cpu_time_sec / size)
+        self._rates = {sorter_name: float(np.median(r)) for sorter_name, r in rates.items()}
+        self._runtime_model = runtime_model
+        self._default_rate = default_rate
+        self._default_size = default_size
+
+    @staticmethod
+    def from_catalogs(sorting_output_catalog, recording_catalog=None) -> 'JobCostModel':
+        """A model using the cpuTimeSec of an SFSortingOutputCatalog (and, given an SFRecordingCatalog, a RuntimeModel fit to them)
+
+        Like the RuntimeModel, only successful runs are used: errored and timed-out runs stopped early.
+        """
+        def history():
+            for X in sorting_output_catalog.select(successful_runs(sorting_output_catalog)):
+                size = None
+                if recording_catalog is not None:
+                    R = recording_catalog.find_recording(study_name=X.study_name, recording_name=X.recording_name)
+                    if R is not None:
+                        size = R.num_channels * R.duration_sec
+                yield (X.sorter_name, X.study_name, X.recording_name, float(X.cpu_time_sec), size)
+        runtime_model = RuntimeModel.from_catalogs(sorting_output_catalog, recording_catalog) if recording_catalog is not None else None
+        return JobCostModel(history(), runtime_model=runtime_model)
+
+    def recording_size(self, request: JobRequest) -> float:
+        if request.num_channels is None or request.duration_sec is None:
+            return self._default_size
+        return request.num_channels * request.duration_sec
+
+    def predict(self, request: JobRequest) -> Union[RuntimePrediction, None]:
+        """The runtime model's prediction for the job, or None without a model or recording size"""
+        if self._runtime_model is None or request.num_channels is None or request.duration_sec is None:
+            return None
+        return self._runtime_model.predict(request.sorter_name, num_channels=request.num_channels,
+                                           duration_sec=request.duration_sec, sampling_frequency=request.sampling_frequency)
+
+    def estimate(self, request: JobRequest) -> float:
+        past = self._past.get((request.sorter_name, request.study_name, request.recording_name), None)
+        if past is not None:
+            return past
+        P = self.predict(request)
+        if P is not None:
+            return P.mean_sec
+        return self._rates.get(request.sorter_name, self._default_rate) * self.recording_size(request)
+
+
+def eligible_pools(resources: SorterResources, pools: List[WorkerPool]) -> List[WorkerPool]:
+    return [
+        p for p in pools
+        if p.num_workers > 0
+        and (p.threads_per_worker is None or p.threads_per_worker >= resources.cpu_threads)
+        and (p.memory_gb_per_worker is None or p.memory_gb_per_worker >= resources.memory_gb)
+        and (p.gpu or not resources.gpu)
+    ]
+
+
+def schedule_jobs(requests: List[JobRequest], pools: List[WorkerPool], cost_model: JobCostModel) -> Schedule:
+    """Assigns jobs to pools longest-processing-time first
+
+    Jobs are taken in order of decreasing estimated cost, and each goes to
+    the eligible worker that becomes free first. CPU sorters only use GPU
+    pools when no CPU pool can run them. Submitting each pool's jobs in this
+    order to a FIFO job handler with that many workers reproduces the plan.
+    """
+    costs = [cost_model.estimate(r) for r in requests]
+    order = sorted(range(len(requests)), key=lambda i: -costs[i])
+    # per pool: heap of worker free times
+    free_at: Dict[str, List[float]] = {p.name: [0.0] * p.num_workers for p in pools}
+    busy: Dict[str, float] = {p.name: 0.0 for p in pools}
+    jobs: List[ScheduledJob] = []
+    for i in order:
+        r = requests[i]
+        resources = get_sorter_resources(r.sorter_name)
+        candidates = eligible_pools(resources, pools)
+        if len(candidates) == 0:
+            raise Exception(f'No worker pool can run sorter {r.sorter_name} (requires {resources})')
+        if not resources.gpu and any(not p.gpu for p in candidates):
+            candidates = [p for p in candidates if not p.gpu]
+        pool = min(candidates, key=lambda p: free_at[p.name][0])
+        start = heapq.heappop(free_at[pool.name])
+        heapq.heappush(free_at[pool.name], start + costs[i])
+        busy[pool.name] += costs[i]
+        jobs.append(ScheduledJob(request=r, pool=pool.name, estimated_cost_sec=costs[i], estimated_start_sec=start))
+    makespan = max([j.estimated_start_sec + j.estimated_cost_sec for j in jobs], default=0.0)
+    return Schedule(jobs=jobs, makespan_sec=makespan, pool_busy_sec=busy)
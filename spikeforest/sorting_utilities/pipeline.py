@@ -0,0 +1,241 @@
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, Hashable, Iterable, List, NamedTuple, Union
+
+# A small in-process DAG executor. Each input item (e.g. a completed sorting
+# job) starts one pipeline: its stages run on a shared thread pool as soon as
+# the stages they depend on have finished, so the stages of one item overlap
+# with those of the others, and the latency of an item is that of its longest
+# chain of stages. The number of running tasks of each stage is bounded, as is
+# the number of items in flight.
+
+ROOT_STAGE = 'input'
+
+class PipelineStage(NamedTuple):
+    name: str
+    fn: Callable[['PipelineContext'], Any]
+    depends_on: List[str] # names of earlier stages, or ROOT_STAGE
+    max_in_flight: int = 1
+
+class PipelineResult(NamedTuple):
+    item: Any
+    results: Dict[str, Any] # stage name -> return value, for the stages that succeeded
+    errors: Dict[str, str] # stage name -> error message, for the stages that failed or were skipped
+
+
+class ExtractorCache:
+    """Thread-safe LRU cache of loaded objects (e.g. extractors), shared by the stages of all pipelines
+
+    Each object is loaded once, by the first caller; concurrent callers for
+    the same key wait for that load rather than loading it again.
+    """
+    def __init__(self, max_entries: int = 32):
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+            X = load()
+            with self._lock:
+                self._entries[key] = X
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._loading.pop(key, None)
+            return X
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'num_entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class PipelineContext:
+    """What a stage function gets: the input item, the results of earlier stages and the shared cache"""
+    def __init__(self, item: Any, cache: ExtractorCache) -> None:
+        self.item = item
+        self.cache = cache
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self._queued = set()
+
+
+class PipelineExecutor:
+    def __init__(self, stages: List[PipelineStage], *, num_threads: int = 4, max_items_in_flight: int = 8, cache: Union[ExtractorCache, None] = None):
+        names = [ROOT_STAGE]
+        for stage in stages:
+            for dep in stage.depends_on:
+                if dep not in names:
+                    raise Exception(f'Stage {stage.name} depends on unknown or later stage: {dep}')
+            if stage.name in names:
+                raise Exception(f'Duplicate stage name: {stage.name}')
+            names.append(stage.name)
+        self._stages = stages
+        self._num_threads = num_threads
+        self._max_items_in_flight = max_items_in_flight
+        self.cache = cache if cache is not None else ExtractorCache()
+
+    def run(self, items: Iterable[Any]) -> Generator[PipelineResult, None, None]:
+        """Runs the pipeline for each item (as the iterable produces them) and yields results in completion order
+
+        The items are taken on a separate input thread, so a result is yielded
+        as soon as its last stage finishes, even while the iterable is waiting
+        for its next item. Taking the next item waits while
+        max_items_in_flight items are still in progress. A stage whose
+        dependency failed is skipped. An exception raised by the iterable is
+        raised here.
+        """
+        run = _PipelineRun(self._stages, self._num_threads, self.cache)
+        slots = threading.Semaphore(self._max_items_in_flight)
+        input_thread = threading.Thread(target=run.feed, args=(items, slots), name='pipeline-input', daemon=True)
+        input_thread.start()
+        try:
+            num_items: Union[int, None] = None # known once the input is exhausted
+            num_done = 0
+            while num_items is None or num_done < num_items:
+                x = run.done.get()
+                if isinstance(x, _InputEnd):
+                    if x.error is not None:
+                        raise x.error
+                    num_items = x.num_items
+                    continue
+                num_done += 1
+                slots.release()
+                yield x
+        finally:
+            run.shutdown()
+            # wakes the input thread if it waits for a slot; if it waits on the iterable, the item it gets is dropped
+            slots.release()
+
+
+class _InputEnd(NamedTuple):
+    num_items: int
+    error: Union[Exception, None]
+
+
+class _PipelineRun:
+    def __init__(self, stages: List[PipelineStage], num_threads: int, cache: ExtractorCache):
+        self._stages = stages
+        self._cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=num_threads)
+        self._lock = threading.Lock()
+        self._in_flight = {stage.name: 0 for stage in stages}
+        self._waiting: Dict[str, List[PipelineContext]] = {stage.name: [] for stage in stages}
+        self._remaining: Dict[int, int] = {} # id(ctx) -> number of stages not yet finished
+        self._stopped = False
+        # finished items, then an _InputEnd once the input thread has taken them all
+        self.done: 'queue.Queue[Union[PipelineResult, _InputEnd]]' = queue.Queue()
+
+    def feed(self, items: Iterable[Any], slots: threading.Semaphore):
+        # runs on the input thread: takes an item whenever one of the slots is free
+        num_items = 0
+        iterator = iter(items)
+        try:
+            while True:
+                slots.acquire()
+                if self._stopped:
+                    return
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                if self._stopped:
+                    return
+                self.start(item)
+                num_items += 1
+        except Exception as e:
+            self.done.put(_InputEnd(num_items=num_items, error=e))
+            return
+        self.done.put(_InputEnd(num_items=num_items, error=None))
+
+    def start(self, item: Any):
+        ctx = PipelineContext(item, self._cache)
+        with self._lock:
+            self._remaining[id(ctx)] = len(self._stages)
+        if len(self._stages) == 0:
+            self._finish_item(ctx)
+            return
+        self._advance(ctx, ROOT_STAGE)
+
+    def shutdown(self):
+        # tasks still queued return without running their stage, and nothing more is submitted
+        # (rather than shutdown(cancel_futures=True), which needs Python 3.9)
+        with self._lock:
+            self._stopped = True
+        self._executor.shutdown(wait=True)
+
+    def _advance(self, ctx: PipelineContext, finished_stage: str):
+        # queue the stages that were waiting only on finished_stage, then start what the limits allow
+        with self._lock:
+            for stage in self._stages:
+                if stage.name in ctx._queued or finished_stage not in stage.depends_on:
+                    continue
+                if all(d == ROOT_STAGE or d in ctx.results or d in ctx.errors for d in stage.depends_on):
+                    ctx._queued.add(stage.name)
+                    self._waiting[stage.name].append(ctx)
+        self._dispatch()
+
+    def _dispatch(self):
+        to_skip = []
+        with self._lock:
+            if self._stopped:
+                return
+            for stage in self._stages:
+                waiting = self._waiting[stage.name]
+                while len(waiting) > 0 and self._in_flight[stage.name] < stage.max_in_flight:
+                    ctx = waiting.pop(0)
+                    failed = [d for d in stage.depends_on if d in ctx.errors]
+                    if len(failed) > 0:
+                        to_skip.append((stage, ctx, f'Skipped: {", ".join(failed)} failed'))
+                        continue
+                    self._in_flight[stage.name] += 1
+                    # submitted under the lock, so never after shutdown()
+                    self._executor.submit(self._run_task, stage, ctx)
+        for (stage, ctx, msg) in to_skip:
+            self._stage_done(stage, ctx, None, msg, ran=False)
+
+    def _run_task(self, stage: PipelineStage, ctx: PipelineContext):
+        if self._stopped:
+            return
+        try:
+            result = stage.fn(ctx)
+            error = None
+        except Exception as e:
+            result = None
+            error = f'{type(e).__name__}: {e}'
+        self._stage_done(stage, ctx, result, error, ran=True)
+
+    def _stage_done(self, stage: PipelineStage, ctx: PipelineContext, result: Any, error: Union[str, None], *, ran: bool):
+        with self._lock:
+            if ran:
+                self._in_flight[stage.name] -= 1
+            if error is None:
+                ctx.results[stage.name] = result
+            else:
+                ctx.errors[stage.name] = error
+            self._remaining[id(ctx)] -= 1
+            item_done = self._remaining[id(ctx)] == 0
+            if item_done:
+                del self._remaining[id(ctx)]
+        if item_done:
+            self._finish_item(ctx)
+        self._advance(ctx, stage.name)
+
+    def _finish_item(self, ctx: PipelineContext):
+        self.done.put(PipelineResult(item=ctx.item, results=dict(ctx.results), errors=dict(ctx.errors)))
@@ -89,11 +89,34 @@ def parse_workspace_params(parsed: Namespace) -> Params:
         raise Exception("Exactly one of sortings_file and sortings_file_kachery_uri must be set.")
     if parsed.sortings_file is not None:
         with open(parsed.sortings_file) as fp:
-            sortings = json.load(fp)
+            sortings = parse_sortings_text(fp.read())
     else:
-        sortings = kc.load_json(parsed.sortings_file_kachery_uri)
+        text = kc.load_text(parsed.sortings_file_kachery_uri)
+        if text is None:
+            raise Exception(f"Unable to load sortings file {parsed.sortings_file_kachery_uri}.")
+        sortings = parse_sortings_text(text)
     return Params(workspace_uri, sortings, parsed.dry_run)
 
+def parse_sortings_text(text: str) -> List[Any]:
+    # Accepts a JSON list of sorting records, or JSON Lines (one record per line, as written
+    # incrementally by run_sortings). A trailing partial line (from an interrupted run) is skipped.
+    try:
+        sortings = json.loads(text)
+        return sortings if isinstance(sortings, list) else [sortings]
+    except json.JSONDecodeError:
+        pass
+    sortings = []
+    lines = [line for line in text.splitlines() if line.strip() != '']
+    for i, line in enumerate(lines):
+        try:
+            sortings.append(json.loads(line))
+        except json.JSONDecodeError:
+            if i == len(lines) - 1:
+                print("WARNING: skipping incomplete last line of sortings file.")
+                continue
+            raise
+    return sortings
+
 def get_known_recording_id(workspace: Union[sv.Workspace, None], recording_label: str) -> str:
     if workspace is None: return None
     for (_, v) in workspace._recordings.items():
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+
+from argparse import ArgumentParser
+import json
+from typing import Any, Dict, Generator, Iterable, List, NamedTuple, Tuple, TypedDict, Union
+
+import hither2 as hi
+import sortingview as sv
+
+from spikeforest._common.calling_framework import StandardArgs, add_standard_args, call_cleanup, extract_hither_config, parse_shared_configuration, print_per_verbose
+from spikeforest.sorting_utilities.job_ledger import JobLedger
+from spikeforest.sorting_utilities.pipeline import ROOT_STAGE, ExtractorCache, PipelineContext, PipelineExecutor, PipelineResult, PipelineStage
+from spikeforest.sorting_utilities.prepare_workspace import FullRecordingEntry, TRUE_SORT_LABEL, add_entry_to_workspace, add_workspace_selection_args, establish_workspace, get_known_recording_id, get_labels, sortings_are_in_workspace
+from spikeforest.sorting_utilities.run_sortings import ArgsDict, JsonlRecordWriter, OutputRecord, SortingJob, add_ledger_args, check_worker_pools, cleanup_pool_job_handlers, init_sorting_args, iter_completed_jobs, load_cost_model, load_study_records, make_output_record, make_pool_job_handlers, make_worker_pools, parse_argsdict, parse_sorters, populate_sorting_matrix, remove_completed_pairs, sorting_loop
+from spikeforest.sorting_utilities.sorting_metrics import compare_with_ground_truth, compute_quality_metrics
+
+# Runs the sorters and, as each sorting completes, its quality metrics, its ground-truth comparison and
+# (optionally) the post to a workspace, all in one process. Sorting jobs run on hither as in run_sortings;
+# the output record of a sorting is made on the main thread as soon as the job completes, and the other
+# stages run on a thread pool (see pipeline.py), sharing the loaded recording and sorting extractors.
+# With a ledger, a sorting is recorded as completed only once all of its stages have run.
+# Quality metrics and ground-truth comparisons need spiketoolkit and spikecomparison in this environment
+# (see sorting_metrics.py).
+
+class PipelineArgs(TypedDict):
+    workspace_uri: Union[str, None]
+    pipeline_threads: int
+    metrics_in_flight: int
+    max_pending_sortings: int
+
+class PipelineItem(NamedTuple):
+    job: SortingJob
+    record: OutputRecord
+
+# Output: one JSON line per sorting, with the fields of the run_sortings output record plus these
+class PipelineOutputRecord(OutputRecord):
+    qualityMetrics: Any
+    groundTruthComparison: Any
+    postedToWorkspace: bool
+    pipelineErrors: Dict[str, str]
+
+
+def init_configuration() -> Tuple[ArgsDict, PipelineArgs, StandardArgs]:
+    parser = ArgumentParser(description="Runs the specified spike sorters on the given study sets and, as each sorting " +
+        "completes, computes its quality metrics and ground-truth comparison and (optionally) adds it to a workspace. " +
+        "Writes one JSON line per sorting.")
+    parser = init_sorting_args(parser)
+    parser = add_ledger_args(parser)
+    parser = add_workspace_selection_args(parser)
+    parser.add_argument('--pipeline-threads', action='store', type=int, default=4,
+        help="Number of threads for the metric, comparison and workspace stages. Default 4.")
+    parser.add_argument('--metrics-in-flight', action='store', type=int, default=2,
+        help="Maximum number of quality-metric (and, separately, ground-truth comparison) tasks running at once. Default 2.")
+    parser.add_argument('--max-pending-sortings', action='store', type=int, default=8,
+        help="Maximum number of completed sortings whose later stages are still running; further completed " +
+        "sortings are picked up once these finish. Default 8.")
+    parser = add_standard_args(parser)
+    parsed = parser.parse_args()
+    std_args = parse_shared_configuration(parsed)
+    args = parse_argsdict(parsed)
+    if parsed.workspace_uri is None and not parsed.create_new_workspace:
+        workspace_uri = None
+    else:
+        workspace_uri = establish_workspace(parsed)
+        print(f"Using workspace uri {workspace_uri}")
+    pipeline_args: PipelineArgs = {
+        'workspace_uri': workspace_uri,
+        'pipeline_threads': max(parsed.pipeline_threads, 1),
+        'metrics_in_flight': max(parsed.metrics_in_flight, 1),
+        'max_pending_sortings': max(parsed.max_pending_sortings, 1)
+    }
+    if (parsed.check_config):
+        print(f"\n\tFinal Shared configuration:\n{json.dumps(std_args, indent=4)}")
+        print(f"\n\tFinal configuration:\n{json.dumps(args, indent=4)}\n{json.dumps(pipeline_args, indent=4)}")
+        exit()
+    return (args, pipeline_args, std_args)
+
+
+def get_recording(ctx: PipelineContext) -> Any:
+    uri = ctx.item.job.recording_uri
+    return ctx.cache.get(('recording', uri), lambda: sv.LabboxEphysRecordingExtractor(uri, download=True))
+
+def get_ground_truth_sorting(ctx: PipelineContext) -> Any:
+    uri = ctx.item.job.ground_truth_uri
+    sample_rate = get_recording(ctx).get_sampling_frequency()
+    return ctx.cache.get(('ground_truth', uri), lambda: sv.LabboxEphysSortingExtractor(uri, samplerate=sample_rate))
+
+def get_sorting(ctx: PipelineContext) -> Any:
+    sorting_output = ctx.item.record['sortingOutput']
+    if sorting_output is None:
+        raise Exception('The sorting job errored; there is no sorting output.')
+    sample_rate = get_recording(ctx).get_sampling_frequency()
+    key = ('sorting', json.dumps(sorting_output, sort_keys=True))
+    return ctx.cache.get(key, lambda: sv.LabboxEphysSortingExtractor(sorting_output, samplerate=sample_rate))
+
+def quality_metrics_stage(ctx: PipelineContext) -> Any:
+    return compute_quality_metrics(get_recording(ctx), get_sorting(ctx))
+
+def ground_truth_comparison_stage(ctx: PipelineContext) -> Any:
+    return compare_with_ground_truth(get_sorting(ctx), get_ground_truth_sorting(ctx))
+
+def make_workspace_post_stage(workspace_uri: str):
+    def workspace_post_stage(ctx: PipelineContext) -> bool:
+        job: SortingJob = ctx.item.job
+        workspace = sv.load_workspace(workspace_uri)
+        (r_label, gt_label, s_label) = get_labels(job.study_name, job.recording_name, TRUE_SORT_LABEL, job.sorter_name)
+        (gt_exists, sorting_exists) = sortings_are_in_workspace(workspace, gt_label, s_label)
+        entry = FullRecordingEntry(
+            r_label, gt_label, s_label, get_known_recording_id(workspace, r_label),
+            get_recording(ctx), get_ground_truth_sorting(ctx), get_sorting(ctx),
+            gt_exists, sorting_exists
+        )
+        add_entry_to_workspace(re=entry, workspace=workspace)
+        return True
+    return workspace_post_stage
+
+def make_stages(pipeline_args: PipelineArgs) -> List[PipelineStage]:
+    stages = [
+        PipelineStage(name='quality_metrics', fn=quality_metrics_stage, depends_on=[ROOT_STAGE],
+                      max_in_flight=pipeline_args['metrics_in_flight']),
+        PipelineStage(name='ground_truth_comparison', fn=ground_truth_comparison_stage, depends_on=[ROOT_STAGE],
+                      max_in_flight=pipeline_args['metrics_in_flight'])
+    ]
+    if pipeline_args['workspace_uri'] is not None:
+        # posts to one workspace are made one at a time
+        stages.append(PipelineStage(name='workspace_post', fn=make_workspace_post_stage(pipeline_args['workspace_uri']),
+                                    depends_on=[ROOT_STAGE], max_in_flight=1))
+    return stages
+
+def iter_stored_sortings(jobs: Iterable[SortingJob]) -> Generator[PipelineItem, None, None]:
+    # Runs on the pipeline's input thread: the output record (which stores the sorting) is made here, with the hither jobs.
+    for job in iter_completed_jobs(jobs):
+        record = make_output_record(job)
+        print_per_verbose(2, f"Stored sorting {job.sorter_name} on {job.study_name}/{job.recording_name}")
+        yield PipelineItem(job=job, record=record)
+
+def make_pipeline_output_record(result: PipelineResult) -> PipelineOutputRecord:
+    record: PipelineOutputRecord = {
+        **result.item.record,
+        'qualityMetrics': result.results.get('quality_metrics', None),
+        'groundTruthComparison': result.results.get('ground_truth_comparison', None),
+        'postedToWorkspace': result.results.get('workspace_post', False),
+        'pipelineErrors': result.errors
+    }
+    return record
+
+def main():
+    (args, pipeline_args, std_args) = init_configuration()
+    study_sets = load_study_records(args['study_source_file'])
+    study_matrix = parse_sorters(args['sorter_spec_file'], list(study_sets.keys()))
+    sorting_matrix = populate_sorting_matrix(study_matrix, study_sets)
+    ledger = JobLedger(args['ledger'], max_attempts=args['max_attempts']) if args['ledger'] is not None else None
+    if ledger is not None:
+        sorting_matrix = remove_completed_pairs(sorting_matrix, ledger)
+
+    pools = make_worker_pools(args, std_args)
+    check_worker_pools(sorting_matrix, pools, std_args)
+    cost_model = load_cost_model(args['runtime_history'])
+    hither_config = extract_hither_config(std_args)
+    job_handlers = make_pool_job_handlers(pools, hither_config, std_args)
+    executor = PipelineExecutor(make_stages(pipeline_args), num_threads=pipeline_args['pipeline_threads'],
+                                max_items_in_flight=pipeline_args['max_pending_sortings'], cache=ExtractorCache())
+    num_written = 0
+    try:
+        with hi.Config(**hither_config), JsonlRecordWriter(std_args['outfile']) as writer:
+            sortings = sorting_loop(sorting_matrix, download_workers=args['download_workers'],
+                                    pools=pools, cost_model=cost_model, job_handlers=job_handlers,
+                                    auto_timeout=args['auto_timeout'], max_timeout_sec=hither_config['job_timeout_sec'],
+                                    ledger=ledger)
+            for result in executor.run(iter_stored_sortings(sortings)):
+                record = make_pipeline_output_record(result)
+                writer.write(record)
+                job: SortingJob = result.item.job
+                if ledger is not None:
+                    # only once all stages have run, so an interrupted pipeline is rerun on resume
+                    ledger.complete(job.sorter_name, job.params, job.recording_uri, record, errored=record['errored'])
+                num_written += 1
+                for (stage, error) in result.errors.items():
+                    print(f"WARNING: {stage} for {job.sorter_name} on {job.study_name}/{job.recording_name}: {error}")
+                print_per_verbose(2, f"Completed {num_written} pipelines (latest: {job.sorter_name} on {job.study_name}/{job.recording_name})")
+        print_per_verbose(1, f"Completed {num_written} pipelines; extractor cache: {executor.cache.stats()}")
+    finally:
+        if ledger is not None:
+            ledger.close()
+        cleanup_pool_job_handlers(job_handlers, hither_config)
+        call_cleanup(hither_config)
+
+
+if __name__ == "__main__":
+    main()
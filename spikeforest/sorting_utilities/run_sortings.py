@@ -1,18 +1,22 @@
 #!/usr/bin/python
 
 from argparse import ArgumentParser, Namespace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 import json
 import os
-from typing import Any, Dict, Generator, List, NamedTuple, Tuple, TypedDict, Union
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, List, NamedTuple, Tuple, TypedDict, Union
 import yaml
 
-from spikeforest._common.calling_framework import StandardArgs, add_standard_args, call_cleanup, extract_hither_config, _fmt_time, parse_shared_configuration, print_per_verbose
+from spikeforest._common.calling_framework import HitherConfiguration, StandardArgs, add_standard_args, call_cleanup, extract_hither_config, _fmt_time, parse_shared_configuration, print_per_verbose
 import spikeextractors as se
 import spikeforest as sf
 import hither2 as hi
 import kachery_cloud as kc
 import sortingview as sv
+from spikeforest.sorting_utilities.job_ledger import JobLedger
+from spikeforest.sorting_utilities.job_scheduler import JobCostModel, JobRequest, Schedule, WorkerPool, eligible_pools, get_sorter_resources, schedule_jobs
 
 # Maps the sorter names (as they appear in the spec file) to the
 # wrapper functions exposed by this package.
@@ -27,16 +31,37 @@ KNOWN_SORTERS = {
 
 DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
 
+# Automatic job timeouts (--auto-timeout): AUTO_TIMEOUT_FACTOR times the predicted
+# AUTO_TIMEOUT_QUANTILE of the run time, but never less than AUTO_TIMEOUT_MIN_SEC.
+AUTO_TIMEOUT_QUANTILE = 0.99
+AUTO_TIMEOUT_FACTOR = 2.0
+AUTO_TIMEOUT_MIN_SEC = 600
+
+# How often to check for completed jobs once all jobs are queued
+JOB_POLL_INTERVAL_SEC = 5
+
 # TypedDict as we might be changing the values; NamedTuple is immutable
 class ArgsDict(TypedDict):
     study_source_file: str
     sorter_spec_file: str
+    download_workers: int
+    gpu_workers: int
+    worker_threads: Union[int, None]
+    worker_memory_gb: Union[float, None]
+    runtime_history: Union[str, None]
+    auto_timeout: bool
+    ledger: Union[str, None]
+    max_attempts: int
 
 class RecordingRecord(NamedTuple):
     study_name: str
     recording_name: str
     recording_uri: str
     ground_truth_uri: str
+    # size of the recording, if listed in the study set file (used to estimate job cost)
+    num_channels: Union[int, None] = None
+    duration_sec: Union[float, None] = None
+    sampling_frequency: Union[float, None] = None
 
 class StudyRecord(NamedTuple):
     study_name: str
@@ -89,6 +114,7 @@ def init_configuration() -> Tuple[ArgsDict, StandardArgs]:
     parser = ArgumentParser(description="Given a list of study sets, run the specified suite of " +
         "spike sorters. Store results in kachery and return a json object describing the resulting sortings.")
     parser = init_sorting_args(parser)
+    parser = add_ledger_args(parser)
     parser = add_standard_args(parser)
     parsed = parser.parse_args()
     std_args = parse_shared_configuration(parsed)
@@ -111,14 +137,57 @@ def init_sorting_args(parser: ArgumentParser) -> ArgumentParser:
         "option will override any value specified in the sorter spec file.")
     parser.add_argument('--sorter-spec-file', '-l', action='store',
         help="Path or kachery URI for the YAML file which contains the sorters to run, with parameters.")
+    parser.add_argument('--download-workers', action='store', type=int, default=4,
+        help="Number of recordings to download concurrently before their sorting jobs are queued. Default 4.")
+    parser.add_argument('--gpu-workers', action='store', type=int, default=1,
+        help="Number of workers in the separate pool for GPU sorters (Kilosort2/3). Default 1. Ignored if using slurm, " +
+        "where GPU sorters run on the allocations if --slurm-gpus-per-node is set.")
+    parser.add_argument('--worker-threads', action='store', type=int, default=None,
+        help="CPU threads available to each worker. If set, sorters needing more threads are not scheduled on that pool.")
+    parser.add_argument('--worker-memory-gb', action='store', type=float, default=None,
+        help="Memory (GB) available to each worker. If set, sorters needing more memory are not scheduled on that pool.")
+    parser.add_argument('--runtime-history', action='store', default=None,
+        help="Kachery URI of a SpikeForest sorting outputs file whose cpuTimeSec values are used to estimate job " +
+        "run times. If unset, jobs are ordered by recording size alone.")
+    parser.add_argument('--auto-timeout', action='store_true', default=False,
+        help="If set, each job's timeout is derived from its predicted run time (twice the 99th percentile, at least " +
+        f"{AUTO_TIMEOUT_MIN_SEC // 60} minutes); a non-zero --timeout-min caps it. Requires --runtime-history.")
+    return parser
+
+def add_ledger_args(parser: ArgumentParser) -> ArgumentParser:
+    # Only for the scripts that record completed jobs in the ledger (run_sortings, run_pipeline)
+    parser.add_argument('--ledger', action='store', default=None,
+        help="Path of an SQLite job ledger. Sorter/recording pairs recorded there as finished are skipped, errored " +
+        "ones are retried (see --max-attempts), and runners sharing the ledger never run the same pair at once.")
+    parser.add_argument('--max-attempts', action='store', type=int, default=2,
+        help="With --ledger, the number of times a sorter/recording pair may error before it is no longer retried. Default 2.")
     return parser
 
 def parse_argsdict(parsed: Namespace) -> ArgsDict:
     args: ArgsDict = {
         'study_source_file': '',
-        'sorter_spec_file': ''
+        'sorter_spec_file': '',
+        'download_workers': 4,
+        'gpu_workers': 1,
+        'worker_threads': None,
+        'worker_memory_gb': None,
+        'runtime_history': None,
+        'auto_timeout': False,
+        'ledger': None,
+        'max_attempts': 2
     }
     args['sorter_spec_file'] = parsed.sorter_spec_file
+    args['download_workers'] = max(parsed.download_workers, 1)
+    args['gpu_workers'] = max(parsed.gpu_workers, 0)
+    args['worker_threads'] = parsed.worker_threads
+    args['worker_memory_gb'] = parsed.worker_memory_gb
+    args['runtime_history'] = parsed.runtime_history
+    args['auto_timeout'] = parsed.auto_timeout
+    # absent unless the script added the ledger args
+    args['ledger'] = getattr(parsed, 'ledger', None)
+    args['max_attempts'] = max(getattr(parsed, 'max_attempts', 2), 1)
+    if args['auto_timeout'] and args['runtime_history'] is None:
+        raise Exception("--auto-timeout requires --runtime-history.")
     if args['sorter_spec_file'] is None or not os.path.exists(args['sorter_spec_file']):
         raise FileNotFoundError(f"Requested spec file {args['sorter_spec_file']} does not exist.")
     if (parsed.study_source_file is not None):
@@ -169,6 +238,38 @@ def populate_sorting_matrix(study_matrix: SorterStudyMatrixDict, study_sets: Stu
         )
     return detailed_matrix
 
+def remove_completed_pairs(matrix: SortingMatrixDict, ledger: JobLedger) -> SortingMatrixDict:
+    new_matrix: SortingMatrixDict = {}
+    num_skipped = 0
+    for sorter_name in matrix.keys():
+        (sorter, recording_list) = matrix[sorter_name]
+        for recording in recording_list:
+            if ledger.is_done(sorter.sorter_name, sorter.sorting_parameters, recording.recording_uri):
+                num_skipped += 1
+                continue
+            if sorter_name not in new_matrix:
+                new_matrix[sorter_name] = SortingMatrixEntry(sorter_record=sorter, requested_recordings=[])
+            new_matrix[sorter_name].requested_recordings.append(recording)
+    print(f"Skipping {num_skipped} sorter/recording pairs already completed according to the ledger")
+    return new_matrix
+
+def remove_unclaimable_pairs(matrix: SortingMatrixDict, ledger: JobLedger) -> SortingMatrixDict:
+    # pairs that are done, or being run by another runner sharing the ledger
+    new_matrix: SortingMatrixDict = {}
+    num_skipped = 0
+    for sorter_name in matrix.keys():
+        (sorter, recording_list) = matrix[sorter_name]
+        for recording in recording_list:
+            if not ledger.is_claimable(sorter.sorter_name, sorter.sorting_parameters, recording.recording_uri):
+                num_skipped += 1
+                continue
+            if sorter_name not in new_matrix:
+                new_matrix[sorter_name] = SortingMatrixEntry(sorter_record=sorter, requested_recordings=[])
+            new_matrix[sorter_name].requested_recordings.append(recording)
+    if num_skipped > 0:
+        print(f"Skipping {num_skipped} sorter/recording pairs running elsewhere according to the ledger")
+    return new_matrix
+
 def load_study_records(study_set_file: str) -> StudySetsDict:
     hydrated_sets = kc.load_json(study_set_file)
     assert hydrated_sets is not None
@@ -206,7 +307,10 @@ def make_study_records_from_studyset(study_set: Any) -> List[StudyRecord]:
                                 study_name       = study['name'],
                                 recording_name   = r['name'],
                                 recording_uri    = r['recordingUri'],
-                                ground_truth_uri = r['sortingTrueUri']
+                                ground_truth_uri = r['sortingTrueUri'],
+                                num_channels     = r.get('numChannels', None),
+                                duration_sec     = r.get('durationSec', None),
+                                sampling_frequency = r.get('sampleRateHz', None)
                             )
                             for r in study['recordings']]
             )
@@ -241,31 +345,193 @@ def make_study_records_from_studyset(study_set: Any) -> List[StudyRecord]:
 #     "recordingUri": "sha1://05536d7a37efb3f5f2ca42c987964f199305f480/20160415_patch2.json",
 #     "sortingTrueUri": "sha1://71eea1fbe545bacf12884711baab387dce7160e1/20160415_patch2.firings_true.json"
 # }
-def queue_sort(sorter: SorterRecord, recording: RecordingRecord) -> hi.Job:
+def queue_sort(sorter: SorterRecord, recording: RecordingRecord, recording_object: Union[Any, None] = None) -> hi.Job:
     if sorter.sorter_name not in KNOWN_SORTERS.keys():
         raise Exception(f'Sorter {sorter.sorter_name} was requested but is not recognized.')
     sort_fn = KNOWN_SORTERS[sorter.sorter_name]
 
-    base_recording = sv.LabboxEphysRecordingExtractor(recording.recording_uri, download=True)
+    if recording_object is None:
+        recording_object = download_recording(recording.recording_uri)
     params = {
-        'recording_object': base_recording.object()
+        'recording_object': recording_object
     }
     return hi.Job(sort_fn, params)
 
-def sorting_loop(sorting_matrix: SortingMatrixDict) -> Generator[SortingJob, None, None]:
+def download_recording(recording_uri: str) -> Any:
+    base_recording = sv.LabboxEphysRecordingExtractor(recording_uri, download=True)
+    return base_recording.object()
+
+def prefetch_recordings(recording_uris: List[str], executor: ThreadPoolExecutor,
+                        is_needed: Union[Callable[[str], bool], None] = None) -> Dict[str, Future]:
+    # One download per distinct recording, however many sorters use it, started in the given order.
+    # With is_needed, a download is skipped (its result is None) if is_needed(uri) is False when it
+    # would start, e.g. because other runners on a shared ledger have claimed all its jobs meanwhile.
+    def download_if_needed(uri: str) -> Any:
+        if is_needed is not None and not is_needed(uri):
+            print_per_verbose(2, f"Not downloading {uri}: no job needs it")
+            return None
+        return download_recording(uri)
+    futures: Dict[str, Future] = {}
+    for uri in recording_uris:
+        if uri not in futures:
+            futures[uri] = executor.submit(download_if_needed, uri)
+    print_per_verbose(2, f"Prefetching {len(futures)} distinct recordings")
+    return futures
+
+def make_worker_pools(args: ArgsDict, std_args: StandardArgs) -> List[WorkerPool]:
+    if std_args['use_slurm']:
+        # All jobs share the slurm job handler, whose allocations (each working through its queue of jobs
+        # one at a time) are the workers; they have GPUs if --slurm-gpus-per-node is set.
+        return [WorkerPool(name='slurm', num_workers=std_args['slurm_max_simultaneous_allocs'], threads_per_worker=args['worker_threads'],
+                           memory_gb_per_worker=args['worker_memory_gb'], gpu=std_args['slurm_gpus_per_node'] > 0)]
+    return [
+        WorkerPool(name='cpu', num_workers=std_args['workercount'], threads_per_worker=args['worker_threads'],
+                   memory_gb_per_worker=args['worker_memory_gb'], gpu=False),
+        WorkerPool(name='gpu', num_workers=args['gpu_workers'], threads_per_worker=args['worker_threads'],
+                   memory_gb_per_worker=args['worker_memory_gb'], gpu=True)
+    ]
+
+def check_worker_pools(sorting_matrix: SortingMatrixDict, pools: List[WorkerPool], std_args: StandardArgs) -> None:
+    # Fails before anything is downloaded or queued if a requested sorter can't run on any pool.
+    for sorter_name in sorting_matrix.keys():
+        resources = get_sorter_resources(sorter_name)
+        if len(eligible_pools(resources, pools)) > 0:
+            continue
+        if resources.gpu and not any(p.gpu and p.num_workers > 0 for p in pools):
+            flag = '--slurm-gpus-per-node' if std_args['use_slurm'] else '--gpu-workers'
+            raise Exception(f"{sorter_name} needs a GPU worker, but there are none: set {flag} to at least 1.")
+        raise Exception(f"No worker can run {sorter_name}, which needs {resources.cpu_threads} threads and {resources.memory_gb} GB: " +
+                        "raise --worker-threads or --worker-memory-gb.")
+
+def make_pool_job_handlers(pools: List[WorkerPool], hither_config: HitherConfiguration, std_args: StandardArgs) -> Dict[str, Any]:
+    # The configured handler serves the cpu pool (or, with slurm, the one slurm pool); other pools get
+    # their own parallel handlers. Pools without workers are never assigned jobs
+    # (see job_scheduler.eligible_pools), so they get no handler.
+    handlers: Dict[str, Any] = {}
+    for pool in pools:
+        if pool.num_workers == 0:
+            continue
+        if pool.name == 'cpu' or std_args['use_slurm']:
+            handlers[pool.name] = hither_config['job_handler']
+        else:
+            handlers[pool.name] = hi.ParallelJobHandler(num_workers=pool.num_workers)
+    return handlers
+
+def cleanup_pool_job_handlers(handlers: Dict[str, Any], hither_config: HitherConfiguration) -> None:
+    for handler in handlers.values():
+        if handler is not None and handler is not hither_config['job_handler']:
+            handler.cleanup()
+
+def load_cost_model(runtime_history: Union[str, None]) -> JobCostModel:
+    if runtime_history is None:
+        return JobCostModel()
+    return JobCostModel.from_catalogs(sf.load_spikeforest_sorting_output_catalog(runtime_history), sf.load_spikeforest_recording_catalog())
+
+def make_job_requests(sorting_matrix: SortingMatrixDict) -> Dict[JobRequest, List[Tuple[SorterRecord, RecordingRecord]]]:
+    requests: Dict[JobRequest, List[Tuple[SorterRecord, RecordingRecord]]] = {}
     for sorter_name in sorting_matrix.keys():
-        print_per_verbose(3, f"Queueing sort for sorter {sorter_name}")
         (sorter, recordings) = sorting_matrix[sorter_name]
         for recording in recordings:
-            yield SortingJob(
-                recording_name   = recording.recording_name,
-                recording_uri    = recording.recording_uri,
-                ground_truth_uri = recording.ground_truth_uri,
-                study_name       = recording.study_name,
-                sorter_name      = sorter.sorter_name,
-                params           = sorter.sorting_parameters,
-                sorting_job      = queue_sort(sorter, recording)
+            request = JobRequest(
+                sorter_name    = sorter.sorter_name,
+                study_name     = recording.study_name,
+                recording_name = recording.recording_name,
+                recording_uri  = recording.recording_uri,
+                num_channels   = recording.num_channels,
+                duration_sec   = recording.duration_sec,
+                sampling_frequency = recording.sampling_frequency
             )
+            requests.setdefault(request, []).append((sorter, recording))
+    return requests
+
+def job_timeout_sec(cost_model: JobCostModel, request: JobRequest, max_timeout_sec: Union[float, None]) -> Union[float, None]:
+    # None (no timeout) when the run time can't be predicted and no maximum is set
+    P = cost_model.predict(request)
+    if P is None:
+        return max_timeout_sec
+    timeout = max(AUTO_TIMEOUT_FACTOR * P.quantile(AUTO_TIMEOUT_QUANTILE), AUTO_TIMEOUT_MIN_SEC)
+    return min(timeout, max_timeout_sec) if max_timeout_sec is not None else timeout
+
+def sorting_loop(sorting_matrix: SortingMatrixDict, download_workers: int = 4, *,
+                 pools: Union[List[WorkerPool], None] = None,
+                 cost_model: Union[JobCostModel, None] = None,
+                 job_handlers: Union[Dict[str, Any], None] = None,
+                 auto_timeout: bool = False,
+                 max_timeout_sec: Union[float, None] = None,
+                 ledger: Union[JobLedger, None] = None) -> Generator[SortingJob, None, None]:
+    # Jobs are queued longest first (see job_scheduler.schedule_jobs), each on the job handler of the
+    # pool it was assigned to; without job_handlers, all jobs use the caller's hither configuration.
+    # With auto_timeout, each job gets a timeout from its predicted run time (see job_timeout_sec).
+    # With a ledger, a job is only queued if this runner can claim it (see JobLedger.claim), and jobs
+    # that can't be claimed are left out of the schedule, as are their downloads.
+    # Recordings are downloaded concurrently in schedule order, and each job is queued as soon as
+    # its own recording is local (the first such job in schedule order first), so sorting overlaps
+    # the remaining downloads and a slow download only holds back the jobs that need it.
+    # Jobs are created on the calling thread, within the caller's hither configuration.
+    if pools is None:
+        pools = [WorkerPool(name='default', num_workers=1, threads_per_worker=None, memory_gb_per_worker=None, gpu=True)]
+    if cost_model is None:
+        cost_model = JobCostModel()
+    if ledger is not None:
+        sorting_matrix = remove_unclaimable_pairs(sorting_matrix, ledger)
+    pairs_by_request = make_job_requests(sorting_matrix)
+    requests = [r for r, pairs in pairs_by_request.items() for _ in pairs]
+    schedule: Schedule = schedule_jobs(requests, pools, cost_model)
+    eta = datetime.fromtimestamp(datetime.now().timestamp() + schedule.makespan_sec)
+    print(f"Scheduled {len(schedule.jobs)} sorting jobs; estimated makespan {schedule.makespan_sec / 3600:.2f} h, " +
+        f"ETA {eta.strftime('%Y-%m-%d %H:%M')} " +
+        f"(busy hours per pool: {', '.join(f'{k}={v / 3600:.2f}' for k, v in schedule.pool_busy_sec.items())})")
+    with ThreadPoolExecutor(max_workers=download_workers) as executor:
+        pending = list(schedule.jobs)
+        is_needed = None
+        if ledger is not None:
+            def is_needed(uri: str) -> bool:
+                # whether any job on this recording that has not been queued yet can still be claimed
+                return any(
+                    ledger.is_claimable(sorter.sorter_name, sorter.sorting_parameters, recording.recording_uri)
+                    for r, pairs in list(pairs_by_request.items()) if r.recording_uri == uri
+                    for (sorter, recording) in list(pairs)
+                )
+        futures = prefetch_recordings([j.request.recording_uri for j in schedule.jobs], executor, is_needed)
+        try:
+            while len(pending) > 0:
+                index = next((i for i, j in enumerate(pending) if futures[j.request.recording_uri].done()), None)
+                if index is None:
+                    wait({futures[j.request.recording_uri] for j in pending}, return_when=FIRST_COMPLETED)
+                    continue
+                scheduled = pending.pop(index)
+                (sorter, recording) = pairs_by_request[scheduled.request].pop(0)
+                if ledger is not None and not ledger.claim(sorter.sorter_name, sorter.sorting_parameters, recording.recording_uri,
+                                                           study_name=recording.study_name, recording_name=recording.recording_name):
+                    print_per_verbose(2, f"Skipping {sorter.sorter_name} on {recording.study_name}/{recording.recording_name} (completed or running elsewhere)")
+                    continue
+                recording_object = futures[recording.recording_uri].result()
+                if recording_object is None:
+                    # skipped as unclaimable, but claimed since (e.g. released by another runner)
+                    recording_object = download_recording(recording.recording_uri)
+                print_per_verbose(3, f"Queueing sort for sorter {sorter.sorter_name} on {recording.study_name}/{recording.recording_name} " +
+                    f"(pool {scheduled.pool}, estimated {scheduled.estimated_cost_sec:.0f} s)")
+                job_config: Dict[str, Any] = {}
+                if job_handlers is not None and scheduled.pool in job_handlers:
+                    job_config['job_handler'] = job_handlers[scheduled.pool]
+                if auto_timeout:
+                    job_config['job_timeout_sec'] = job_timeout_sec(cost_model, scheduled.request, max_timeout_sec)
+                    print_per_verbose(3, f"Timeout for {sorter.sorter_name} on {recording.study_name}/{recording.recording_name}: {job_config['job_timeout_sec']} s")
+                with hi.Config(**job_config):
+                    sorting_job = queue_sort(sorter, recording, recording_object)
+                yield SortingJob(
+                    recording_name   = recording.recording_name,
+                    recording_uri    = recording.recording_uri,
+                    ground_truth_uri = recording.ground_truth_uri,
+                    study_name       = recording.study_name,
+                    sorter_name      = sorter.sorter_name,
+                    params           = sorter.sorting_parameters,
+                    sorting_job      = sorting_job
+                )
+        finally:
+            # on error (or if the consumer stops early), don't start the downloads still waiting
+            for future in futures.values():
+                future.cancel()
 
 def make_output_record(job: SortingJob) -> OutputRecord:
     errored = job.sorting_job.status == "error"
@@ -303,28 +569,92 @@ def make_output_record(job: SortingJob) -> OutputRecord:
 def make_json_output_record(record: OutputRecord) -> str:
     return json.dumps(record, indent=4)
 
-def output_records(results: List[str], std_args: StandardArgs) -> None:
-    if std_args['outfile'] is not None and std_args['outfile'] != '':
-        with open(std_args['outfile'], "a") as file:
-            json.dump(results, file, indent=2)
-    else:
-        print(json.dumps(results, indent=4))
+def job_is_complete(job: SortingJob) -> bool:
+    return job.sorting_job.status in ['finished', 'error']
+
+def pop_completed_jobs(pending: List[SortingJob]) -> Tuple[List[SortingJob], List[SortingJob]]:
+    hi.wait(0) # lets hither advance the queued jobs without blocking
+    completed: List[SortingJob] = []
+    still_pending: List[SortingJob] = []
+    for job in pending:
+        (completed if job_is_complete(job) else still_pending).append(job)
+    return (completed, still_pending)
+
+def iter_completed_jobs(jobs: Iterable[SortingJob], poll_interval_sec: float = JOB_POLL_INTERVAL_SEC) -> Generator[SortingJob, None, None]:
+    # Yields jobs in the order they complete. Jobs are taken from `jobs` as they are queued, so
+    # results are reported while later jobs are still being queued; a job is not referenced
+    # here once it has been yielded.
+    pending: List[SortingJob] = []
+    for job in jobs:
+        pending.append(job)
+        (completed, pending) = pop_completed_jobs(pending)
+        yield from completed
+    while len(pending) > 0:
+        (completed, pending) = pop_completed_jobs(pending)
+        yield from completed
+        if len(completed) == 0:
+            time.sleep(poll_interval_sec)
+
+class JsonlRecordWriter:
+    # Appends one JSON object per line to outfile (or stdout if no outfile is set). Each line is
+    # flushed and fsynced as it is written, so a run that dies keeps the records of finished jobs.
+    def __init__(self, outfile: Union[str, None]) -> None:
+        self._file = open(outfile, "a") if outfile is not None and outfile != '' else None
+
+    def write(self, record: OutputRecord) -> None:
+        line = json.dumps(record)
+        if self._file is None:
+            print(line, flush=True)
+            return
+        self._file.write(line + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'JsonlRecordWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
 
 def main():
     (args, std_args) = init_configuration()
     study_sets = load_study_records(args['study_source_file'])
     study_matrix = parse_sorters(args['sorter_spec_file'], list(study_sets.keys()))
     sorting_matrix = populate_sorting_matrix(study_matrix, study_sets)
+    ledger = JobLedger(args['ledger'], max_attempts=args['max_attempts']) if args['ledger'] is not None else None
+    if ledger is not None:
+        sorting_matrix = remove_completed_pairs(sorting_matrix, ledger)
 
+    pools = make_worker_pools(args, std_args)
+    check_worker_pools(sorting_matrix, pools, std_args)
+    cost_model = load_cost_model(args['runtime_history'])
     hither_config = extract_hither_config(std_args)
+    job_handlers = make_pool_job_handlers(pools, hither_config, std_args)
+    num_written = 0
     try:
-        with hi.Config(**hither_config):
-            sortings = list(sorting_loop(sorting_matrix))
-        hi.wait(None)
+        with hi.Config(**hither_config), JsonlRecordWriter(std_args['outfile']) as writer:
+            sortings = sorting_loop(sorting_matrix, download_workers=args['download_workers'],
+                                    pools=pools, cost_model=cost_model, job_handlers=job_handlers,
+                                    auto_timeout=args['auto_timeout'], max_timeout_sec=hither_config['job_timeout_sec'],
+                                    ledger=ledger)
+            for job in iter_completed_jobs(sortings):
+                record = make_output_record(job)
+                writer.write(record)
+                if ledger is not None:
+                    ledger.complete(job.sorter_name, job.params, job.recording_uri, record, errored=record['errored'])
+                num_written += 1
+                print_per_verbose(2, f"Completed {num_written} sortings (latest: {job.sorter_name} on {job.study_name}/{job.recording_name})")
     finally:
+        if ledger is not None:
+            # jobs claimed but not completed become claimable again
+            ledger.close()
+        cleanup_pool_job_handlers(job_handlers, hither_config)
         call_cleanup(hither_config)
-    results: List[OutputRecord] = [make_output_record(job) for job in sortings]
-    output_records(results, std_args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+import math
+from statistics import NormalDist
+from typing import Dict, Iterable, List, NamedTuple, Union
+
+import numpy as np
+
+# Per-sorter log-linear model of sorting run time:
+#     log(cpu_time_sec) = b0 + b1 log(num_channels) + b2 log(duration_sec) + b3 log(sampling_frequency) + noise
+# fit by (lightly regularized) least squares on past sorting outputs. Sorters with few past runs
+# fall back to fewer terms (log(num_channels x duration_sec) only, then the mean alone).
+
+_FULL_MIN_SAMPLES = 8
+_SIZE_MIN_SAMPLES = 3
+_RIDGE = 1e-3
+# log-space standard deviation used when there are too few samples to estimate it
+_DEFAULT_LOG_STD = 1.0
+
+class RuntimeSample(NamedTuple):
+    sorter_name: str
+    num_channels: float
+    duration_sec: float
+    sampling_frequency: Union[float, None]
+    cpu_time_sec: float
+
+class RuntimePrediction(NamedTuple):
+    median_sec: float
+    mean_sec: float
+    log_std: float # standard deviation of log(run time), including the uncertainty of the fit
+    num_samples: int # number of past runs the prediction is based on (0: no history for this sorter)
+
+    def quantile(self, q: float) -> float:
+        """The run time that is exceeded with probability 1 - q"""
+        return self.median_sec * math.exp(NormalDist().inv_cdf(q) * self.log_std)
+
+
+class _Fit:
+    def __init__(self, X: np.ndarray, y: np.ndarray, columns: List[int]):
+        # X: n x 3 log features (channels, duration, sample rate); columns selects the terms used
+        self.columns = columns
+        self.feature_means = X.mean(axis=0)
+        A = self._design(X)
+        n, p = A.shape
+        penalty = _RIDGE * np.eye(p)
+        penalty[0, 0] = 0
+        self.inv_gram = np.linalg.pinv(A.T @ A + penalty)
+        self.coef = self.inv_gram @ (A.T @ y)
+        residuals = y - A @ self.coef
+        self.log_std = float(np.sqrt(residuals @ residuals / (n - p))) if n > p else _DEFAULT_LOG_STD
+        self.num_samples = n
+
+    def _design(self, X: np.ndarray) -> np.ndarray:
+        cols = [np.ones(X.shape[0])]
+        if self.columns == [-1]:
+            cols.append(X[:, 0] + X[:, 1])
+        else:
+            cols.extend(X[:, c] for c in self.columns)
+        return np.stack(cols, axis=1)
+
+    def predict(self, x: np.ndarray) -> RuntimePrediction:
+        x = np.where(np.isfinite(x), x, self.feature_means)
+        a = self._design(x[np.newaxis, :])[0]
+        mu = float(a @ self.coef)
+        sigma = self.log_std * math.sqrt(1 + max(float(a @ self.inv_gram @ a), 0.0))
+        return RuntimePrediction(
+            median_sec=math.exp(mu),
+            mean_sec=math.exp(mu + sigma ** 2 / 2),
+            log_std=sigma,
+            num_samples=self.num_samples
+        )
+
+
+class RuntimeModel:
+    """Predicts sorting run times with one log-linear fit per sorter, from past runs
+
+    Sorters without history are predicted by a model pooled over all
+    sorters, with a wider uncertainty.
+    """
+    def __init__(self, samples: Iterable[RuntimeSample]) -> None:
+        by_sorter: Dict[str, List[RuntimeSample]] = {}
+        for s in samples:
+            if s.cpu_time_sec > 0 and s.num_channels > 0 and s.duration_sec > 0:
+                by_sorter.setdefault(s.sorter_name, []).append(s)
+        self._fits: Dict[str, _Fit] = {name: _fit(ss) for name, ss in by_sorter.items()}
+        all_samples = [s for ss in by_sorter.values() for s in ss]
+        self._pooled = _fit(all_samples) if len(all_samples) > 0 else None
+
+    @staticmethod
+    def from_catalogs(sorting_output_catalog, recording_catalog) -> 'RuntimeModel':
+        """A model fit to the successful runs of an SFSortingOutputCatalog (recording sizes from an SFRecordingCatalog)"""
+        samples: List[RuntimeSample] = []
+        for X in sorting_output_catalog.select(successful_runs(sorting_output_catalog)):
+            R = recording_catalog.find_recording(study_name=X.study_name, recording_name=X.recording_name)
+            if R is None:
+                continue
+            samples.append(RuntimeSample(
+                sorter_name=X.sorter_name,
+                num_channels=R.num_channels,
+                duration_sec=R.duration_sec,
+                sampling_frequency=R.sampling_frequency,
+                cpu_time_sec=X.cpu_time_sec
+            ))
+        return RuntimeModel(samples)
+
+    @property
+    def sorter_names(self) -> List[str]:
+        return list(self._fits.keys())
+
+    def predict(self, sorter_name: str, *, num_channels: float, duration_sec: float, sampling_frequency: Union[float, None] = None) -> Union[RuntimePrediction, None]:
+        """The predicted run time, or None if there is no history at all"""
+        x = _log_features(num_channels, duration_sec, sampling_frequency)
+        fit = self._fits.get(sorter_name, None)
+        if fit is not None:
+            return fit.predict(x)
+        if self._pooled is None:
+            return None
+        P = self._pooled.predict(x)
+        log_std = math.sqrt(P.log_std ** 2 + _DEFAULT_LOG_STD ** 2)
+        return RuntimePrediction(
+            median_sec=P.median_sec,
+            mean_sec=P.median_sec * math.exp(log_std ** 2 / 2),
+            log_std=log_std,
+            num_samples=0
+        )
+
+
+def successful_runs(sorting_output_catalog) -> np.ndarray:
+    """Mask of the runs of an SFSortingOutputCatalog that finished (not errored or timed out) with a cpuTimeSec"""
+    C = sorting_output_catalog.columns()
+    return np.isfinite(C['cpuTimeSec']) & ~C['timedOut'] & ((C['returnCode'] == 0) | np.isnan(C['returnCode']))
+
+
+def _fit(samples: List[RuntimeSample]) -> _Fit:
+    X = np.array([_log_features(s.num_channels, s.duration_sec, s.sampling_frequency) for s in samples])
+    # a missing sample rate is replaced by the mean of the others (a constant column if all are missing)
+    X[:, 2] = np.where(np.isfinite(X[:, 2]), X[:, 2], np.nanmean(X[:, 2]) if np.isfinite(X[:, 2]).any() else 0.0)
+    y = np.log([s.cpu_time_sec for s in samples])
+    if len(samples) >= _FULL_MIN_SAMPLES:
+        columns = [0, 1, 2]
+    elif len(samples) >= _SIZE_MIN_SAMPLES:
+        columns = [-1]
+    else:
+        columns = []
+    return _Fit(X, y, columns)
+
+
+def _log_features(num_channels: float, duration_sec: float, sampling_frequency: Union[float, None]) -> np.ndarray:
+    return np.array([
+        math.log(num_channels),
+        math.log(duration_sec),
+        math.log(sampling_frequency) if sampling_frequency else np.nan
+    ])
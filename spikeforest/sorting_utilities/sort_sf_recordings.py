@@ -5,13 +5,15 @@ import hither2 as hi
 import sortingview as sv
 
 from spikeforest._common.calling_framework import GROUND_TRUTH_URI_KEY, StandardArgs, add_standard_args, call_cleanup, parse_shared_configuration
-from spikeforest.sorting_utilities.run_sortings import SortingMatrixEntry, init_sorting_args, parse_argsdict, load_study_records, parse_sorters, extract_hither_config, populate_sorting_matrix, sorting_loop, SortingJob, SortingMatrixDict
+from spikeforest.sorting_utilities.run_sortings import ArgsDict, SortingMatrixEntry, init_sorting_args, parse_argsdict, load_study_records, parse_sorters, extract_hither_config, populate_sorting_matrix, sorting_loop, SortingJob, SortingMatrixDict, make_worker_pools, check_worker_pools, make_pool_job_handlers, cleanup_pool_job_handlers, load_cost_model
 from spikeforest.sorting_utilities.prepare_workspace import FullRecordingEntry, add_entry_to_workspace, add_workspace_selection_args, establish_workspace, get_known_recording_id, get_labels, TRUE_SORT_LABEL, sortings_are_in_workspace
 
 class Params(NamedTuple):
     study_source_file: str
     sorter_spec_file:  str
     workspace_uri:     str
+    download_workers:  int
+    sortings_args:     ArgsDict
 
 class HydratedObjects(NamedTuple):
     workspace: sv.Workspace
@@ -33,7 +35,9 @@ def init_configuration() -> Tuple[Params, StandardArgs]:
     params = Params(
         study_source_file = sortings_args["study_source_file"],
         sorter_spec_file  = sortings_args["sorter_spec_file"],
-        workspace_uri     = workspace_uri
+        workspace_uri     = workspace_uri,
+        download_workers  = sortings_args["download_workers"],
+        sortings_args     = sortings_args
     )
     print(f"Using workspace uri {params.workspace_uri}")
     return (params, std_args)
@@ -108,12 +112,19 @@ def main():
     study_matrix = parse_sorters(params.sorter_spec_file, list(study_sets.keys()))
     sorting_matrix = populate_sorting_matrix(study_matrix, study_sets)
     sorting_matrix = remove_preexisting_records(sorting_matrix, params.workspace_uri)
+    pools = make_worker_pools(params.sortings_args, std_args)
+    check_worker_pools(sorting_matrix, pools, std_args)
+    cost_model = load_cost_model(params.sortings_args['runtime_history'])
     hither_config = extract_hither_config(std_args)
+    job_handlers = make_pool_job_handlers(pools, hither_config, std_args)
     jobs: hi.Job = []
 
     try:
         with hi.Config(**hither_config):
-            sortings = list(sorting_loop(sorting_matrix))
+            sortings = list(sorting_loop(sorting_matrix, download_workers=params.download_workers,
+                                         pools=pools, cost_model=cost_model, job_handlers=job_handlers,
+                                         auto_timeout=params.sortings_args['auto_timeout'],
+                                         max_timeout_sec=hither_config['job_timeout_sec']))
             with hi.Config(job_handler=None, job_cache=None):
                 for sorting in sortings:
                     p = {
@@ -123,6 +134,7 @@ def main():
                     jobs.append(hi.Job(hi_post_result_to_workspace, p))
         hi.wait(None)
     finally:
+        cleanup_pool_job_handlers(job_handlers, hither_config)
         call_cleanup(hither_config)
 
 
@@ -0,0 +1,39 @@
+from typing import Any, Dict
+
+# spiketoolkit and spikecomparison are imported within the functions, since they
+# are usually only installed in the metrics container (or the pipeline environment).
+expected_spiketoolkit_version = '0.7.4'
+expected_spikecomparison_version = '0.3.2'
+
+QUALITY_METRICS = [
+    "num_spikes",
+    "firing_rate",
+    "presence_ratio",
+    "isi_violation",
+    "amplitude_cutoff",
+    "snr",
+    "max_drift",
+    "cumulative_drift",
+    "silhouette_score",
+    "isolation_distance",
+    "l_ratio",
+    "nn_hit_rate",
+    "nn_miss_rate",
+    "d_prime"
+]
+
+def compute_quality_metrics(recording: Any, sorting: Any) -> Dict[str, Any]:
+    import spiketoolkit as st
+    assert st.__version__ == expected_spiketoolkit_version, f'Unexpected spiketoolkit version: {st.__version__} <> {expected_spiketoolkit_version}'
+    return st.validation.compute_quality_metrics(
+        sorting, recording,
+        metric_names=QUALITY_METRICS, as_dataframe=True).to_dict()
+
+def compare_with_ground_truth(sorting: Any, gt_sorting: Any) -> Dict[str, Any]:
+    import spikecomparison as sc
+    assert sc.__version__ == expected_spikecomparison_version, f'Unexpected spikecomparison version: {sc.__version__} <> {expected_spikecomparison_version}'
+    ground_truth_comparison = sc.GroundTruthComparison(gt_sorting, sorting)
+
+    return {"best_match_21": ground_truth_comparison.best_match_21.to_list(),
+            "best_match_12": ground_truth_comparison.best_match_12.to_list(),
+            "agreement_scores": ground_truth_comparison.agreement_scores.to_dict()}
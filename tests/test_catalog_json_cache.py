@@ -0,0 +1,28 @@
+import json
+import os
+
+import kachery_cloud as kcl
+import pytest
+
+from spikeforest._common.catalog_json_cache import clear_catalog_json_cache, load_catalog_json
+
+
+@pytest.fixture
+def kachery_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('KACHERY_CLOUD_DIR', str(tmp_path / 'kachery'))
+    clear_catalog_json_cache()
+    yield tmp_path / 'kachery'
+    clear_catalog_json_cache()
+
+
+def test_catalog_is_parsed_once_and_nothing_is_written(tmp_path, kachery_dir):
+    catalog = {'recordings': [{'studySetName': 'set1', 'studyName': 'study1', 'recordingName': f'rec{i}'} for i in range(10)]}
+    with open(tmp_path / 'catalog.json', 'w') as f:
+        json.dump(catalog, f)
+    uri = kcl.store_file_local(str(tmp_path / 'catalog.json'))
+    files_before = sorted(os.path.join(d, f) for d, _, fs in os.walk(kachery_dir) for f in fs)
+    x = load_catalog_json(uri)
+    assert x == catalog
+    assert load_catalog_json(uri) is x
+    # in particular no (pickled) parse cache that other users of the kachery directory could replace
+    assert sorted(os.path.join(d, f) for d, _, fs in os.walk(kachery_dir) for f in fs) == files_before
@@ -0,0 +1,20 @@
+import os
+import threading
+
+import numpy as np
+from spikeinterface.core import NumpyRecording
+
+from spikeforest.load_extractors.CompressedRecordingExtractor.CompressedRecordingExtractor import CompressedRecordingExtractor, write_compressed_recording
+
+
+def test_readers_share_decode_threads(tmp_path):
+    X = (np.random.randn(5000, 4) * 100).astype('int16')
+    recording = NumpyRecording([X], sampling_frequency=1000)
+    recording.set_dummy_probe_from_locations(np.c_[np.arange(4), np.zeros(4)])
+    path = str(tmp_path / 'rec.sfcr')
+    write_compressed_recording(recording, path, block_frames=500)
+    extractors = [CompressedRecordingExtractor(path, num_threads=4) for _ in range(40)]
+    for extractor in extractors:
+        assert np.array_equal(extractor.get_traces(start_frame=100, end_frame=4900), X[100:4900])
+    decode_threads = [t for t in threading.enumerate() if t.name.startswith('compressed-recording_')]
+    assert 0 < len(decode_threads) <= max(os.cpu_count() or 1, 4)
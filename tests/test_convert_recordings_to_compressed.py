@@ -0,0 +1,77 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from spikeinterface.core import NumpyRecording
+
+from spikeforest.convert_recordings import convert_recordings_to_compressed
+from spikeforest.load_extractors import load_recording_extractor
+from spikeforest.load_extractors.CompressedRecordingExtractor.CompressedRecordingExtractor import CompressedRecordingExtractor, write_compressed_recording
+from spikeforest.load_extractors.MdaRecordingExtractorV2.MdaRecordingExtractorV2 import writemda16i
+
+
+def test_convert_and_load(tmp_path):
+    X = (np.random.randn(5000, 4) * 100).astype('int16')
+    writemda16i(X.T, str(tmp_path / 'raw.mda'))
+    R = SimpleNamespace(
+        recording_object={'recording_format': 'mda', 'data': {'raw': str(tmp_path / 'raw.mda'), 'geom': np.random.randn(4, 2).tolist(), 'params': {'samplerate': 1000}}},
+        study_set_name='set1', study_name='study1', recording_name='rec1', sampling_frequency=1000
+    )
+    recording_objects = convert_recordings_to_compressed([R], str(tmp_path / 'out'), block_duration_sec=0.3, num_workers=1, num_threads=3)
+    assert recording_objects[0]['recording_format'] == 'compressed'
+    assert os.path.exists(recording_objects[0]['data']['raw'])
+    recording = load_recording_extractor(recording_objects[0])
+    assert recording.get_sampling_frequency() == 1000
+    assert np.array_equal(recording.get_traces(), X)
+    assert np.array_equal(recording.get_traces(start_frame=299, end_frame=1801), X[299:1801])
+
+
+class _FailingRecording(NumpyRecording):
+    # raises on reading a given frame, and records the first frame of every read
+    def __init__(self, X, fail_at_frame=None):
+        NumpyRecording.__init__(self, [X], sampling_frequency=1000)
+        self.set_dummy_probe_from_locations(np.c_[np.arange(X.shape[1]), np.zeros(X.shape[1])])
+        self.fail_at_frame = fail_at_frame
+        self.start_frames = []
+
+    def get_traces(self, segment_index=None, start_frame=None, end_frame=None, **kwargs):
+        self.start_frames.append(start_frame)
+        if self.fail_at_frame is not None and start_frame <= self.fail_at_frame < end_frame:
+            raise Exception('read error')
+        return NumpyRecording.get_traces(self, segment_index=segment_index, start_frame=start_frame, end_frame=end_frame, **kwargs)
+
+
+@pytest.mark.parametrize('num_threads', [1, 3])
+def test_resume_after_interrupted_conversion(tmp_path, num_threads):
+    X = (np.random.randn(5000, 4) * 100).astype('int16')
+    path = str(tmp_path / 'rec.sfcr')
+    recording = _FailingRecording(X, fail_at_frame=3500)
+    with pytest.raises(Exception, match='read error'):
+        write_compressed_recording(recording, path, block_frames=1000, num_threads=num_threads, resume=True)
+    assert not os.path.exists(path)
+    assert os.path.exists(path + '.partial')
+    recording = _FailingRecording(X)
+    write_compressed_recording(recording, path, block_frames=1000, num_threads=num_threads, resume=True)
+    # the blocks recorded before the interruption are not converted again
+    assert min(recording.start_frames) >= 1000
+    assert sorted(os.listdir(tmp_path)) == ['rec.sfcr']
+    assert np.array_equal(CompressedRecordingExtractor(path).get_traces(), X)
+
+
+def test_failed_conversion_leaves_no_files(tmp_path):
+    X = (np.random.randn(5000, 4) * 100).astype('int16')
+    with pytest.raises(Exception, match='read error'):
+        write_compressed_recording(_FailingRecording(X, fail_at_frame=10), str(tmp_path / 'a.sfcr'), block_frames=1000, resume=True)
+    with pytest.raises(Exception, match='read error'):
+        write_compressed_recording(_FailingRecording(X, fail_at_frame=2500), str(tmp_path / 'b.sfcr'), block_frames=1000)
+    assert os.listdir(tmp_path) == []
+
+
+def test_uncompressed(tmp_path):
+    X = np.random.randn(2500, 3).astype('float32')
+    path = str(tmp_path / 'rec.sfcr')
+    write_compressed_recording(_FailingRecording(X), path, block_frames=1000, compress=False)
+    assert os.path.getsize(path) > X.nbytes
+    recording = CompressedRecordingExtractor(path)
+    assert np.array_equal(recording.get_traces(start_frame=900, end_frame=2100), X[900:2100])
@@ -0,0 +1,36 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from spikeforest._common.frozen import FrozenDict, freeze, thaw
+
+_RECORD = {'recordingObject': {'data': {'raw': 'sha1://abc', 'geom': [[0, 1], [0, 2]]}}, 'numChannels': 2}
+
+
+def test_frozen_record_is_read_only():
+    x = freeze(_RECORD)
+    with pytest.raises(TypeError):
+        x['numChannels'] = 3
+    with pytest.raises(TypeError):
+        x['recordingObject']['data']['geom'].append([0, 3])
+    assert json.loads(json.dumps(x)) == _RECORD
+    assert isinstance(pickle.loads(pickle.dumps(x)), FrozenDict)
+
+
+@pytest.mark.parametrize('make_copy', [copy.deepcopy, thaw])
+def test_deep_copy_is_mutable(make_copy):
+    x = freeze(_RECORD)
+    y = make_copy(x['recordingObject'])
+    y['self_reference'] = 'sha1://def'
+    y['data']['geom'].append([0, 3])
+    assert y != x['recordingObject']
+    assert x == _RECORD
+
+
+def test_shallow_copy_is_mutable():
+    x = freeze(_RECORD)
+    y = copy.copy(x)
+    y['numChannels'] = 3
+    assert x['numChannels'] == 2
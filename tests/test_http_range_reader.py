@@ -0,0 +1,81 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from spikeforest.load_extractors.MdaRecordingExtractorV2._http_range_reader import HttpRangeReader, block_cache
+
+_DATA = os.urandom(10000)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # /range/... honours Range headers (206, or 416 past the end); /norange/... always sends the whole file (200)
+    def do_GET(self):
+        self.server.num_requests += 1
+        m = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if self.path.startswith('/range/') and m is not None:
+            start, end = int(m.group(1)), int(m.group(2))
+            if start >= len(_DATA):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(_DATA)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = _DATA[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{start + len(body) - 1}/{len(_DATA)}')
+        else:
+            body = _DATA
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.num_requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    block_cache.clear()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, kind: str, name: str) -> str:
+    return f'http://127.0.0.1:{server.server_address[1]}/{kind}/{name}'
+
+
+def test_range_requests(server):
+    reader = HttpRangeReader(_url(server, 'range', 'a.mda'), block_size=1024, readahead_blocks=0)
+    assert reader.read(0, 100) == _DATA[:100]
+    assert reader.read(1000, 3000) == _DATA[1000:4000]
+    assert reader.size() == len(_DATA)
+    # only the blocks covering the reads were fetched
+    assert reader.stats()['bytes_fetched'] == 4 * 1024
+
+
+def test_read_past_end(server):
+    reader = HttpRangeReader(_url(server, 'range', 'b.mda'), block_size=1024, readahead_blocks=0)
+    # the size is not yet known, so the block past the end is requested and gets a 416
+    assert reader.read(len(_DATA) + 5000, 100) == b''
+    assert reader.read(len(_DATA) - 10, 100) == _DATA[-10:]
+
+
+def test_server_without_range_support(server):
+    reader = HttpRangeReader(_url(server, 'norange', 'c.mda'), block_size=1024, readahead_blocks=0)
+    # several blocks requested at once all get a 200; only one of them reads the body
+    assert reader.read(0, 5000) == _DATA[:5000]
+    assert reader.read(5000, 4000) == _DATA[5000:9000]
+    assert reader.read(9900, 1000) == _DATA[9900:]
+    assert reader.size() == len(_DATA)
+    # the whole file was downloaded once, not once per block
+    assert server.num_requests <= 5
+    assert reader.stats()['bytes_fetched'] == len(_DATA)
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from spikeforest.sorting_utilities.job_ledger import JobLedger, job_key
+
+_JOB = ('MountainSort4', {'detect_threshold': 3}, 'sha1://abc')
+
+
+@pytest.fixture
+def ledgers(tmp_path):
+    # two runners sharing one ledger
+    opened = []
+
+    def open_ledger(**kwargs):
+        ledger = JobLedger(str(tmp_path / 'ledger.db'), **kwargs)
+        opened.append(ledger)
+        return ledger
+    yield open_ledger
+    for ledger in opened:
+        try:
+            ledger.close()
+        except Exception:
+            pass
+
+
+def test_a_job_is_claimed_by_one_runner(ledgers):
+    a, b = ledgers(), ledgers()
+    assert a.is_claimable(*_JOB)
+    assert a.claim(*_JOB)
+    assert not b.is_claimable(*_JOB)
+    assert not b.claim(*_JOB)
+    # a different parameter set is a different job
+    assert b.claim('MountainSort4', {'detect_threshold': 4}, 'sha1://abc')
+
+
+def test_finished_job_is_done(ledgers):
+    a, b = ledgers(), ledgers()
+    assert a.claim(*_JOB)
+    a.complete(*_JOB, {'cpuTimeSec': 12.5, 'errored': False}, errored=False)
+    assert b.is_done(*_JOB)
+    assert not b.claim(*_JOB)
+    assert b.output_records() == [{'cpuTimeSec': 12.5, 'errored': False}]
+
+
+def test_errored_job_is_retried_up_to_max_attempts(ledgers):
+    a, b = ledgers(max_attempts=2), ledgers(max_attempts=2)
+    assert a.claim(*_JOB)
+    a.complete(*_JOB, {'errored': True}, errored=True)
+    assert not b.is_done(*_JOB)
+    assert b.claim(*_JOB)
+    b.complete(*_JOB, {'errored': True}, errored=True)
+    assert a.is_done(*_JOB)
+    assert not a.claim(*_JOB)
+    assert a.summary() == {'error': 1}
+
+
+def test_released_job_is_claimable(ledgers):
+    a, b = ledgers(), ledgers()
+    assert a.claim(*_JOB)
+    a.close()
+    assert b.claim(*_JOB)
+
+
+def test_expired_lease_is_claimable(ledgers):
+    a, b = ledgers(lease_sec=0.3), ledgers(lease_sec=0.3)
+    assert a.claim(*_JOB)
+    # the lease is renewed while a is alive
+    time.sleep(0.5)
+    assert not b.claim(*_JOB)
+    # a hangs (or its host goes away), so its lease runs out
+    a._stop_heartbeat.set()
+    time.sleep(0.5)
+    assert b.claim(*_JOB)
+    # a can no longer complete the job it lost
+    a.complete(*_JOB, {'errored': False}, errored=False)
+    assert not b.is_done(*_JOB)
+
+
+def test_job_of_dead_process_on_this_host_is_claimable(ledgers):
+    a, b = ledgers(), ledgers()
+    assert a.claim(*_JOB)
+    with a._lock:
+        # as if a had been killed: its pid no longer exists
+        a._con.execute('UPDATE jobs SET pid = ? WHERE key = ?', (2 ** 22 + 12345, job_key(*_JOB)))
+    assert b.claim(*_JOB)
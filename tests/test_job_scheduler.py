@@ -0,0 +1,34 @@
+from spikeforest.load_spikeforest_sorting_outputs.SFSortingOutputCatalog import SFSortingOutputCatalog
+from spikeforest.sorting_utilities.job_scheduler import JobCostModel, JobRequest, WorkerPool, schedule_jobs
+
+
+def _run(recording_name, cpu_time_sec, *, return_code=0, timed_out=False):
+    return {'studyName': 'study1', 'recordingName': recording_name, 'sorterName': 'MountainSort4',
+            'cpuTimeSec': cpu_time_sec, 'returnCode': return_code, 'timedOut': timed_out}
+
+
+def _request(recording_name):
+    return JobRequest(sorter_name='MountainSort4', study_name='study1', recording_name=recording_name,
+                      recording_uri=f'sha1://{recording_name}', num_channels=None, duration_sec=None)
+
+
+def test_cost_model_uses_only_successful_runs():
+    catalog = SFSortingOutputCatalog([
+        _run('rec1', 1000),
+        _run('rec2', 5, return_code=1),
+        _run('rec3', 7200, timed_out=True)
+    ])
+    model = JobCostModel.from_catalogs(catalog)
+    assert model.estimate(_request('rec1')) == 1000
+    # errored and timed-out runs are not taken as the run time of the job
+    default = JobCostModel().estimate(_request('rec2'))
+    assert model.estimate(_request('rec2')) == default
+    assert model.estimate(_request('rec3')) == default
+
+
+def test_schedule_longest_first_across_pools():
+    model = JobCostModel([('MountainSort4', 'study1', f'rec{i}', float(c), None) for i, c in enumerate([10, 40, 20, 30])])
+    pools = [WorkerPool(name='cpu', num_workers=2, threads_per_worker=None, memory_gb_per_worker=None, gpu=False)]
+    schedule = schedule_jobs([_request(f'rec{i}') for i in range(4)], pools, model)
+    assert [j.estimated_cost_sec for j in schedule.jobs] == [40, 30, 20, 10]
+    assert schedule.makespan_sec == 50
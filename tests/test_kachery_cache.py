@@ -0,0 +1,61 @@
+import gc
+import importlib
+import os
+
+import kachery_cloud as kcl
+import numpy as np
+import pytest
+
+from spikeforest.kachery_cache import KacheryCache
+from spikeforest.load_extractors import load_recording_extractor
+from spikeforest.load_extractors.MdaRecordingExtractorV2.MdaRecordingExtractorV2 import writemda16i
+
+kachery_cache_module = importlib.import_module('spikeforest.kachery_cache.kachery_cache')
+
+_GEOM = [[0, i] for i in range(4)]
+
+
+@pytest.fixture
+def kachery_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('KACHERY_CLOUD_DIR', str(tmp_path / 'kachery'))
+    monkeypatch.setattr(kachery_cache_module, '_global_cache', None)
+    return tmp_path / 'kachery'
+
+
+def _write_mda(path: str) -> str:
+    writemda16i((np.random.randn(4, 1000) * 100).astype('int16'), path)
+    return path
+
+
+class _Owner:
+    pass
+
+
+def test_local_recording_does_not_touch_the_cache(tmp_path, kachery_dir):
+    recording = load_recording_extractor({'recording_format': 'mda', 'data': {'raw': _write_mda(str(tmp_path / 'raw.mda')), 'geom': _GEOM, 'params': {'samplerate': 1000}}})
+    assert recording.get_num_frames() == 1000
+    assert not os.path.exists(kachery_dir / 'spikeforest-cache-index.db')
+
+
+def test_pinned_load_survives_eviction(tmp_path, kachery_dir):
+    uri = kcl.store_file_local(_write_mda(str(tmp_path / 'a.mda')))
+    cache = KacheryCache(max_bytes=None)
+    owner = _Owner()
+    path = cache.load_pinned_file(uri, owner)
+    # another process enforcing a zero budget on the same index
+    other = KacheryCache(max_bytes=0)
+    other.enforce_budget()
+    assert os.path.exists(path)
+    del owner
+    gc.collect()
+    other.enforce_budget()
+    assert not os.path.exists(path)
+
+
+def test_sha1_recording_is_pinned_while_alive(tmp_path, kachery_dir):
+    uri = kcl.store_file_local(_write_mda(str(tmp_path / 'b.mda')))
+    recording = load_recording_extractor({'recording_format': 'mda', 'data': {'raw': uri, 'geom': _GEOM, 'params': {'samplerate': 1000}}})
+    assert KacheryCache().report()['num_pinned'] == 1
+    del recording
+    gc.collect()
+    assert KacheryCache().report()['num_pinned'] == 0
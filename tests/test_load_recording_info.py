@@ -0,0 +1,136 @@
+import importlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import kachery_cloud as kcl
+import numpy as np
+import pytest
+from spikeinterface.core import NumpyRecording
+
+from spikeforest.load_extractors import load_recording_info
+from spikeforest.load_extractors.CompressedRecordingExtractor.CompressedRecordingExtractor import write_compressed_recording
+from spikeforest.load_extractors.MdaRecordingExtractorV2._header_cache import header_cache
+from spikeforest.load_extractors.MdaRecordingExtractorV2.MdaRecordingExtractorV2 import writemda16i
+
+# the module, which spikeforest.load_extractors shadows with the function of the same name
+lri = importlib.import_module('spikeforest.load_extractors.load_recording_info')
+
+_X = (np.random.randn(200000, 4) * 100).astype('int16')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # serves files from the server's directory, honouring Range headers, and counts the bytes sent
+    def do_GET(self):
+        with open(os.path.join(self.server.directory, self.path.lstrip('/')), 'rb') as f:
+            content = f.read()
+        m = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if m is not None:
+            start, end = int(m.group(1)), int(m.group(2))
+            body = content[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{start + len(body) - 1}/{len(content)}')
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def remote_store(tmp_path, monkeypatch):
+    # sha1:// uris that are not in the local kachery store and resolve to files served over http
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.directory = str(tmp_path)
+    httpd.bytes_sent = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def load_file(uri, *, local_only=False, **kwargs):
+        assert local_only, f'Whole file downloaded: {uri}'
+        return None
+    monkeypatch.setattr(kcl, 'load_file', load_file)
+    monkeypatch.setattr(lri, '_find_sha1_url', lambda uri: f'http://127.0.0.1:{httpd.server_address[1]}/{uri.split("?")[0].split("/")[2]}')
+    header_cache.clear()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _sha1_uri(name: str) -> str:
+    return f'sha1://{name}?label=test'
+
+
+def test_mda_info_reads_only_the_header(tmp_path, remote_store):
+    writemda16i(_X.T, str(tmp_path / ('a' * 40)))
+    info = load_recording_info({'recording_format': 'mda', 'data': {'raw': _sha1_uri('a' * 40), 'params': {'samplerate': 10000}}})
+    assert (info.num_channels, info.num_frames, info.dtype) == (4, 200000, 'int16')
+    assert info.duration_sec == 20
+    assert remote_store.bytes_sent < 1024
+
+
+def test_npy_info_reads_only_the_header(tmp_path, remote_store):
+    np.save(str(tmp_path / ('b' * 40)) + '.npy', _X.T)
+    os.rename(str(tmp_path / ('b' * 40)) + '.npy', str(tmp_path / ('b' * 40)))
+    info = load_recording_info({'recording_format': 'npy', 'data': {'raw': _sha1_uri('b' * 40), 'params': {'samplerate': 10000}}})
+    assert (info.num_channels, info.num_frames, info.dtype) == (4, 200000, 'int16')
+    assert remote_store.bytes_sent < 1024
+
+
+def test_compressed_info_reads_only_the_header(tmp_path, remote_store):
+    recording = NumpyRecording([_X], sampling_frequency=10000)
+    recording.set_dummy_probe_from_locations(np.random.randn(4, 2))
+    write_compressed_recording(recording, str(tmp_path / ('c' * 40)))
+    info = load_recording_info({'recording_format': 'compressed', 'data': {'raw': _sha1_uri('c' * 40)}})
+    assert (info.num_channels, info.num_frames, info.dtype, info.sampling_frequency) == (4, 200000, 'int16', 10000)
+    assert remote_store.bytes_sent < 1024
+
+
+@pytest.mark.parametrize('concatenate', [False, True])
+def test_legacy_split_recording(tmp_path, concatenate):
+    from spikeforest.load_extractors import load_recording_extractor
+    writemda16i(_X[:1000].T, str(tmp_path / 'part1.mda'))
+    writemda16i(_X[1000:2500].T, str(tmp_path / 'part2.mda'))
+    recording_object = {
+        'raw': [str(tmp_path / 'part1.mda'), str(tmp_path / 'part2.mda')],
+        'geom': np.random.randn(4, 2).tolist(),
+        'params': {'samplerate': 10000},
+        'concatenate': concatenate
+    }
+    info = load_recording_info(recording_object)
+    recording = load_recording_extractor(recording_object)
+    assert info.num_frames == 2500
+    assert info.segment_num_frames == ((2500,) if concatenate else (1000, 1500))
+    assert recording.get_num_segments() == info.num_segments
+    assert tuple(recording.get_num_frames(segment_index=i) for i in range(recording.get_num_segments())) == info.segment_num_frames
+
+
+def test_info_of_other_kachery_uri(tmp_path, monkeypatch):
+    # e.g. zenodo:// uris, which are loaded as a whole
+    writemda16i(_X.T, str(tmp_path / 'd.mda'))
+    uri = 'zenodo://1234/d.mda'
+    monkeypatch.setattr(kcl, 'load_file', lambda u, **kwargs: str(tmp_path / 'd.mda') if u == uri else None)
+    header_cache.clear()
+    info = load_recording_info({'recording_format': 'mda', 'data': {'raw': uri, 'params': {'samplerate': 10000}}})
+    assert (info.num_channels, info.num_frames, info.dtype) == (4, 200000, 'int16')
+    # cached by the uri
+    hits = header_cache.stats()['hits']
+    assert load_recording_info({'recording_format': 'mda', 'data': {'raw': uri, 'params': {'samplerate': 10000}}}) == info
+    assert header_cache.stats()['hits'] == hits + 1
+
+
+def test_sha1_info_without_download_url(tmp_path, monkeypatch):
+    # when the download url can't be found, the whole file is loaded
+    writemda16i(_X.T, str(tmp_path / 'e.mda'))
+    uri = _sha1_uri('e' * 40)
+    monkeypatch.setattr(kcl, 'load_file', lambda u, local_only=False, **kwargs: None if local_only else str(tmp_path / 'e.mda'))
+    monkeypatch.setattr(lri, '_find_sha1_url', lambda u: None)
+    header_cache.clear()
+    info = load_recording_info({'recording_format': 'mda', 'data': {'raw': uri, 'params': {'samplerate': 10000}}})
+    assert (info.num_channels, info.num_frames) == (4, 200000)
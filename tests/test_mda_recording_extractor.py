@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from spikeforest.load_extractors.MdaRecordingExtractorV2.MdaRecordingExtractorV2 import MdaRecordingExtractorV2, writemda, writenpy
+
+_X = np.random.randn(4, 1000).astype('float32')
+_GEOM = np.c_[np.arange(4), np.zeros(4)]
+
+
+@pytest.fixture(params=['mda', 'npy'])
+def raw_path(request, tmp_path):
+    path = str(tmp_path / f'raw.{request.param}')
+    if request.param == 'mda':
+        writemda(_X, path, dtype='float32')
+    else:
+        writenpy(_X, path, dtype='float32')
+    return path
+
+
+def test_traces_are_writable_by_default(raw_path):
+    recording = MdaRecordingExtractorV2(raw_path, params={'samplerate': 30000}, geom=_GEOM)
+    traces = recording.get_traces(start_frame=10, end_frame=100)
+    np.testing.assert_array_equal(traces, _X[:, 10:100].T)
+    # e.g. in-place filtering or common average referencing
+    traces -= np.median(traces, axis=1, keepdims=True)
+    np.testing.assert_array_equal(recording.get_traces(start_frame=10, end_frame=100), _X[:, 10:100].T)
+
+
+def test_memmap_traces_are_views(raw_path):
+    recording = MdaRecordingExtractorV2(raw_path, params={'samplerate': 30000}, geom=_GEOM, use_memmap=True)
+    traces = recording.get_traces(start_frame=10, end_frame=100)
+    np.testing.assert_array_equal(traces, _X[:, 10:100].T)
+    assert not traces.flags.writeable
+
+
+@pytest.mark.parametrize('use_memmap', [False, True])
+def test_channel_subset_of_interleaved_mda_reads_whole_frames(tmp_path, use_memmap):
+    X = np.random.randint(-500, 500, size=(64, 20000)).astype('int16')
+    path = str(tmp_path / 'raw.mda')
+    writemda(X, path, dtype='int16')
+    geom = np.c_[np.arange(64), np.zeros(64)]
+    recording = MdaRecordingExtractorV2(path, params={'samplerate': 30000}, geom=geom, use_memmap=use_memmap)
+    segment = recording._recording_segments[0]
+    d = recording._diskreadmda
+    traces = segment.get_traces(1000, 11000, np.arange(8, 12))
+    np.testing.assert_array_equal(traces, X[8:12, 1000:11000].T)
+    # a frame of all channels (128 bytes) is far smaller than a page, so the subset saves no I/O
+    assert d.bytes_read >= (10000 - 1) * 64 * 2
+    bytes_subset = d.bytes_read
+    segment.get_traces(1000, 11000)
+    assert d.bytes_read - bytes_subset <= bytes_subset + 2 * 4096
+
+
+def test_channel_subset_of_npy_reads_only_those_rows(tmp_path):
+    X = np.random.randint(-500, 500, size=(64, 20000)).astype('int16')
+    path = str(tmp_path / 'raw.npy')
+    np.save(path, X)
+    geom = np.c_[np.arange(64), np.zeros(64)]
+    recording = MdaRecordingExtractorV2(path, params={'samplerate': 30000}, geom=geom, use_memmap=True)
+    d = recording._diskreadmda
+    traces = recording._recording_segments[0].get_traces(1000, 11000, np.arange(8, 12))
+    np.testing.assert_array_equal(traces, X[8:12, 1000:11000].T)
+    # each row is contiguous in a C-ordered npy file
+    assert d.bytes_read <= 4 * (10000 * 2 + 2 * 4096)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from spikeforest.sorting_utilities.pipeline import ROOT_STAGE, PipelineExecutor, PipelineStage
+
+
+def test_results_are_yielded_while_waiting_for_the_next_item():
+    first_result = threading.Event()
+
+    def items():
+        yield 0
+        # e.g. the next sorting job is still running
+        assert first_result.wait(timeout=10), 'the first result was not yielded before the next item'
+        yield 1
+
+    executor = PipelineExecutor([PipelineStage(name='double', fn=lambda ctx: 2 * ctx.item, depends_on=[ROOT_STAGE])])
+    results = []
+    for result in executor.run(items()):
+        results.append(result.results['double'])
+        first_result.set()
+    assert results == [0, 2]
+
+
+def test_a_stage_whose_dependency_failed_is_skipped():
+    def fail(ctx):
+        raise ValueError('bad item')
+    stages = [
+        PipelineStage(name='load', fn=fail, depends_on=[ROOT_STAGE]),
+        PipelineStage(name='metrics', fn=lambda ctx: 1, depends_on=['load']),
+        PipelineStage(name='post', fn=lambda ctx: 2, depends_on=[ROOT_STAGE])
+    ]
+    (result,) = list(PipelineExecutor(stages).run(['x']))
+    assert result.item == 'x'
+    assert result.results == {'post': 2}
+    assert result.errors == {'load': 'ValueError: bad item', 'metrics': 'Skipped: load failed'}
+
+
+def test_running_tasks_of_a_stage_are_limited_by_max_in_flight():
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def task(ctx):
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return ctx.item
+
+    executor = PipelineExecutor([PipelineStage(name='task', fn=task, depends_on=[ROOT_STAGE], max_in_flight=2)],
+                                num_threads=8, max_items_in_flight=8)
+    results = list(executor.run(range(16)))
+    assert sorted(r.results['task'] for r in results) == list(range(16))
+    assert max_running[0] == 2
+
+
+def test_an_error_of_the_input_is_raised():
+    def items():
+        yield 0
+        raise RuntimeError('input failed')
+
+    executor = PipelineExecutor([PipelineStage(name='task', fn=lambda ctx: ctx.item, depends_on=[ROOT_STAGE])])
+    with pytest.raises(RuntimeError, match='input failed'):
+        list(executor.run(items()))